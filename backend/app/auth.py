@@ -5,15 +5,72 @@ from passlib.context import CryptContext
 import bcrypt
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from app.config import settings
-from app.database import get_db
-from app.models.user import User
+from app.database import get_db, get_async_db
+from app.models.user import User, UserRole
 from app.schemas.user import TokenData
+from app.utils.cache import TTLCache
+from app.utils.worker_pool import WorkerPool, WorkerPoolBusy
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__ident="2b")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login")
 
+# bcrypt har bir chaqiruvda ~200ms CPU sarflaydi - event loop'ni bloklamasligi uchun
+# alohida pool'da bajariladi (bcrypt GIL'ni bo'shatadi, shuning uchun thread'lar yetarli)
+password_hash_pool = WorkerPool(
+    name="bcrypt",
+    max_workers=settings.PASSWORD_HASH_WORKERS,
+    max_pending=settings.PASSWORD_HASH_MAX_PENDING,
+)
+
+
+class CurrentUser:
+    """
+    Autentifikatsiyadan o'tgan foydalanuvchi (principal)
+
+    DB session'ga bog'lanmagan yengil obyekt - cache'da saqlanadi. User jadvalini
+    o'zgartirish kerak bo'lgan joylarda get_current_user_record ishlatiladi.
+    """
+    __slots__ = ("id", "email", "first_name", "last_name", "role", "institution_id", "is_active")
+
+    def __init__(self, id: int, email: str, first_name: str, last_name: str,
+                 role: UserRole, institution_id: int, is_active: bool):
+        self.id = id
+        self.email = email
+        self.first_name = first_name
+        self.last_name = last_name
+        self.role = role
+        self.institution_id = institution_id
+        self.is_active = is_active
+
+    @classmethod
+    def from_user(cls, user: User) -> "CurrentUser":
+        return cls(
+            id=user.id,
+            email=user.email,
+            first_name=user.first_name,
+            last_name=user.last_name,
+            role=user.role,
+            institution_id=user.institution_id,
+            is_active=bool(user.is_active),
+        )
+
+    def __repr__(self):
+        return f"<CurrentUser {self.email} - Institution {self.institution_id}>"
+
+
+# (email, institution_id) -> CurrentUser
+# Har bir worker process'da alohida; boshqa process'lardagi eskirgan qiymatlar TTL bilan cheklanadi
+principal_cache = TTLCache(maxsize=settings.AUTH_CACHE_MAX_SIZE, ttl=settings.AUTH_CACHE_TTL_SECONDS)
+
+
+def invalidate_principal(email: str, institution_id: int):
+    """Foydalanuvchi o'zgarganda (rol, holat, ism, email) cache'dan olib tashlash"""
+    principal_cache.pop((email, institution_id))
+
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Parolni tekshirish"""
@@ -39,6 +96,28 @@ def get_password_hash(password: str) -> str:
     return hashed.decode('utf-8')
 
 
+async def _run_password_job(fn, *args):
+    """Parol ishini pool'da bajarish, navbat to'lsa 503 qaytarish"""
+    try:
+        return await password_hash_pool.run(fn, *args)
+    except WorkerPoolBusy:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Server band. Iltimos, birozdan keyin qayta urinib ko'ring.",
+            headers={"Retry-After": "1"},
+        )
+
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """Parolni worker pool'da tekshirish (async handler'lar uchun)"""
+    return await _run_password_job(verify_password, plain_password, hashed_password)
+
+
+async def get_password_hash_async(password: str) -> str:
+    """Parolni worker pool'da hash qilish (async handler'lar uchun)"""
+    return await _run_password_job(get_password_hash, password)
+
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     """Access token yaratish"""
     to_encode = data.copy()
@@ -75,9 +154,9 @@ def verify_token(token: str, credentials_exception):
 
 async def get_current_user(
     token: str = Depends(oauth2_scheme),
-    db: Session = Depends(get_db)
-) -> User:
-    """Joriy foydalanuvchini olish"""
+    db: AsyncSession = Depends(get_async_db)
+) -> CurrentUser:
+    """Joriy foydalanuvchini olish (cache orqali)"""
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -92,21 +171,42 @@ async def get_current_user(
     except JWTError:
         raise credentials_exception
     
-    # Email va institution_id bo'yicha qidirish
-    user = db.query(User).filter(
-        User.email == email,
-        User.institution_id == institution_id
-    ).first()
-    if user is None:
-        raise credentials_exception
-    if not user.is_active:
+    cache_key = (email, institution_id)
+    principal = principal_cache.get(cache_key)
+    if principal is None:
+        # Email va institution_id bo'yicha qidirish
+        user = await db.scalar(select(User).where(
+            User.email == email,
+            User.institution_id == institution_id
+        ))
+        if user is None:
+            raise credentials_exception
+        principal = CurrentUser.from_user(user)
+        principal_cache.set(cache_key, principal)
+    if not principal.is_active:
         raise HTTPException(status_code=400, detail="Inactive user")
+    return principal
+
+
+async def get_current_user_record(
+    current_user: CurrentUser = Depends(get_current_user),
+    db: Session = Depends(get_db)
+) -> User:
+    """Joriy foydalanuvchining User yozuvini olish (o'zgartirish kerak bo'lgan endpoint'lar uchun)"""
+    user = db.query(User).filter(User.id == current_user.id).first()
+    if user is None:
+        invalidate_principal(current_user.email, current_user.institution_id)
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Could not validate credentials",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
     return user
 
 
 async def get_current_active_admin(
-    current_user: User = Depends(get_current_user)
-) -> User:
+    current_user: CurrentUser = Depends(get_current_user)
+) -> CurrentUser:
     """Faol admin foydalanuvchini olish"""
     if current_user.role != "admin":
         raise HTTPException(
@@ -6,6 +6,9 @@ import os
 class Settings(BaseSettings):
     # Database (Railway PostgreSQL uchun)
     DATABASE_URL: str = "sqlite:///./texnikum_erp.db"
+    # Async driver URL (bo'sh bo'lsa DATABASE_URL'dan avtomatik yasaladi:
+    # sqlite -> sqlite+aiosqlite, postgresql -> postgresql+asyncpg)
+    ASYNC_DATABASE_URL: str = ""
     
     # JWT
     SECRET_KEY: str = "your-secret-key-change-this-in-production"
@@ -58,6 +61,35 @@ class Settings(BaseSettings):
     # Performance Settings
     API_RATE_LIMIT_PER_MINUTE: int = 100  # Har bir IP uchun daqiqada so'rovlar soni
     CACHE_TTL_SECONDS: int = 300  # Cache TTL (5 daqiqa)
+    PASSWORD_HASH_WORKERS: int = 4  # bcrypt uchun worker thread'lar soni (bir vaqtda hash'lash chegarasi)
+    PASSWORD_HASH_MAX_PENDING: int = 256  # Navbatdagi hash so'rovlari chegarasi (oshsa 503 qaytariladi)
+    AUTH_CACHE_TTL_SECONDS: int = 60  # Autentifikatsiya qilingan foydalanuvchi cache TTL (sekund)
+    AUTH_CACHE_MAX_SIZE: int = 10000  # Cache'dagi foydalanuvchilar maksimal soni
+    IMAGE_WORKERS: int = 2  # Rasm qayta ishlash (avatar variantlari) uchun process'lar soni
+    IMAGE_MAX_PENDING: int = 64  # Navbatdagi rasm ishlari chegarasi
+    IMAGE_JOB_TIMEOUT_SECONDS: int = 30  # Bitta rasmni qayta ishlash uchun maksimal vaqt
+    DOCUMENT_WORKERS: int = 2  # Materiallardan matn/eskiz ajratish uchun process'lar soni
+    DOCUMENT_MAX_PENDING: int = 32  # Navbatdagi hujjat ishlari chegarasi
+    DOCUMENT_JOB_TIMEOUT_SECONDS: int = 60  # Bitta hujjatni qayta ishlash uchun maksimal vaqt
+    BLOB_GC_GRACE_SECONDS: int = 3600  # Havolasiz qolgan material fayli shuncha vaqtdan keyin o'chiriladi
+    BLOB_GC_INTERVAL_SECONDS: int = 600  # Havolasiz fayllarni tozalash oralig'i (sekund)
+    MATERIAL_VIEW_URL_TTL_SECONDS: int = 900  # Dars materialini ko'rish havolasi amal qilish muddati (sekund)
+    AUTOSAVE_FLUSH_SECONDS: float = 3.0  # Imtihon javoblari buferini bazaga yozish oralig'i (sekund)
+    AUTOSAVE_JOURNAL_PATH: str = "autosave/answers.jsonl"  # Yozilmagan javoblar jurnali namunasi - har bir worker "answers-<pid>.jsonl"
+    
+    # File Storage - "local" (disk) yoki "s3" (AWS S3, MinIO va boshqa S3-mos omborlar, boto3 kerak)
+    STORAGE_BACKEND: str = "local"
+    STORAGE_LOCAL_ROOT: str = "uploads"  # Lokal ombor papkasi
+    S3_BUCKET: str = ""
+    S3_ENDPOINT_URL: str = ""  # MinIO uchun masalan: http://localhost:9000 (AWS uchun bo'sh)
+    S3_REGION: str = ""
+    S3_ACCESS_KEY_ID: str = ""
+    S3_SECRET_ACCESS_KEY: str = ""
+    S3_PREFIX: str = ""  # Bucket ichidagi umumiy prefiks (ixtiyoriy)
+    S3_PATH_STYLE: bool = False  # MinIO uchun True
+    S3_PRESIGN_EXPIRE_SECONDS: int = 300  # Presigned GET havolasi muddati (sekund)
+    S3_MULTIPART_THRESHOLD: int = 8 * 1024 * 1024  # Shundan katta fayllar qismlab yuklanadi
+    S3_MULTIPART_CHUNK_SIZE: int = 8 * 1024 * 1024  # Qism hajmi (S3: kamida 5 MB)
     
     # Email Settings
     EMAIL_ENABLED: bool = True  # Email yoqilgan/yochilgan
@@ -1,4 +1,5 @@
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.pool import QueuePool, NullPool
@@ -26,6 +27,46 @@ else:
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+
+def get_async_database_url(url: str) -> str:
+    """Sync DATABASE_URL'ni async driver URL'iga o'tkazish"""
+    if url.startswith("sqlite+aiosqlite") or url.startswith("postgresql+asyncpg"):
+        return url
+    if url.startswith("sqlite:"):
+        return url.replace("sqlite:", "sqlite+aiosqlite:", 1)
+    # Railway/Heroku "postgres://" formatini ham qabul qilish
+    for prefix in ("postgresql+psycopg2://", "postgresql://", "postgres://"):
+        if url.startswith(prefix):
+            return "postgresql+asyncpg://" + url[len(prefix):]
+    return url
+
+
+ASYNC_DATABASE_URL = settings.ASYNC_DATABASE_URL or get_async_database_url(settings.DATABASE_URL)
+
+# Async engine - event loop'ni bloklamaydigan so'rovlar uchun (aiosqlite / asyncpg)
+if ASYNC_DATABASE_URL.startswith("sqlite"):
+    async_engine = create_async_engine(
+        ASYNC_DATABASE_URL,
+        poolclass=NullPool,  # SQLite uchun pool kerak emas
+    )
+else:
+    async_engine = create_async_engine(
+        ASYNC_DATABASE_URL,
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_pre_ping=True,
+        pool_recycle=settings.DB_POOL_RECYCLE,
+        echo=False,
+    )
+
+# expire_on_commit=False - commit'dan keyin obyekt atributlarini qayta yuklash (lazy IO) kerak bo'lmasligi uchun
+AsyncSessionLocal = async_sessionmaker(
+    bind=async_engine,
+    class_=AsyncSession,
+    autoflush=False,
+    expire_on_commit=False,
+)
+
 Base = declarative_base()
 
 
@@ -37,3 +78,27 @@ def get_db():
     finally:
         db.close()
 
+
+def dialect_insert(db, model):
+    """
+    Joriy dialect'ga mos INSERT statement (ON CONFLICT ... DO UPDATE/NOTHING uchun)
+
+    Args:
+        db: Session, AsyncSession yoki Connection
+        model: ORM model yoki Table
+    """
+    bind = db.get_bind() if hasattr(db, "get_bind") else db
+    dialect_name = bind.dialect.name
+    if dialect_name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect_name == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        raise NotImplementedError(f"Upsert {dialect_name} uchun qo'llab-quvvatlanmaydi")
+    return insert(model)
+
+
+async def get_async_db():
+    """Async database session dependency"""
+    async with AsyncSessionLocal() as db:
+        yield db
@@ -1,3 +1,4 @@
+import asyncio
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
@@ -7,6 +8,11 @@ from slowapi.errors import RateLimitExceeded
 from app.database import engine, Base
 from app.config import settings
 from app.routes import api_router
+from app.auth import password_hash_pool
+from app.utils.avatars import image_pool
+from app.utils.material_preview import backfill_material_previews, document_pool
+from app.utils.answer_autosave import answer_autosave
+from app.utils.blob_store import run_blob_gc
 
 # Database jadvalarni yaratish
 Base.metadata.create_all(bind=engine)
@@ -28,6 +34,131 @@ try:
 except Exception as e:
     print(f"⚠ Database migration xatolik (ehtimol maydon allaqachon mavjud): {e}")
 
+# lesson_materials.content_hash maydonini qo'shish (kontent bo'yicha fayl ombori uchun)
+try:
+    from sqlalchemy import text, inspect
+    inspector = inspect(engine)
+    if 'lesson_materials' in inspector.get_table_names():
+        columns = [col['name'] for col in inspector.get_columns('lesson_materials')]
+        if 'content_hash' not in columns:
+            with engine.begin() as conn:
+                conn.execute(text("ALTER TABLE lesson_materials ADD COLUMN content_hash VARCHAR(64)"))
+                conn.execute(text("CREATE INDEX IF NOT EXISTS ix_lesson_materials_content_hash ON lesson_materials (content_hash)"))
+                print("✓ content_hash maydoni database'ga qo'shildi!")
+except Exception as e:
+    print(f"⚠ Database migration xatolik (content_hash): {e}")
+
+# exams.version va quizzes.version maydonlari (javob kaliti va savollar keshlari kaliti)
+try:
+    from sqlalchemy import text, inspect
+    inspector = inspect(engine)
+    for table_name in ['exams', 'quizzes']:
+        if table_name in inspector.get_table_names():
+            columns = [col['name'] for col in inspector.get_columns(table_name)]
+            if 'version' not in columns:
+                with engine.begin() as conn:
+                    conn.execute(text(f"ALTER TABLE {table_name} ADD COLUMN version INTEGER NOT NULL DEFAULT 1"))
+                    print(f"✓ {table_name}.version maydoni database'ga qo'shildi!")
+except Exception as e:
+    print(f"⚠ Database migration xatolik (version): {e}")
+
+# Bulk upsert (ON CONFLICT) tayanadigan unique indexlar. Index yaratilmasa bulk endpoint'lar
+# har safar 500 qaytaradi, shuning uchun xatolik ilovani to'xtatadi. Mavjud takror yozuvlar
+# bu yerda o'chirilmaydi - ular dedupe_lesson_records.py skripti bilan ko'rib chiqilib tozalanadi
+from app.models.attendance import Attendance
+from app.models.grade import Grade
+from app.models.student import Student
+from app.models.audit_log import AuditLog
+from app.utils.migrations import ensure_unique_index
+
+for model, index_name, table_name in [
+    (Attendance, 'idx_attendance_lesson_unique', 'attendance'),
+    (Grade, 'idx_grade_lesson_unique', 'grades'),
+]:
+    ensure_unique_index(
+        engine, model, index_name,
+        hint=f"Takroriy yozuvlarni ko'rish: python dedupe_lesson_records.py {table_name}, "
+             f"tozalash: python dedupe_lesson_records.py {table_name} --apply",
+    )
+
+# Keyin qo'shilgan indexlar: keyset pagination uchun (institution_id, created_at, id) va boshqalar
+for model, index_name in [
+    (Attendance, 'idx_attendance_institution_created'),
+    (Grade, 'idx_grade_institution_created'),
+    (Student, 'idx_student_institution_created'),
+    (AuditLog, 'idx_audit_created'),
+]:
+    try:
+        lesson_index = next(index for index in model.__table__.indexes if index.name == index_name)
+        lesson_index.create(bind=engine, checkfirst=True)
+    except Exception as e:
+        print(f"⚠ {index_name} yaratilmadi: {e}")
+
+# Bitta ochiq urinish uchun partial unique index (start ON CONFLICT shunga tayanadi) va
+# urinish raqami uchun unique index. Poyga (race) natijasida qolgan takroriy ochiq urinishlar
+# va raqamlar bu yerda o'zgartirilmaydi - ular dedupe_open_exam_attempts.py skripti bilan
+# (javoblari birlashtirilib, raqamlar qayta tartiblanib) tozalanadi
+from app.models.exam import ExamAttempt
+
+for index_name in ['idx_attempt_open_unique', 'idx_attempt_number_unique']:
+    ensure_unique_index(
+        engine, ExamAttempt, index_name,
+        hint="Takroriy urinishlarni ko'rish: python dedupe_open_exam_attempts.py, "
+             "tozalash: python dedupe_open_exam_attempts.py --apply",
+    )
+
+# Kunlik davomat yig'indisini to'ldirish (jadval yangi yaratilgan bo'lsa)
+try:
+    from sqlalchemy import select, func
+    from app.models.attendance import Attendance, AttendanceDailySummary
+    from app.utils.attendance_summary import rebuild_attendance_summary
+
+    with engine.begin() as conn:
+        summary_empty = conn.execute(select(func.count(AttendanceDailySummary.id))).scalar() == 0
+        has_attendance = conn.execute(select(Attendance.id).limit(1)).first() is not None
+        if summary_empty and has_attendance:
+            rows = rebuild_attendance_summary(conn)
+            print(f"✓ Kunlik davomat yig'indisi to'ldirildi ({rows} qator)")
+except Exception as e:
+    print(f"⚠ Davomat yig'indisini to'ldirishda xatolik: {e}")
+
+# Imtihonga kirish jadvalini to'ldirish (jadval yangi yaratilgan bo'lsa)
+try:
+    from sqlalchemy import select, or_
+    from app.models.exam import Exam, ExamAccess
+    from app.utils.exam_access import rebuild_exam_access
+
+    with engine.begin() as conn:
+        access_empty = conn.execute(select(ExamAccess.id).limit(1)).first() is None
+        has_rules = conn.execute(select(Exam.id).where(
+            or_(Exam.allowed_students.isnot(None), Exam.excluded_students.isnot(None))
+        ).limit(1)).first() is not None
+        if access_empty and has_rules:
+            rows = rebuild_exam_access(conn)
+            print(f"✓ Imtihonga kirish jadvali to'ldirildi ({rows} qator)")
+except Exception as e:
+    print(f"⚠ Imtihonga kirish jadvalini to'ldirishda xatolik: {e}")
+
+# Talabalarni qidirish indeksi (PostgreSQL - pg_trgm, SQLite - FTS5)
+try:
+    from app.utils.student_search import setup_student_search
+
+    search_backend = setup_student_search(engine)
+    if search_backend:
+        print(f"✓ Talabalar qidiruv indeksi tayyor ({search_backend})")
+except Exception as e:
+    print(f"⚠ Qidiruv indeksi yaratilmadi, oddiy ILIKE qidiruvi ishlatiladi: {e}")
+
+# Dars materiallari matni bo'yicha qidiruv indeksi
+try:
+    from app.utils.material_search import setup_material_search
+
+    material_search_backend = setup_material_search(engine)
+    if material_search_backend:
+        print(f"✓ Materiallar qidiruv indeksi tayyor ({material_search_backend})")
+except Exception as e:
+    print(f"⚠ Materiallar qidiruv indeksi yaratilmadi, oddiy ILIKE qidiruvi ishlatiladi: {e}")
+
 # Rate Limiter sozlash
 limiter = Limiter(key_func=get_remote_address)
 
@@ -97,7 +228,51 @@ async def root():
 @limiter.limit("100/minute")
 async def health_check(request: Request):
     """Health check endpoint"""
-    return {"status": "healthy"}
+    return {
+        "status": "healthy",
+        "password_hashing": password_hash_pool.stats(),
+        "image_processing": image_pool.stats(),
+        "document_processing": document_pool.stats(),
+        "answer_autosave": {"pending_attempts": answer_autosave.pending_count()},
+    }
+
+
+@app.on_event("startup")
+async def start_material_backfill():
+    """Qayta ishlanmagan dars materiallari uchun matn/eskiz yaratishni fonda boshlash"""
+    app.state.material_backfill = asyncio.create_task(backfill_material_previews())
+
+
+@app.on_event("startup")
+async def start_blob_gc():
+    """Havolasiz qolgan material fayllarini davriy tozalashni boshlash"""
+    app.state.blob_gc = asyncio.create_task(run_blob_gc())
+
+
+@app.on_event("startup")
+async def start_answer_autosave():
+    """Autosave jurnalini tiklash va javoblar buferini davriy yozishni boshlash"""
+    app.state.answer_autosave = asyncio.create_task(answer_autosave.run())
+
+
+@app.on_event("shutdown")
+async def shutdown_worker_pools():
+    """Worker pool'larni to'xtatish"""
+    for task_name in ("material_backfill", "blob_gc"):
+        task = getattr(app.state, task_name, None)
+        if task is not None:
+            task.cancel()
+    autosave = getattr(app.state, "answer_autosave", None)
+    if autosave is not None:
+        autosave.cancel()
+        # Buferda qolgan javoblar yozib qo'yiladi (bo'lmasa keyingi ishga tushishda jurnaldan tiklanadi)
+        try:
+            await answer_autosave.flush()
+        except Exception as e:
+            print(f"⚠ Autosave javoblarini yozishda xatolik: {e}")
+    password_hash_pool.shutdown()
+    image_pool.shutdown()
+    document_pool.shutdown()
 
 
 @app.exception_handler(RateLimitExceeded)
@@ -5,13 +5,13 @@ from app.models.student import Student
 from app.models.group import Group
 from app.models.department import Department
 from app.models.schedule import Schedule
-from app.models.attendance import Attendance
+from app.models.attendance import Attendance, AttendanceDailySummary
 from app.models.grade import Grade
 from app.models.book import Book, BookBorrow
 from app.models.audit_log import AuditLog
-from app.models.lesson_material import LessonMaterial
+from app.models.lesson_material import LessonMaterial, LessonMaterialContent, OrphanBlob
 from app.models.password_reset import PasswordResetToken
-from app.models.exam import Exam, ExamAttempt
+from app.models.exam import Exam, ExamAccess, ExamAttempt
 from app.models.quiz import Quiz, QuizResult
 
 __all__ = [
@@ -23,13 +23,17 @@ __all__ = [
     "Department",
     "Schedule",
     "Attendance",
+    "AttendanceDailySummary",
     "Grade",
     "Book",
     "BookBorrow",
     "AuditLog",
     "LessonMaterial",
+    "LessonMaterialContent",
+    "OrphanBlob",
     "PasswordResetToken",
     "Exam",
+    "ExamAccess",
     "ExamAttempt",
     "Quiz",
     "QuizResult",
@@ -34,8 +34,38 @@ class Attendance(Base):
         Index('idx_attendance_institution', 'institution_id'),
         Index('idx_attendance_date_group', 'date', 'group'),
         Index('idx_attendance_student_date', 'student_id', 'date'),
+        # Bir talaba uchun bitta darsda faqat bitta yozuv (bulk upsert uchun ham kerak)
+        Index('idx_attendance_lesson_unique', 'institution_id', 'student_id', 'date', 'group', 'subject', unique=True),
+        # Keyset pagination (created_at, id) uchun
+        Index('idx_attendance_institution_created', 'institution_id', 'created_at', 'id'),
     )
 
     def __repr__(self):
         return f"<Attendance {self.student_student_id} - {self.date} - Institution {self.institution_id}>"
 
+
+
+class AttendanceDailySummary(Base):
+    """Kunlik davomat yig'indisi (rollup) - statistika endpoint'lari uchun
+
+    Attendance yozuvlari yaratilganda/o'zgarganda/o'chirilganda inkremental yangilanadi
+    (app/utils/attendance_summary.py).
+    """
+    __tablename__ = "attendance_daily_summary"
+
+    id = Column(Integer, primary_key=True, index=True)
+    institution_id = Column(Integer, ForeignKey("institutions.id"), nullable=False)
+    date = Column(Date, nullable=False)
+    group = Column(String, nullable=False)
+    subject = Column(String, nullable=False)
+    present = Column(Integer, nullable=False, default=0)
+    absent = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+    __table_args__ = (
+        Index('idx_attendance_summary_key', 'institution_id', 'date', 'group', 'subject', unique=True),
+        Index('idx_attendance_summary_date', 'date'),
+    )
+
+    def __repr__(self):
+        return f"<AttendanceDailySummary {self.date} {self.group} {self.subject} - Institution {self.institution_id}>"
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, Text, Enum
+from sqlalchemy import Column, Integer, String, DateTime, Text, Enum, Index
 from sqlalchemy.sql import func
 from app.database import Base
 import enum
@@ -17,6 +17,10 @@ class ActionType(str, enum.Enum):
 
 class AuditLog(Base):
     __tablename__ = "audit_logs"
+    __table_args__ = (
+        # Keyset pagination (created_at, id) uchun
+        Index('idx_audit_created', 'created_at', 'id'),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, nullable=True)
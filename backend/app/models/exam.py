@@ -40,6 +40,9 @@ class Exam(Base):
     
     created_at = Column(DateTime(timezone=True), server_default=func.now(), index=True)
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    # Har bir yangilashda oshiriladi - javob kaliti va savollar keshlarining kaliti
+    # (updated_at SQLite'da sekund aniqligida, bir sekunddagi ikki o'zgarish farqlanmaydi)
+    version = Column(Integer, nullable=False, default=1, server_default="1")
 
     # Relationships
     institution = relationship("Institution", backref="exams")
@@ -57,6 +60,27 @@ class Exam(Base):
         return f"<Exam {self.title} - {self.subject}>"
 
 
+class ExamAccess(Base):
+    """Imtihonga kirish ro'yxati (allowed_students / excluded_students'ning indekslangan nusxasi)
+
+    Exam yaratilganda/yangilanganda sinxronlanadi (app/utils/exam_access.py) - mavjud
+    imtihonlar ro'yxati to'liq SQL'da, JSON'ni Python'da aylanmasdan hisoblanadi.
+    """
+    __tablename__ = "exam_access"
+
+    id = Column(Integer, primary_key=True, index=True)
+    exam_id = Column(Integer, ForeignKey("exams.id", ondelete="CASCADE"), nullable=False)
+    student_id = Column(Integer, nullable=False)
+    is_allowed = Column(Boolean, nullable=False)  # True - ruxsat berilgan, False - chetlashtirilgan
+
+    __table_args__ = (
+        Index('idx_exam_access_rule', 'exam_id', 'is_allowed', 'student_id', unique=True),
+    )
+
+    def __repr__(self):
+        return f"<ExamAccess Exam {self.exam_id} - Student {self.student_id} ({'allow' if self.is_allowed else 'deny'})>"
+
+
 class ExamAttempt(Base):
     """Imtihon urinishi - Talaba tomonidan yechilgan"""
     __tablename__ = "exam_attempts"
@@ -92,6 +116,15 @@ class ExamAttempt(Base):
 
     __table_args__ = (
         Index('idx_attempt_exam_student', 'exam_id', 'student_id'),
+        # Talabaning imtihon bo'yicha faqat bitta ochiq (topshirilmagan) urinishi bo'lishi mumkin -
+        # start_exam_attempt INSERT ... ON CONFLICT shu indeksga tayanadi
+        Index(
+            'idx_attempt_open_unique', 'exam_id', 'student_id', unique=True,
+            sqlite_where=is_submitted == False, postgresql_where=is_submitted == False,
+        ),
+        # Boshlash va topshirish bir vaqtda kelsa (PostgreSQL READ COMMITTED) urinish raqami
+        # takrorlanib, chegaradan ortiq urinish yaratilmasligi uchun
+        Index('idx_attempt_number_unique', 'exam_id', 'student_id', 'attempt_number', unique=True),
         Index('idx_attempt_student', 'student_id'),
         Index('idx_attempt_submitted', 'is_submitted'),
         Index('idx_attempt_completed', 'is_completed'),
@@ -34,6 +34,10 @@ class Grade(Base):
         Index('idx_grade_group_subject', 'group', 'subject'),
         Index('idx_grade_department_group', 'department', 'group'),
         Index('idx_grade_date_group', 'date', 'group'),
+        # Bir talabaga bitta darsda bir turdagi faqat bitta baho (bulk upsert uchun ham kerak)
+        Index('idx_grade_lesson_unique', 'institution_id', 'student_id', 'date', 'group', 'subject', 'grade_type', unique=True),
+        # Keyset pagination (created_at, id) uchun
+        Index('idx_grade_institution_created', 'institution_id', 'created_at', 'id'),
     )
 
     def __repr__(self):
@@ -1,7 +1,10 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Float, Index
+from urllib.parse import urlencode
+from sqlalchemy import Boolean, Column, Integer, String, ForeignKey, DateTime, Float, Index, Text
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
+from app.config import settings
 from app.database import Base
+from app.utils.signed_url import sign_thumbnail
 
 
 class LessonMaterial(Base):
@@ -16,6 +19,7 @@ class LessonMaterial(Base):
     description = Column(String, nullable=True)
     file_name = Column(String, nullable=False)
     file_path = Column(String, nullable=False)
+    content_hash = Column(String(64), nullable=True, index=True)  # SHA-256 (blob ombori kaliti)
     file_size = Column(Float, nullable=False)  # MB da
     file_type = Column(String, nullable=False)  # pdf, docx, pptx
     uploaded_by = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
@@ -26,6 +30,13 @@ class LessonMaterial(Base):
     # Relationships
     institution = relationship("Institution", backref="lesson_materials")
     uploader = relationship("User", backref="uploaded_materials")
+    # Ajratib olingan matn va eskiz - bir xil fayl (xesh) uchun umumiy
+    preview = relationship(
+        "LessonMaterialContent",
+        primaryjoin="foreign(LessonMaterial.content_hash) == LessonMaterialContent.content_hash",
+        viewonly=True,
+        uselist=False,
+    )
 
     __table_args__ = (
         Index('idx_material_institution', 'institution_id'),
@@ -34,6 +45,48 @@ class LessonMaterial(Base):
         Index('idx_material_uploaded_by', 'uploaded_by'),
     )
 
+    @property
+    def thumbnail_url(self):
+        """Birinchi sahifa eskizining imzolangan URL'i (hali yaratilmagan bo'lsa None)"""
+        if self.content_hash and self.preview is not None and self.preview.has_thumbnail:
+            params = sign_thumbnail(self.content_hash, settings.MATERIAL_VIEW_URL_TTL_SECONDS)
+            return f"/api/lesson-materials/thumbnails/{self.content_hash}?{urlencode(params)}"
+        return None
+
     def __repr__(self):
         return f"<LessonMaterial {self.title} for {self.subject}>"
 
+
+class LessonMaterialContent(Base):
+    """Material faylidan (kontent xeshi bo'yicha) fonda ajratib olingan matn va eskiz"""
+    __tablename__ = "lesson_material_contents"
+
+    id = Column(Integer, primary_key=True, index=True)
+    content_hash = Column(String(64), nullable=False, unique=True)
+    status = Column(String(16), nullable=False, default="pending")  # pending, done, failed, unsupported
+    text = Column(Text, nullable=True)
+    has_thumbnail = Column(Boolean, nullable=False, default=False)
+    error = Column(String, nullable=True)
+    processed_at = Column(DateTime(timezone=True), nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    def __repr__(self):
+        return f"<LessonMaterialContent {self.content_hash[:12]} ({self.status})>"
+
+
+class OrphanBlob(Base):
+    """
+    Oxirgi havolasi o'chirilgan blob - kutish muddatidan keyin GC tomonidan o'chiriladi
+
+    Yangi material shu xesh bilan qo'shilsa qator o'sha tranzaksiyada o'chiriladi (blob qaytadan
+    ishlatiladi). GC qatorni qulflab havolalarni qayta sanaydi, shu sabab parallel yuklash bilan
+    poyga bo'lmaydi.
+    """
+    __tablename__ = "lesson_material_orphan_blobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    content_hash = Column(String(64), nullable=False, unique=True)
+    released_at = Column(DateTime(timezone=True), nullable=False, index=True)
+
+    def __repr__(self):
+        return f"<OrphanBlob {self.content_hash[:12]}>"
@@ -30,6 +30,9 @@ class Quiz(Base):
     
     created_at = Column(DateTime(timezone=True), server_default=func.now(), index=True)
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    # Har bir yangilashda oshiriladi - javob kaliti va savollar keshlarining kaliti
+    # (updated_at SQLite'da sekund aniqligida, bir sekunddagi ikki o'zgarish farqlanmaydi)
+    version = Column(Integer, nullable=False, default=1, server_default="1")
 
     # Relationships
     institution = relationship("Institution", backref="quizzes")
@@ -30,6 +30,8 @@ class Student(Base):
         Index('idx_student_institution', 'institution_id'),
         Index('idx_student_id_institution', 'student_id', 'institution_id', unique=True),
         Index('idx_student_email_institution', 'email', 'institution_id', unique=True),
+        # Keyset pagination (created_at, id) uchun
+        Index('idx_student_institution_created', 'institution_id', 'created_at', 'id'),
     )
 
     def __repr__(self):
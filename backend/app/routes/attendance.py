@@ -1,19 +1,88 @@
 from typing import List, Optional
-from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from sqlalchemy import select, func
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import date
-from app.database import get_db
-from app.models.user import User
-from app.models.attendance import Attendance
+from app.database import get_async_db, dialect_insert
+from app.models.attendance import Attendance, AttendanceDailySummary
 from app.models.student import Student
 from app.models.institution import Institution
-from app.schemas.attendance import AttendanceCreate, AttendanceUpdate, AttendanceResponse
-from app.auth import get_current_user
+from app.models.audit_log import ActionType
+from app.schemas.attendance import AttendanceCreate, AttendanceUpdate, AttendanceResponse, AttendanceBulkCreate
+from app.auth import CurrentUser, get_current_user
 from app.utils.geolocation import is_within_radius, calculate_distance
+from app.utils.attendance_summary import apply_summary_delta, apply_summary_deltas, status_counts, status_change
+from app.utils.dashboard_cache import invalidate_dashboard
+from app.utils.keyset import NEXT_CURSOR_HEADER, apply_keyset, split_keyset_page
+from app.utils.export import export_response, iter_query_rows, xlsx_overflow, xlsx_overflow_error
+from app.utils.audit import record_audit
 
 router = APIRouter()
 
 
+async def check_attendance_geolocation(
+    db: AsyncSession,
+    current_user: CurrentUser,
+    latitude: Optional[float],
+    longitude: Optional[float],
+) -> Institution:
+    """Institution'ni olish va o'qituvchi radius ichida ekanligini tekshirish"""
+    # Institution ma'lumotlarini olish
+    institution = await db.get(Institution, current_user.institution_id)
+    
+    if not institution:
+        raise HTTPException(status_code=404, detail="Institution not found")
+    
+    # Geolocation tekshiruvi (faqat o'qituvchilar uchun va geolocation yoqilgan bo'lsa)
+    if current_user.role == "teacher" and institution.geolocation_enabled:
+        if not latitude or not longitude:
+            raise HTTPException(
+                status_code=400,
+                detail="Geolocation ma'lumotlari talab qilinadi. Iltimos, joylashuvingizni ruxsat bering."
+            )
+        
+        if not institution.latitude or not institution.longitude or not institution.geolocation_radius:
+            raise HTTPException(
+                status_code=400,
+                detail="Institution geolocation sozlamalari to'liq emas. Iltimos, admin bilan bog'laning."
+            )
+        
+        # Radius ichida ekanligini tekshirish
+        if not is_within_radius(
+            user_lat=latitude,
+            user_lon=longitude,
+            institution_lat=institution.latitude,
+            institution_lon=institution.longitude,
+            radius_meters=institution.geolocation_radius
+        ):
+            distance = calculate_distance(
+                latitude,
+                longitude,
+                institution.latitude,
+                institution.longitude
+            )
+            raise HTTPException(
+                status_code=403,
+                detail=f"Davomat olish uchun institution radius ichida bo'lishingiz kerak. "
+                       f"Siz {distance:.0f} metr uzoqlikdasiz, lekin ruxsat etilgan radius {institution.geolocation_radius:.0f} metr."
+            )
+    
+    return institution
+
+
+def filter_attendance_query(query, current_user: CurrentUser, date_filter, group, subject):
+    """Ro'yxat va eksport uchun umumiy filterlar"""
+    query = query.where(Attendance.institution_id == current_user.institution_id)
+    if date_filter:
+        query = query.where(Attendance.date == date_filter)
+    if group:
+        query = query.where(Attendance.group == group)
+    if subject:
+        query = query.where(Attendance.subject == subject)
+    return query
+
+
 @router.get("/", response_model=List[AttendanceResponse])
 async def get_attendance(
     skip: int = Query(0, ge=0),
@@ -21,21 +90,65 @@ async def get_attendance(
     date_filter: Optional[date] = None,
     group: Optional[str] = None,
     subject: Optional[str] = None,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    cursor: Optional[str] = Query(None, description="Keyset rejimi: birinchi sahifa uchun bo'sh, keyin X-Next-Cursor"),
+    response: Response = None,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: CurrentUser = Depends(get_current_user),
 ):
     """Barcha davomat yozuvlari"""
-    query = db.query(Attendance).filter(Attendance.institution_id == current_user.institution_id)
+    query = filter_attendance_query(select(Attendance), current_user, date_filter, group, subject)
     
-    if date_filter:
-        query = query.filter(Attendance.date == date_filter)
-    if group:
-        query = query.filter(Attendance.group == group)
-    if subject:
-        query = query.filter(Attendance.subject == subject)
+    if cursor is not None:
+        result = await db.execute(apply_keyset(db, query, Attendance.created_at, Attendance.id, cursor, limit))
+        records, next_cursor = split_keyset_page(result.all(), limit)
+        if next_cursor:
+            response.headers[NEXT_CURSOR_HEADER] = next_cursor
+        return records
+    
+    result = await db.execute(query.offset(skip).limit(limit))
+    return result.scalars().all()
+
+
+@router.get("/export")
+async def export_attendance(
+    request: Request,
+    export_format: str = Query("csv", alias="format", pattern="^(csv|xlsx)$"),
+    date_filter: Optional[date] = None,
+    group: Optional[str] = None,
+    subject: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: CurrentUser = Depends(get_current_user),
+):
+    """Davomat yozuvlarini eksport qilish (CSV/XLSX)"""
+    query = filter_attendance_query(
+        select(
+            Attendance.date,
+            Attendance.group,
+            Attendance.subject,
+            Attendance.student_student_id,
+            Attendance.student_name,
+            Attendance.status,
+        ),
+        current_user, date_filter, group, subject,
+    ).order_by(Attendance.date, Attendance.group, Attendance.subject, Attendance.id)
     
-    attendance_records = query.offset(skip).limit(limit).all()
-    return attendance_records
+    description = f"format={export_format}, date={date_filter}, group={group}, subject={subject}"
+    overflow = await xlsx_overflow(db, export_format, query)
+    if overflow is not None:
+        description += f", rad etildi: {overflow} qator XLSX chegarasidan oshadi"
+    await record_audit(
+        db, current_user, ActionType.EXPORT, "attendance",
+        description=description,
+        request=request,
+    )
+    if overflow is not None:
+        raise xlsx_overflow_error(overflow)
+    return export_response(
+        export_format,
+        f"davomat_{date.today().isoformat()}",
+        ["Sana", "Guruh", "Fan", "Talaba ID", "Talaba", "Holat"],
+        iter_query_rows(query, tuple),
+    )
 
 
 @router.get("/date/{attendance_date}", response_model=List[AttendanceResponse])
@@ -43,22 +156,22 @@ async def get_attendance_by_date(
     attendance_date: date,
     group: Optional[str] = None,
     subject: Optional[str] = None,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: CurrentUser = Depends(get_current_user),
 ):
     """Sana bo'yicha davomat"""
-    query = db.query(Attendance).filter(
+    query = select(Attendance).where(
         Attendance.date == attendance_date,
         Attendance.institution_id == current_user.institution_id
     )
     
     if group:
-        query = query.filter(Attendance.group == group)
+        query = query.where(Attendance.group == group)
     if subject:
-        query = query.filter(Attendance.subject == subject)
+        query = query.where(Attendance.subject == subject)
     
-    attendance_records = query.all()
-    return attendance_records
+    result = await db.execute(query)
+    return result.scalars().all()
 
 
 @router.get("/student/{student_id}", response_model=List[AttendanceResponse])
@@ -66,21 +179,26 @@ async def get_attendance_by_student(
     student_id: int,
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=100),
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    cursor: Optional[str] = Query(None, description="Keyset rejimi: birinchi sahifa uchun bo'sh, keyin X-Next-Cursor"),
+    response: Response = None,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: CurrentUser = Depends(get_current_user),
 ):
     """Talaba bo'yicha davomat"""
-    attendance_records = (
-        db.query(Attendance)
-        .filter(
-            Attendance.student_id == student_id,
-            Attendance.institution_id == current_user.institution_id
-        )
-        .offset(skip)
-        .limit(limit)
-        .all()
+    query = select(Attendance).where(
+        Attendance.student_id == student_id,
+        Attendance.institution_id == current_user.institution_id
     )
-    return attendance_records
+    
+    if cursor is not None:
+        result = await db.execute(apply_keyset(db, query, Attendance.created_at, Attendance.id, cursor, limit))
+        records, next_cursor = split_keyset_page(result.all(), limit)
+        if next_cursor:
+            response.headers[NEXT_CURSOR_HEADER] = next_cursor
+        return records
+    
+    result = await db.execute(query.offset(skip).limit(limit))
+    return result.scalars().all()
 
 
 @router.get("/statistics")
@@ -88,22 +206,24 @@ async def get_attendance_statistics(
     date_filter: Optional[date] = None,
     group: Optional[str] = None,
     subject: Optional[str] = None,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: CurrentUser = Depends(get_current_user),
 ):
-    """Davomat statistikasi"""
-    query = db.query(Attendance).filter(Attendance.institution_id == current_user.institution_id)
+    """Davomat statistikasi (kunlik yig'indi jadvalidan, bitta so'rov)"""
+    query = select(
+        func.coalesce(func.sum(AttendanceDailySummary.present), 0),
+        func.coalesce(func.sum(AttendanceDailySummary.absent), 0),
+    ).where(AttendanceDailySummary.institution_id == current_user.institution_id)
     
     if date_filter:
-        query = query.filter(Attendance.date == date_filter)
+        query = query.where(AttendanceDailySummary.date == date_filter)
     if group:
-        query = query.filter(Attendance.group == group)
+        query = query.where(AttendanceDailySummary.group == group)
     if subject:
-        query = query.filter(Attendance.subject == subject)
+        query = query.where(AttendanceDailySummary.subject == subject)
     
-    total = query.count()
-    present = query.filter(Attendance.status == "present").count()
-    absent = query.filter(Attendance.status == "absent").count()
+    present, absent = (await db.execute(query)).one()
+    total = present + absent
     
     rate = (present / total * 100) if total > 0 else 0
     
@@ -118,58 +238,21 @@ async def get_attendance_statistics(
 @router.post("/", response_model=AttendanceResponse)
 async def create_attendance(
     attendance_data: AttendanceCreate,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: CurrentUser = Depends(get_current_user),
 ):
     """Yangi davomat yozuvi qo'shish"""
-    # Institution ma'lumotlarini olish
-    institution = db.query(Institution).filter(
-        Institution.id == current_user.institution_id
-    ).first()
-    
-    if not institution:
-        raise HTTPException(status_code=404, detail="Institution not found")
-    
-    # Geolocation tekshiruvi (faqat o'qituvchilar uchun va geolocation yoqilgan bo'lsa)
-    if current_user.role == "teacher" and institution.geolocation_enabled:
-        if not attendance_data.latitude or not attendance_data.longitude:
-            raise HTTPException(
-                status_code=400,
-                detail="Geolocation ma'lumotlari talab qilinadi. Iltimos, joylashuvingizni ruxsat bering."
-            )
-        
-        if not institution.latitude or not institution.longitude or not institution.geolocation_radius:
-            raise HTTPException(
-                status_code=400,
-                detail="Institution geolocation sozlamalari to'liq emas. Iltimos, admin bilan bog'laning."
-            )
-        
-        # Radius ichida ekanligini tekshirish
-        if not is_within_radius(
-            user_lat=attendance_data.latitude,
-            user_lon=attendance_data.longitude,
-            institution_lat=institution.latitude,
-            institution_lon=institution.longitude,
-            radius_meters=institution.geolocation_radius
-        ):
-            distance = calculate_distance(
-                attendance_data.latitude,
-                attendance_data.longitude,
-                institution.latitude,
-                institution.longitude
-            )
-            raise HTTPException(
-                status_code=403,
-                detail=f"Davomat olish uchun institution radius ichida bo'lishingiz kerak. "
-                       f"Siz {distance:.0f} metr uzoqlikdasiz, lekin ruxsat etilgan radius {institution.geolocation_radius:.0f} metr."
-            )
+    # Institution ma'lumotlarini olish va geolocation tekshiruvi
+    await check_attendance_geolocation(
+        db, current_user, attendance_data.latitude, attendance_data.longitude
+    )
     
     # Agar student_name va student_student_id yuborilmasa, Student'dan olish
     if not attendance_data.student_name or not attendance_data.student_student_id:
-        student = db.query(Student).filter(
+        student = await db.scalar(select(Student).where(
             Student.id == attendance_data.student_id,
             Student.institution_id == current_user.institution_id
-        ).first()
+        ))
         if student:
             # Schema'ni yangilash
             attendance_dict = attendance_data.model_dump()
@@ -178,21 +261,27 @@ async def create_attendance(
             attendance_data = AttendanceCreate(**attendance_dict)
     
     # Mavjud attendance yozuvini tekshirish (bir xil student, date, group, subject)
-    existing = db.query(Attendance).filter(
+    existing = await db.scalar(select(Attendance).where(
         Attendance.student_id == attendance_data.student_id,
         Attendance.date == attendance_data.date,
         Attendance.group == attendance_data.group,
         Attendance.subject == attendance_data.subject,
         Attendance.institution_id == current_user.institution_id
-    ).first()
+    ))
     
     if existing:
         # Update qilish
+        present_delta, absent_delta = status_change(existing.status, attendance_data.status)
         existing.status = attendance_data.status
         existing.student_name = attendance_data.student_name
         existing.student_student_id = attendance_data.student_student_id
-        db.commit()
-        db.refresh(existing)
+        await apply_summary_delta(
+            db, current_user.institution_id, existing.date, existing.group, existing.subject,
+            present_delta, absent_delta
+        )
+        await db.commit()
+        invalidate_dashboard(current_user.institution_id)
+        await db.refresh(existing)
         return existing
     else:
         # Yangi yaratish
@@ -203,50 +292,156 @@ async def create_attendance(
         attendance_dict.pop('longitude', None)
         attendance = Attendance(**attendance_dict)
         db.add(attendance)
-        db.commit()
-        db.refresh(attendance)
+        present_delta, absent_delta = status_counts(attendance.status)
+        await apply_summary_delta(
+            db, current_user.institution_id, attendance.date, attendance.group, attendance.subject,
+            present_delta, absent_delta
+        )
+        try:
+            await db.commit()
+        except IntegrityError:
+            # Parallel so'rov shu dars uchun yozuvni birinchi yaratgan (idx_attendance_lesson_unique)
+            await db.rollback()
+            raise HTTPException(status_code=409, detail="Bu talaba uchun shu darsda davomat allaqachon olingan")
+        invalidate_dashboard(current_user.institution_id)
+        await db.refresh(attendance)
         return attendance
 
 
+@router.post("/bulk", response_model=List[AttendanceResponse])
+async def create_attendance_bulk(
+    bulk_data: AttendanceBulkCreate,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: CurrentUser = Depends(get_current_user),
+):
+    """Butun guruh uchun davomatni bitta tranzaksiyada belgilash (upsert)"""
+    await check_attendance_geolocation(db, current_user, bulk_data.latitude, bulk_data.longitude)
+    
+    # Bir talaba ikki marta yuborilsa - oxirgisi olinadi
+    statuses = {record.student_id: record.status for record in bulk_data.records}
+    student_ids = list(statuses)
+    
+    # Barcha talabalarni bitta IN so'rov bilan olish
+    result = await db.execute(select(Student).where(
+        Student.id.in_(student_ids),
+        Student.institution_id == current_user.institution_id
+    ))
+    students = {student.id: student for student in result.scalars().all()}
+    missing = [student_id for student_id in student_ids if student_id not in students]
+    if missing:
+        raise HTTPException(
+            status_code=404,
+            detail=f"Talabalar topilmadi: {', '.join(str(student_id) for student_id in missing)}"
+        )
+    
+    lesson_filter = (
+        Attendance.institution_id == current_user.institution_id,
+        Attendance.date == bulk_data.date,
+        Attendance.group == bulk_data.group,
+        Attendance.subject == bulk_data.subject,
+    )
+    
+    # Kunlik yig'indi uchun oldingi holatlar
+    result = await db.execute(
+        select(Attendance.student_id, Attendance.status).where(
+            *lesson_filter, Attendance.student_id.in_(student_ids)
+        )
+    )
+    previous = dict(result.all())
+    
+    rows = [
+        {
+            "institution_id": current_user.institution_id,
+            "student_id": student_id,
+            "student_name": f"{students[student_id].first_name} {students[student_id].last_name}",
+            "student_student_id": students[student_id].student_id or "",
+            "group": bulk_data.group,
+            "subject": bulk_data.subject,
+            "date": bulk_data.date,
+            "status": status,
+        }
+        for student_id, status in statuses.items()
+    ]
+    stmt = dialect_insert(db, Attendance).values(rows)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["institution_id", "student_id", "date", "group", "subject"],
+        set_={
+            "status": stmt.excluded.status,
+            "student_name": stmt.excluded.student_name,
+            "student_student_id": stmt.excluded.student_student_id,
+            "updated_at": func.now(),
+        },
+    )
+    await db.execute(stmt)
+    
+    summary_key = (current_user.institution_id, bulk_data.date, bulk_data.group, bulk_data.subject)
+    await apply_summary_deltas(db, [
+        (summary_key, *status_change(previous.get(student_id), status))
+        for student_id, status in statuses.items()
+    ])
+    await db.commit()
+    invalidate_dashboard(current_user.institution_id)
+    
+    result = await db.execute(
+        select(Attendance)
+        .where(*lesson_filter, Attendance.student_id.in_(student_ids))
+        .execution_options(populate_existing=True)
+    )
+    return result.scalars().all()
+
+
 @router.put("/{attendance_id}", response_model=AttendanceResponse)
 async def update_attendance(
     attendance_id: int,
     attendance_data: AttendanceUpdate,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: CurrentUser = Depends(get_current_user),
 ):
     """Davomat yozuvini yangilash"""
-    attendance = db.query(Attendance).filter(
+    attendance = await db.scalar(select(Attendance).where(
         Attendance.id == attendance_id,
         Attendance.institution_id == current_user.institution_id
-    ).first()
+    ))
     if not attendance:
         raise HTTPException(status_code=404, detail="Attendance not found")
     
+    old_status = attendance.status
     update_data = attendance_data.model_dump(exclude_unset=True)
     for field, value in update_data.items():
         setattr(attendance, field, value)
     
-    db.commit()
-    db.refresh(attendance)
+    present_delta, absent_delta = status_change(old_status, attendance.status)
+    await apply_summary_delta(
+        db, attendance.institution_id, attendance.date, attendance.group, attendance.subject,
+        present_delta, absent_delta
+    )
+    await db.commit()
+    invalidate_dashboard(current_user.institution_id)
+    await db.refresh(attendance)
     return attendance
 
 
 @router.delete("/{attendance_id}")
 async def delete_attendance(
     attendance_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: CurrentUser = Depends(get_current_user),
 ):
     """Davomat yozuvini o'chirish"""
-    attendance = db.query(Attendance).filter(
+    attendance = await db.scalar(select(Attendance).where(
         Attendance.id == attendance_id,
         Attendance.institution_id == current_user.institution_id
-    ).first()
+    ))
     if not attendance:
         raise HTTPException(status_code=404, detail="Attendance not found")
     
-    db.delete(attendance)
-    db.commit()
+    present, absent = status_counts(attendance.status)
+    await apply_summary_delta(
+        db, attendance.institution_id, attendance.date, attendance.group, attendance.subject,
+        -present, -absent
+    )
+    await db.delete(attendance)
+    await db.commit()
+    invalidate_dashboard(current_user.institution_id)
     return {"message": "Attendance deleted successfully"}
 
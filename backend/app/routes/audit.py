@@ -1,12 +1,12 @@
-from fastapi import APIRouter, Depends, Query
+from fastapi import APIRouter, Depends, Query, Response
 from sqlalchemy.orm import Session
 from sqlalchemy import desc
 from typing import Optional
 from app.database import get_db
 from app.models.audit_log import AuditLog
 from app.schemas.audit_log import AuditLogResponse
-from app.auth import get_current_user
-from app.models.user import User
+from app.auth import CurrentUser, get_current_user
+from app.utils.keyset import NEXT_CURSOR_HEADER, apply_keyset, split_keyset_page
 
 router = APIRouter()
 
@@ -18,8 +18,10 @@ async def get_audit_logs(
     action: Optional[str] = Query(None),
     resource_type: Optional[str] = Query(None),
     user_id: Optional[int] = Query(None),
+    cursor: Optional[str] = Query(None, description="Keyset rejimi: birinchi sahifa uchun bo'sh, keyin X-Next-Cursor"),
+    response: Response = None,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    current_user: CurrentUser = Depends(get_current_user),
 ):
     """Audit logs ro'yxati"""
     query = db.query(AuditLog)
@@ -31,6 +33,13 @@ async def get_audit_logs(
     if user_id:
         query = query.filter(AuditLog.user_id == user_id)
     
+    if cursor is not None:
+        rows = apply_keyset(db, query, AuditLog.created_at, AuditLog.id, cursor, limit).all()
+        logs, next_cursor = split_keyset_page(rows, limit)
+        if next_cursor:
+            response.headers[NEXT_CURSOR_HEADER] = next_cursor
+        return logs
+    
     logs = query.order_by(desc(AuditLog.created_at)).offset(skip).limit(limit).all()
     return logs
 
@@ -39,7 +48,7 @@ async def get_audit_logs(
 async def get_audit_log(
     id: int,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    current_user: CurrentUser = Depends(get_current_user),
 ):
     """Bitta audit log ma'lumotlari"""
     log = db.query(AuditLog).filter(AuditLog.id == id).first()
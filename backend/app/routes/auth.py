@@ -15,12 +15,15 @@ from app.schemas.password_reset import (
     PasswordResetResponse,
 )
 from app.auth import (
-    verify_password,
-    get_password_hash,
+    verify_password_async,
+    get_password_hash_async,
     create_access_token,
     create_refresh_token,
     get_current_user,
+    get_current_user_record,
+    invalidate_principal,
     verify_token,
+    CurrentUser,
 )
 from app.config import settings
 from app.utils.sms import (
@@ -52,7 +55,7 @@ async def login(
             )
         
         # Parolni tekshirish
-        if not verify_password(credentials.password, user.hashed_password):
+        if not await verify_password_async(credentials.password, user.hashed_password):
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Incorrect email or password",
@@ -90,7 +93,7 @@ async def login(
 
 
 @router.post("/logout")
-async def logout(current_user: User = Depends(get_current_user)):
+async def logout(current_user: CurrentUser = Depends(get_current_user)):
     """Logout endpoint"""
     return {"message": "Successfully logged out"}
 
@@ -132,7 +135,7 @@ async def refresh_token(
 
 
 @router.get("/me", response_model=UserResponse)
-async def get_current_user_info(current_user: User = Depends(get_current_user)):
+async def get_current_user_info(current_user: User = Depends(get_current_user_record)):
     """Joriy foydalanuvchi ma'lumotlari"""
     try:
         # avatar_url maydoni mavjudligini tekshirish va default qilish
@@ -147,12 +150,14 @@ async def get_current_user_info(current_user: User = Depends(get_current_user)):
 @router.put("/me", response_model=UserResponse)
 async def update_current_user(
     user_data: UserUpdate,
-    current_user: User = Depends(get_current_user),
+    current_user: User = Depends(get_current_user_record),
     db: Session = Depends(get_db)
 ):
     """Joriy foydalanuvchi ma'lumotlarini yangilash"""
     try:
         update_data = user_data.model_dump(exclude_unset=True)
+        # Cache kaliti email bo'yicha - email o'zgarsa eski kalit ham tozalanishi kerak
+        previous_email = current_user.email
         
         for field, value in update_data.items():
             # avatar_url maydoni mavjudligini tekshirish
@@ -168,6 +173,9 @@ async def update_current_user(
         
         db.commit()
         db.refresh(current_user)
+        invalidate_principal(previous_email, current_user.institution_id)
+        if current_user.email != previous_email:
+            invalidate_principal(current_user.email, current_user.institution_id)
         
         # avatar_url maydoni mavjudligini tekshirish
         if not hasattr(current_user, 'avatar_url'):
@@ -198,7 +206,7 @@ async def register(
         )
     
     # Yangi foydalanuvchi yaratish
-    hashed_password = get_password_hash(user_data.password)
+    hashed_password = await get_password_hash_async(user_data.password)
     db_user = User(
         email=user_data.email,
         username=user_data.username,
@@ -365,7 +373,7 @@ async def confirm_password_reset(
         )
     
     # Yangi parol o'rnatish
-    user.hashed_password = get_password_hash(confirm_data.new_password)
+    user.hashed_password = await get_password_hash_async(confirm_data.new_password)
     
     # Token'ni ishlatilgan deb belgilash
     reset_token.is_used = 1
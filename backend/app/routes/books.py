@@ -4,10 +4,10 @@ from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
 from sqlalchemy import func
 from app.database import get_db
-from app.models.user import User
 from app.models.book import Book, BookBorrow
 from app.schemas.book import BookCreate, BookUpdate, BookResponse, BookBorrowCreate
-from app.auth import get_current_user, get_current_active_admin
+from app.auth import CurrentUser, get_current_user, get_current_active_admin
+from app.utils.dashboard_cache import invalidate_dashboard
 
 router = APIRouter()
 
@@ -19,7 +19,7 @@ async def get_books(
     category: Optional[str] = None,
     search: Optional[str] = None,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    current_user: CurrentUser = Depends(get_current_user),
 ):
     """Barcha kitoblar ro'yxati"""
     query = db.query(Book)
@@ -41,7 +41,7 @@ async def get_books(
 async def get_book(
     book_id: int,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    current_user: CurrentUser = Depends(get_current_user),
 ):
     """Kitob ma'lumotlari"""
     book = db.query(Book).filter(Book.id == book_id).first()
@@ -53,7 +53,7 @@ async def get_book(
 @router.get("/borrowed/list", response_model=List[dict])
 async def get_borrowed_books(
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    current_user: CurrentUser = Depends(get_current_user),
 ):
     """Olingan kitoblar ro'yxati"""
     borrows = db.query(BookBorrow).filter(BookBorrow.status == "borrowed").all()
@@ -74,7 +74,7 @@ async def get_borrowed_books(
 async def create_book(
     book_data: BookCreate,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_admin),
+    current_user: CurrentUser = Depends(get_current_active_admin),
 ):
     """Yangi kitob qo'shish"""
     # ISBN tekshirish
@@ -82,9 +82,10 @@ async def create_book(
     if existing:
         raise HTTPException(status_code=400, detail="ISBN already exists")
     
-    book = Book(**book_data.model_dump())
+    book = Book(**book_data.model_dump(), institution_id=current_user.institution_id)
     db.add(book)
     db.commit()
+    invalidate_dashboard(book.institution_id)
     db.refresh(book)
     return book
 
@@ -94,7 +95,7 @@ async def update_book(
     book_id: int,
     book_data: BookUpdate,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_admin),
+    current_user: CurrentUser = Depends(get_current_active_admin),
 ):
     """Kitob ma'lumotlarini yangilash"""
     book = db.query(Book).filter(Book.id == book_id).first()
@@ -105,7 +106,9 @@ async def update_book(
     for field, value in update_data.items():
         setattr(book, field, value)
     
+    institution_id = book.institution_id
     db.commit()
+    invalidate_dashboard(institution_id)
     db.refresh(book)
     return book
 
@@ -114,15 +117,17 @@ async def update_book(
 async def delete_book(
     book_id: int,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_admin),
+    current_user: CurrentUser = Depends(get_current_active_admin),
 ):
     """Kitobni o'chirish"""
     book = db.query(Book).filter(Book.id == book_id).first()
     if not book:
         raise HTTPException(status_code=404, detail="Book not found")
     
+    institution_id = book.institution_id
     db.delete(book)
     db.commit()
+    invalidate_dashboard(institution_id)
     return {"message": "Book deleted successfully"}
 
 
@@ -130,7 +135,7 @@ async def delete_book(
 async def borrow_book(
     borrow_data: BookBorrowCreate,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    current_user: CurrentUser = Depends(get_current_user),
 ):
     """Kitob olish"""
     book = db.query(Book).filter(Book.id == borrow_data.book_id).first()
@@ -148,7 +153,9 @@ async def borrow_book(
     book.available_copies -= 1
     book.borrowed_copies += 1
     
+    institution_id = book.institution_id
     db.commit()
+    invalidate_dashboard(institution_id)
     db.refresh(borrow)
     
     return {"message": "Book borrowed successfully", "borrow_id": borrow.id}
@@ -158,7 +165,7 @@ async def borrow_book(
 async def return_book(
     borrow_id: int,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    current_user: CurrentUser = Depends(get_current_user),
 ):
     """Kitobni qaytarish"""
     borrow = db.query(BookBorrow).filter(BookBorrow.id == borrow_id).first()
@@ -178,7 +185,9 @@ async def return_book(
     book.available_copies += 1
     book.borrowed_copies -= 1
     
+    institution_id = book.institution_id
     db.commit()
+    invalidate_dashboard(institution_id)
     
     return {"message": "Book returned successfully"}
 
@@ -1,36 +1,49 @@
-from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
-from sqlalchemy import func
-from app.database import get_db
-from app.models.user import User
+from datetime import date, timedelta
+from typing import Optional
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy import select, func
+from app.database import AsyncSessionLocal
 from app.models.student import Student
 from app.models.teacher import Teacher
 from app.models.book import Book
-from app.models.attendance import Attendance
-from app.models.department import Department
-from app.auth import get_current_user
+from app.models.attendance import AttendanceDailySummary
+from app.models.group import Group
+from app.auth import CurrentUser, get_current_user
+from app.utils.dashboard_cache import dashboard_cache
 
 router = APIRouter()
 
+# Hisoblashlar o'z session'ini ochadi: single-flight natijasi bir nechta so'rovga
+# tegishli bo'lgani uchun birinchi so'rovning session'iga bog'lanib qolmasligi kerak
 
-@router.get("/stats")
-async def get_dashboard_stats(
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
-):
-    """Dashboard umumiy statistika"""
-    total_students = db.query(func.count(Student.id)).scalar() or 0
-    total_teachers = db.query(func.count(Teacher.id)).scalar() or 0
-    total_books = db.query(func.count(Book.id)).scalar() or 0
-    
-    # Bugungi davomat
-    from datetime import date
+
+async def _compute_stats(institution_id: int) -> dict:
     today = date.today()
-    today_attendance = db.query(Attendance).filter(Attendance.date == today).all()
-    today_present = len([a for a in today_attendance if a.status == "present"])
-    today_total = len(today_attendance)
+    async with AsyncSessionLocal() as db:
+        total_students = await db.scalar(
+            select(func.count(Student.id)).where(Student.institution_id == institution_id)
+        ) or 0
+        total_teachers = await db.scalar(
+            select(func.count(Teacher.id)).where(Teacher.institution_id == institution_id)
+        ) or 0
+        total_books = await db.scalar(
+            select(func.count(Book.id)).where(Book.institution_id == institution_id)
+        ) or 0
+
+        # Bugungi davomat
+        today_present, today_absent = (await db.execute(
+            select(
+                func.coalesce(func.sum(AttendanceDailySummary.present), 0),
+                func.coalesce(func.sum(AttendanceDailySummary.absent), 0),
+            ).where(
+                AttendanceDailySummary.institution_id == institution_id,
+                AttendanceDailySummary.date == today,
+            )
+        )).one()
+
+    today_total = today_present + today_absent
     attendance_rate = (today_present / today_total * 100) if today_total > 0 else 0
-    
+
     return {
         "total_students": total_students,
         "total_teachers": total_teachers,
@@ -40,70 +53,156 @@ async def get_dashboard_stats(
     }
 
 
-@router.get("/attendance")
-async def get_attendance_stats(
-    days: int = 7,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
-):
-    """Davomat statistikasi (haftalik)"""
-    from datetime import date, timedelta
-    
+async def _compute_attendance(
+    institution_id: int,
+    days: int,
+    group: Optional[str],
+    department: Optional[str],
+    breakdown: Optional[str],
+) -> list:
+    today = date.today()
+    start_date = today - timedelta(days=days - 1)
+    summary = AttendanceDailySummary
+
+    # Yo'nalish guruh nomi orqali Group jadvalidan olinadi
+    department_column = Group.department
+    breakdown_column = {"group": summary.group, "department": department_column}.get(breakdown)
+    columns = [summary.date]
+    if breakdown_column is not None:
+        columns.append(breakdown_column)
+
+    # Bitta GROUP BY so'rov - kunlik yig'indi jadvalidan (qatorlar soni kunlar x guruhlar bilan cheklangan)
+    stmt = select(
+        *columns,
+        func.sum(summary.present),
+        func.sum(summary.absent),
+    ).where(
+        summary.institution_id == institution_id,
+        summary.date >= start_date,
+        summary.date <= today,
+    )
+    if department or breakdown == "department":
+        stmt = stmt.outerjoin(
+            Group,
+            (Group.institution_id == summary.institution_id) & (Group.name == summary.group),
+        )
+    if group:
+        stmt = stmt.where(summary.group == group)
+    if department:
+        stmt = stmt.where(department_column == department)
+    stmt = stmt.group_by(*columns)
+
+    totals = {}
+    details = {}
+    async with AsyncSessionLocal() as db:
+        result = await db.stream(stmt)
+        async for row in result:
+            if breakdown_column is None:
+                day, present, absent = row
+            else:
+                day, name, present, absent = row
+                details.setdefault(day, []).append({
+                    "name": name,
+                    "present": present,
+                    "absent": absent,
+                })
+            day_present, day_absent = totals.get(day, (0, 0))
+            totals[day] = (day_present + present, day_absent + absent)
+
     stats = []
     for i in range(days):
-        day = date.today() - timedelta(days=i)
-        attendance_records = db.query(Attendance).filter(Attendance.date == day).all()
-        
-        present = len([a for a in attendance_records if a.status == "present"])
-        absent = len([a for a in attendance_records if a.status == "absent"])
-        
-        stats.append({
+        day = today - timedelta(days=i)
+        present, absent = totals.get(day, (0, 0))
+        item = {
             "date": day.isoformat(),
             "present": present,
             "absent": absent,
-        })
-    
+        }
+        if breakdown_column is not None:
+            item["breakdown"] = sorted(details.get(day, []), key=lambda entry: entry["name"] or "")
+        stats.append(item)
     return stats
 
 
+async def _compute_students(institution_id: int) -> list:
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(
+            select(Student.department, func.count(Student.id).label("count"))
+            .where(Student.institution_id == institution_id)
+            .group_by(Student.department)
+        )
+        return [
+            {"name": dept, "value": count}
+            for dept, count in result.all()
+        ]
+
+
+async def _compute_books(institution_id: int) -> dict:
+    async with AsyncSessionLocal() as db:
+        total_books, total_available, total_borrowed, digital_books = (await db.execute(
+            select(
+                func.count(Book.id),
+                func.coalesce(func.sum(Book.available_copies), 0),
+                func.coalesce(func.sum(Book.borrowed_copies), 0),
+                func.count(Book.id).filter(Book.has_digital == True),
+            ).where(Book.institution_id == institution_id)
+        )).one()
+
+    return {
+        "total_books": total_books,
+        "total_available": total_available,
+        "total_borrowed": total_borrowed,
+        "digital_books": digital_books,
+    }
+
+
+@router.get("/stats")
+async def get_dashboard_stats(
+    current_user: CurrentUser = Depends(get_current_user),
+):
+    """Dashboard umumiy statistika"""
+    institution_id = current_user.institution_id
+    return await dashboard_cache.get_or_compute(
+        (institution_id, "stats"),
+        lambda: _compute_stats(institution_id),
+    )
+
+
+@router.get("/attendance")
+async def get_attendance_stats(
+    days: int = Query(7, ge=1, le=366),
+    group: Optional[str] = None,
+    department: Optional[str] = None,
+    breakdown: Optional[str] = Query(None, pattern="^(group|department)$"),
+    current_user: CurrentUser = Depends(get_current_user),
+):
+    """Davomat statistikasi (kunlar bo'yicha, ixtiyoriy guruh/yo'nalish kesimida)"""
+    institution_id = current_user.institution_id
+    return await dashboard_cache.get_or_compute(
+        (institution_id, "attendance", days, group, department, breakdown),
+        lambda: _compute_attendance(institution_id, days, group, department, breakdown),
+    )
+
+
 @router.get("/students")
 async def get_student_stats(
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    current_user: CurrentUser = Depends(get_current_user),
 ):
     """Talabalar statistikasi (yo'nalishlar bo'yicha)"""
-    from sqlalchemy import func
-    
-    stats = (
-        db.query(
-            Student.department,
-            func.count(Student.id).label("count")
-        )
-        .group_by(Student.department)
-        .all()
+    institution_id = current_user.institution_id
+    return await dashboard_cache.get_or_compute(
+        (institution_id, "students"),
+        lambda: _compute_students(institution_id),
     )
-    
-    return [
-        {"name": dept, "value": count}
-        for dept, count in stats
-    ]
 
 
 @router.get("/books")
 async def get_book_stats(
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    current_user: CurrentUser = Depends(get_current_user),
 ):
     """Kitoblar statistikasi"""
-    total_books = db.query(func.count(Book.id)).scalar() or 0
-    total_available = db.query(func.sum(Book.available_copies)).scalar() or 0
-    total_borrowed = db.query(func.sum(Book.borrowed_copies)).scalar() or 0
-    digital_books = db.query(func.count(Book.id)).filter(Book.has_digital == True).scalar() or 0
-    
-    return {
-        "total_books": total_books,
-        "total_available": total_available,
-        "total_borrowed": total_borrowed,
-        "digital_books": digital_books,
-    }
-
+    institution_id = current_user.institution_id
+    return await dashboard_cache.get_or_compute(
+        (institution_id, "books"),
+        lambda: _compute_books(institution_id),
+    )
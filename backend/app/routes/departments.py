@@ -2,10 +2,9 @@ from typing import List
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
 from app.database import get_db
-from app.models.user import User
 from app.models.department import Department
 from app.schemas.department import DepartmentCreate, DepartmentUpdate, DepartmentResponse
-from app.auth import get_current_user, get_current_active_admin
+from app.auth import CurrentUser, get_current_user, get_current_active_admin
 
 router = APIRouter()
 
@@ -13,7 +12,7 @@ router = APIRouter()
 @router.get("/", response_model=List[DepartmentResponse])
 async def get_departments(
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    current_user: CurrentUser = Depends(get_current_user),
 ):
     """Barcha yo'nalishlar ro'yxati"""
     departments = db.query(Department).filter(
@@ -27,7 +26,7 @@ async def get_departments(
 async def get_department(
     department_id: int,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    current_user: CurrentUser = Depends(get_current_user),
 ):
     """Yo'nalish ma'lumotlari"""
     department = db.query(Department).filter(Department.id == department_id).first()
@@ -40,7 +39,7 @@ async def get_department(
 async def create_department(
     department_data: DepartmentCreate,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_admin),
+    current_user: CurrentUser = Depends(get_current_active_admin),
 ):
     """Yangi yo'nalish qo'shish"""
     # Name va code tekshirish (faqat joriy institution'da)
@@ -73,7 +72,7 @@ async def update_department(
     department_id: int,
     department_data: DepartmentUpdate,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_admin),
+    current_user: CurrentUser = Depends(get_current_active_admin),
 ):
     """Yo'nalish ma'lumotlarini yangilash"""
     department = db.query(Department).filter(
@@ -96,7 +95,7 @@ async def update_department(
 async def delete_department(
     department_id: int,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_admin),
+    current_user: CurrentUser = Depends(get_current_active_admin),
 ):
     """Yo'nalishni o'chirish"""
     department = db.query(Department).filter(
@@ -1,23 +1,28 @@
 from typing import List, Optional
-from fastapi import APIRouter, Depends, HTTPException, Query, BackgroundTasks
-from sqlalchemy.orm import Session
-from sqlalchemy import and_, or_
+from fastapi import APIRouter, Depends, HTTPException, Query, BackgroundTasks, Response
+from sqlalchemy.orm import defer
+from sqlalchemy import DateTime, delete, literal, select, update, func, and_, or_
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import datetime, timedelta
-from app.database import get_db
-from app.models.user import User
-from app.models.exam import Exam, ExamAttempt
+from app.database import dialect_insert, get_async_db
+from app.models.exam import Exam, ExamAccess, ExamAttempt
 from app.models.student import Student
 from app.schemas.exam import (
-    ExamCreate, ExamUpdate, ExamResponse,
-    ExamAttemptCreate, ExamAttemptResponse, ExamAttemptSubmit
+    ExamCreate, ExamUpdate, ExamResponse, ExamListResponse,
+    ExamAttemptCreate, ExamAttemptResponse, ExamAttemptSubmit, ExamAttemptAutosave
 )
-from app.auth import get_current_user
+from app.auth import CurrentUser, get_current_user
 from app.models.user import UserRole
+from app.utils.keyset import NEXT_CURSOR_HEADER, apply_keyset, split_keyset_page
+from app.utils.exam_access import available_exams_query, student_ids, sync_exam_access
+from app.utils.answer_keys import AnswerKey, EXAM, cached_answer_key, get_answer_key, invalidate_answer_key, score_answers
+from app.utils.exam_payload import invalidate_exam_payload, public_exam_payload
+from app.utils.answer_autosave import answer_autosave
 import json
 
 router = APIRouter()
 
-
 def check_exam_access(exam: Exam, student: Student) -> tuple:
     """Talaba imtihonga kirish huquqiga ega ekanligini tekshirish"""
     from sqlalchemy import func
@@ -29,93 +34,111 @@ def check_exam_access(exam: Exam, student: Student) -> tuple:
     if now > exam.end_time and exam.auto_close:
         return False, "Imtihon muddati tugagan"
     
-    # Talabalar ro'yxati tekshiruvi
-    if exam.allowed_students:
-        allowed_ids = [s.get("id") for s in exam.allowed_students if s.get("id")]
-        if student.id not in allowed_ids:
-            return False, "Sizga bu imtihon uchun ruxsat berilmagan"
+    # Talabalar ro'yxati tekshiruvi (exam_access jadvali bilan bir xil qoida)
+    allowed_ids = student_ids(exam.allowed_students)
+    if allowed_ids and student.id not in allowed_ids:
+        return False, "Sizga bu imtihon uchun ruxsat berilmagan"
     
-    if exam.excluded_students:
-        excluded_ids = [s.get("id") for s in exam.excluded_students if s.get("id")]
-        if student.id in excluded_ids:
-            return False, "Siz bu imtihondan chetlashtirilgansiz"
+    if student.id in student_ids(exam.excluded_students):
+        return False, "Siz bu imtihondan chetlashtirilgansiz"
     
     return True, "OK"
 
 
-def calculate_exam_score(exam: Exam, answers: dict) -> tuple:
-    """Imtihon ballini hisoblash"""
-    total_score = 0
-    max_score = exam.total_points
-    
-    for question in exam.questions:
-        q_id = question.get("id")
-        if q_id not in answers:
-            continue
-        
-        student_answer = answers[q_id]
-        q_type = question.get("type")
-        q_points = question.get("points", 1)
-        
-        is_correct = False
-        
-        if q_type == "multiple_choice":
-            correct_option = next(
-                (opt for opt in question.get("options", []) if opt.get("is_correct")),
-                None
-            )
-            if correct_option and student_answer == correct_option.get("id"):
-                is_correct = True
-        elif q_type == "true_false":
-            if student_answer == question.get("correct_answer"):
-                is_correct = True
-        elif q_type == "short_answer":
-            # Short answer uchun to'liq mos kelishi kerak (keyinroq yaxshilash mumkin)
-            if str(student_answer).strip().lower() == str(question.get("correct_answer", "")).strip().lower():
-                is_correct = True
-        
-        if is_correct:
-            total_score += q_points
-    
-    percentage = int((total_score / max_score) * 100) if max_score > 0 else 0
-    return total_score, percentage
+async def load_exam_answer_key(db: AsyncSession, exam: Exam) -> AnswerKey:
+    """Imtihon javob kaliti - questions (defer qilingan) faqat kesh bo'sh bo'lsa yuklanadi"""
+    answer_key = cached_answer_key(EXAM, exam)
+    if answer_key is None:
+        await db.refresh(exam, ["questions"])
+        answer_key = get_answer_key(EXAM, exam)
+    return answer_key
+
 
+def open_attempt_statement(db: AsyncSession, exam: Exam, student: Student):
+    """
+    Ochiq urinishni yaratish yoki mavjudini qaytarish (INSERT ... SELECT ... ON CONFLICT ... RETURNING)
+
+    Urinish raqami va urinishlar chegarasi INSERT ichidagi subquery'da hisoblanadi, shu sabab
+    ikki marta bosish yoki qayta yuborilgan so'rovlar takroriy urinish yaratmaydi.
+    Chegara tugagan bo'lsa hech qanday qator qaytarilmaydi.
+    """
+    submitted_count = select(func.count(ExamAttempt.id)).where(
+        ExamAttempt.exam_id == exam.id,
+        ExamAttempt.student_id == student.id,
+        ExamAttempt.is_submitted == True
+    ).scalar_subquery()
+    
+    values = select(
+        literal(exam.id),
+        literal(student.id),
+        literal(f"{student.first_name} {student.last_name}"),
+        literal(student.student_id),
+        submitted_count + 1,
+        literal(exam.total_points),
+        literal(datetime.now(), DateTime(timezone=True)),
+        literal(False),
+        literal(False),
+    ).where(submitted_count < exam.max_attempts)
+    
+    stmt = dialect_insert(db, ExamAttempt).from_select(
+        ["exam_id", "student_id", "student_name", "student_student_id", "attempt_number",
+         "max_score", "started_at", "is_submitted", "is_completed"],
+        values,
+    )
+    # Mavjud ochiq urinishga tegmaslik uchun "bo'sh" update - RETURNING o'sha qatorni qaytaradi
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["exam_id", "student_id"],
+        index_where=ExamAttempt.is_submitted == False,
+        set_={"exam_id": stmt.excluded.exam_id},
+    )
+    return stmt.returning(ExamAttempt)
 
-@router.get("/", response_model=List[ExamResponse])
+
+@router.get("/", response_model=List[ExamListResponse])
 async def get_exams(
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=1000),
     subject: Optional[str] = None,
     group: Optional[str] = None,
     is_active: Optional[bool] = None,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    cursor: Optional[str] = Query(None, description="Keyset rejimi: birinchi sahifa uchun bo'sh, keyin X-Next-Cursor"),
+    response: Response = None,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: CurrentUser = Depends(get_current_user),
 ):
     """Barcha imtihonlar ro'yxati (O'qituvchi uchun)"""
-    query = db.query(Exam).filter(
+    # Savollar ro'yxatda kerak emas - katta JSON ustuni yuklanmaydi
+    query = select(Exam).options(defer(Exam.questions)).where(
         Exam.institution_id == current_user.institution_id
     )
     
     if current_user.role == UserRole.TEACHER:
-        query = query.filter(Exam.created_by == current_user.id)
+        query = query.where(Exam.created_by == current_user.id)
     
     if subject:
-        query = query.filter(Exam.subject == subject)
+        query = query.where(Exam.subject == subject)
     if group:
-        query = query.filter(Exam.group == group)
+        query = query.where(Exam.group == group)
     if is_active is not None:
-        query = query.filter(Exam.is_active == is_active)
+        query = query.where(Exam.is_active == is_active)
+    
+    if cursor is not None:
+        result = await db.execute(apply_keyset(db, query, Exam.created_at, Exam.id, cursor, limit))
+        exams, next_cursor = split_keyset_page(result.all(), limit)
+        if next_cursor:
+            response.headers[NEXT_CURSOR_HEADER] = next_cursor
+        return exams
     
-    exams = query.order_by(Exam.created_at.desc()).offset(skip).limit(limit).all()
-    return exams
+    result = await db.execute(query.order_by(Exam.created_at.desc()).offset(skip).limit(limit))
+    return result.scalars().all()
 
 
-@router.get("/available", response_model=List[ExamResponse])
+@router.get("/available", response_model=List[ExamListResponse])
 async def get_available_exams(
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=1000),
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: CurrentUser = Depends(get_current_user),
 ):
     """Talaba uchun mavjud imtihonlar"""
     if current_user.role != UserRole.TEACHER:
@@ -123,46 +146,33 @@ async def get_available_exams(
     
     # Talaba ma'lumotlarini olish (keyinroq Student model bilan bog'lash kerak)
     # Hozircha user_id orqali qidirish
-    student = db.query(Student).filter(
+    student = await db.scalar(select(Student).where(
         Student.email == current_user.email,
         Student.institution_id == current_user.institution_id
-    ).first()
+    ))
     
     if not student:
         return []
     
-    now = datetime.now()
-    query = db.query(Exam).filter(
-        Exam.institution_id == current_user.institution_id,
-        Exam.is_active == True,
-        Exam.start_time <= now,
-        Exam.end_time >= now
+    # Ruxsat/chetlashtirish exam_access jadvalidan - filtr va sahifalash to'liq SQL'da
+    query = available_exams_query(current_user.institution_id, student.id, datetime.now())
+    result = await db.execute(
+        query.options(defer(Exam.questions)).order_by(Exam.start_time, Exam.id).offset(skip).limit(limit)
     )
-    
-    available_exams = []
-    for exam in query.all():
-        access_result = check_exam_access(exam, student)
-        if isinstance(access_result, tuple):
-            has_access, _ = access_result
-        else:
-            has_access = access_result
-        if has_access:
-            available_exams.append(exam)
-    
-    return available_exams[skip:skip+limit]
+    return result.scalars().all()
 
 
 @router.get("/{exam_id}", response_model=ExamResponse)
 async def get_exam(
     exam_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: CurrentUser = Depends(get_current_user),
 ):
     """Imtihon ma'lumotlarini olish"""
-    exam = db.query(Exam).filter(
+    exam = await db.scalar(select(Exam).options(defer(Exam.questions)).where(
         Exam.id == exam_id,
         Exam.institution_id == current_user.institution_id
-    ).first()
+    ))
     
     if not exam:
         raise HTTPException(status_code=404, detail="Imtihon topilmadi")
@@ -171,14 +181,22 @@ async def get_exam(
     if current_user.role == UserRole.TEACHER and exam.created_by != current_user.id:
         raise HTTPException(status_code=403, detail="Ruxsat yo'q")
     
+    if current_user.role == UserRole.STUDENT:
+        # Talabaga javoblarsiz, oldindan serializatsiya qilingan JSON (ExamPublicResponse, cache'dan)
+        payload = await public_exam_payload(exam)
+        if payload is None:
+            raise HTTPException(status_code=404, detail="Imtihon topilmadi")
+        return Response(content=payload, media_type="application/json")
+    
+    await db.refresh(exam, ["questions"])
     return exam
 
 
 @router.post("/", response_model=ExamResponse)
 async def create_exam(
     exam_data: ExamCreate,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: CurrentUser = Depends(get_current_user),
 ):
     """Yangi imtihon yaratish (Faqat o'qituvchi)"""
     if current_user.role != UserRole.TEACHER:
@@ -189,16 +207,17 @@ async def create_exam(
         raise HTTPException(status_code=400, detail="Tugash vaqti boshlanish vaqtidan keyin bo'lishi kerak")
     
     exam = Exam(
-        **exam_data.model_dump(exclude={"questions"}),
-        questions=exam_data.questions,
+        **exam_data.model_dump(),
         institution_id=current_user.institution_id,
         created_by=current_user.id,
         created_by_name=f"{current_user.first_name} {current_user.last_name}"
     )
     
     db.add(exam)
-    db.commit()
-    db.refresh(exam)
+    await db.flush()
+    await sync_exam_access(db, exam)
+    await db.commit()
+    await db.refresh(exam)
     
     return exam
 
@@ -207,14 +226,14 @@ async def create_exam(
 async def update_exam(
     exam_id: int,
     exam_data: ExamUpdate,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: CurrentUser = Depends(get_current_user),
 ):
     """Imtihonni yangilash"""
-    exam = db.query(Exam).filter(
+    exam = await db.scalar(select(Exam).where(
         Exam.id == exam_id,
         Exam.institution_id == current_user.institution_id
-    ).first()
+    ))
     
     if not exam:
         raise HTTPException(status_code=404, detail="Imtihon topilmadi")
@@ -230,8 +249,15 @@ async def update_exam(
     for field, value in update_data.items():
         setattr(exam, field, value)
     
-    db.commit()
-    db.refresh(exam)
+    if "allowed_students" in update_data or "excluded_students" in update_data:
+        await sync_exam_access(db, exam)
+    
+    # Boshqa worker'lardagi keshlar (javob kaliti, savollar) yangi versiya bilan eskiradi
+    exam.version = Exam.version + 1
+    await db.commit()
+    invalidate_answer_key(EXAM, exam.id)
+    invalidate_exam_payload(exam.id)
+    await db.refresh(exam)
     
     return exam
 
@@ -239,14 +265,14 @@ async def update_exam(
 @router.delete("/{exam_id}")
 async def delete_exam(
     exam_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: CurrentUser = Depends(get_current_user),
 ):
     """Imtihonni o'chirish"""
-    exam = db.query(Exam).filter(
+    exam = await db.scalar(select(Exam).where(
         Exam.id == exam_id,
         Exam.institution_id == current_user.institution_id
-    ).first()
+    ))
     
     if not exam:
         raise HTTPException(status_code=404, detail="Imtihon topilmadi")
@@ -254,8 +280,11 @@ async def delete_exam(
     if current_user.role == UserRole.TEACHER and exam.created_by != current_user.id:
         raise HTTPException(status_code=403, detail="Ruxsat yo'q")
     
-    db.delete(exam)
-    db.commit()
+    await db.execute(delete(ExamAccess).where(ExamAccess.exam_id == exam.id))
+    await db.delete(exam)
+    await db.commit()
+    invalidate_answer_key(EXAM, exam_id)
+    invalidate_exam_payload(exam_id)
     
     return {"message": "Imtihon o'chirildi"}
 
@@ -264,18 +293,18 @@ async def delete_exam(
 @router.post("/{exam_id}/start", response_model=ExamAttemptResponse)
 async def start_exam_attempt(
     exam_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: CurrentUser = Depends(get_current_user),
 ):
     """Imtihonni boshlash"""
-    exam = db.query(Exam).filter(Exam.id == exam_id).first()
+    exam = await db.get(Exam, exam_id, options=[defer(Exam.questions)])
     if not exam:
         raise HTTPException(status_code=404, detail="Imtihon topilmadi")
     
-    student = db.query(Student).filter(
+    student = await db.scalar(select(Student).where(
         Student.email == current_user.email,
         Student.institution_id == current_user.institution_id
-    ).first()
+    ))
     
     if not student:
         raise HTTPException(status_code=404, detail="Talaba topilmadi")
@@ -284,39 +313,24 @@ async def start_exam_attempt(
     if not has_access:
         raise HTTPException(status_code=403, detail=message)
     
-    # Urinishlar sonini hisoblash
-    attempt_count = db.query(ExamAttempt).filter(
-        ExamAttempt.exam_id == exam_id,
-        ExamAttempt.student_id == student.id,
-        ExamAttempt.is_submitted == True
-    ).count()
-    
-    if attempt_count >= exam.max_attempts:
-        raise HTTPException(status_code=403, detail=f"Urinishlar soni tugagan (Maksimal: {exam.max_attempts})")
-    
-    # Faol urinishni tekshirish
-    active_attempt = db.query(ExamAttempt).filter(
-        ExamAttempt.exam_id == exam_id,
-        ExamAttempt.student_id == student.id,
-        ExamAttempt.is_submitted == False
-    ).first()
-    
-    if active_attempt:
-        return active_attempt
-    
-    attempt = ExamAttempt(
-        exam_id=exam_id,
-        student_id=student.id,
-        student_name=f"{student.first_name} {student.last_name}",
-        student_student_id=student.student_id,
-        attempt_number=attempt_count + 1,
-        max_score=exam.total_points,
-        started_at=datetime.now()
-    )
-    
-    db.add(attempt)
-    db.commit()
-    db.refresh(attempt)
+    # Bitta so'rov: topshirilgan urinishlar soni chegaradan kam bo'lsa yangi urinish qo'shiladi,
+    # ochiq urinish allaqachon bo'lsa (idx_attempt_open_unique) o'sha qaytariladi
+    stmt = open_attempt_statement(db, exam, student)
+    max_attempts = exam.max_attempts
+    for retry in (True, False):
+        try:
+            attempt = await db.scalar(stmt, execution_options={"populate_existing": True})
+            await db.commit()
+            break
+        except IntegrityError:
+            # Shu paytda ochiq urinish topshirildi va eski son bilan hisoblangan raqam band
+            # (idx_attempt_number_unique) - yangi holat bilan bir marta qayta hisoblanadi
+            await db.rollback()
+            if not retry:
+                raise HTTPException(status_code=409, detail="Urinish bir vaqtda o'zgardi, qayta urinib ko'ring")
+    
+    if attempt is None:
+        raise HTTPException(status_code=403, detail=f"Urinishlar soni tugagan (Maksimal: {max_attempts})")
     
     return attempt
 
@@ -325,35 +339,41 @@ async def start_exam_attempt(
 async def submit_exam_attempt(
     exam_id: int,
     submit_data: ExamAttemptSubmit,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: CurrentUser = Depends(get_current_user),
 ):
     """Imtihonni topshirish"""
-    exam = db.query(Exam).filter(Exam.id == exam_id).first()
+    exam = await db.get(Exam, exam_id, options=[defer(Exam.questions)])
     if not exam:
         raise HTTPException(status_code=404, detail="Imtihon topilmadi")
     
-    student = db.query(Student).filter(
+    student = await db.scalar(select(Student).where(
         Student.email == current_user.email,
         Student.institution_id == current_user.institution_id
-    ).first()
+    ))
     
     if not student:
         raise HTTPException(status_code=404, detail="Talaba topilmadi")
     
-    attempt = db.query(ExamAttempt).filter(
+    attempt = await db.scalar(select(ExamAttempt).where(
         ExamAttempt.exam_id == exam_id,
         ExamAttempt.student_id == student.id,
         ExamAttempt.is_submitted == False
-    ).order_by(ExamAttempt.started_at.desc()).first()
+    ).order_by(ExamAttempt.started_at.desc()).limit(1))
     
     if not attempt:
         raise HTTPException(status_code=404, detail="Aktiv urinish topilmadi")
     
+    # Autosave buferidagi hali yozilmagan javoblar ham qo'shiladi (topshirilgan javoblar ustun).
+    # Davom etayotgan yozish tugashi kutiladi va u yozgan javoblar uchun qator qayta o'qiladi
+    buffered = await answer_autosave.drain(attempt.id)
+    await db.refresh(attempt, ["answers"])
+    answers = {**(attempt.answers or {}), **(buffered or {}), **submit_data.answers}
+    
     # Ballarni hisoblash
-    score, percentage = calculate_exam_score(exam, submit_data.answers)
+    score, percentage = score_answers(await load_exam_answer_key(db, exam), answers)
     
-    attempt.answers = submit_data.answers
+    attempt.answers = answers
     attempt.score = score
     attempt.percentage = percentage
     attempt.time_spent_minutes = submit_data.time_spent_minutes
@@ -361,41 +381,111 @@ async def submit_exam_attempt(
     attempt.is_submitted = True
     attempt.is_completed = True
     
-    db.commit()
-    db.refresh(attempt)
+    await db.commit()
+    await db.refresh(attempt)
     
     return attempt
 
 
+@router.put("/{exam_id}/autosave", status_code=204)
+async def autosave_exam_answers(
+    exam_id: int,
+    autosave_data: ExamAttemptAutosave,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: CurrentUser = Depends(get_current_user),
+):
+    """Javoblarni oraliq saqlash (buferlanadi, bazaga bir necha sekundda bir marta yoziladi)"""
+    # Ochiq urinish har safar bazadan aniqlanadi (process ichidagi keshda topshirilgan urinish
+    # boshqa worker'larda eskirib qolardi): bitta indeksli SELECT, yozuvlar baribir buferlanadi
+    attempt_id = await db.scalar(select(ExamAttempt.id).join(
+        Student, Student.id == ExamAttempt.student_id
+    ).where(
+        ExamAttempt.exam_id == exam_id,
+        ExamAttempt.is_submitted == False,
+        Student.email == current_user.email,
+        Student.institution_id == current_user.institution_id
+    ).order_by(ExamAttempt.started_at.desc()).limit(1))
+    
+    if attempt_id is None:
+        raise HTTPException(status_code=404, detail="Aktiv urinish topilmadi")
+    
+    if autosave_data.answers:
+        answer_autosave.add(attempt_id, autosave_data.answers)
+    
+    return Response(status_code=204)
+
+
 @router.get("/{exam_id}/attempts", response_model=List[ExamAttemptResponse])
 async def get_exam_attempts(
     exam_id: int,
     student_id: Optional[int] = None,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: CurrentUser = Depends(get_current_user),
 ):
     """Imtihon urinishlarini olish"""
-    exam = db.query(Exam).filter(Exam.id == exam_id).first()
+    exam = await db.get(Exam, exam_id, options=[defer(Exam.questions)])
     if not exam:
         raise HTTPException(status_code=404, detail="Imtihon topilmadi")
     
     if current_user.role == UserRole.TEACHER and exam.created_by != current_user.id:
         raise HTTPException(status_code=403, detail="Ruxsat yo'q")
     
-    query = db.query(ExamAttempt).filter(ExamAttempt.exam_id == exam_id)
+    query = select(ExamAttempt).where(ExamAttempt.exam_id == exam_id)
     
     if current_user.role == UserRole.TEACHER:
         # Talaba faqat o'z urinishlarini ko'radi
-        student = db.query(Student).filter(
+        student = await db.scalar(select(Student).where(
             Student.email == current_user.email,
             Student.institution_id == current_user.institution_id
-        ).first()
+        ))
         if student:
-            query = query.filter(ExamAttempt.student_id == student.id)
+            query = query.where(ExamAttempt.student_id == student.id)
     
     if student_id:
-        query = query.filter(ExamAttempt.student_id == student_id)
+        query = query.where(ExamAttempt.student_id == student_id)
     
-    attempts = query.order_by(ExamAttempt.started_at.desc()).all()
-    return attempts
+    result = await db.execute(query.order_by(ExamAttempt.started_at.desc()))
+    return result.scalars().all()
+
 
+@router.post("/{exam_id}/regrade")
+async def regrade_exam_attempts(
+    exam_id: int,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: CurrentUser = Depends(get_current_user),
+):
+    """Topshirilgan barcha urinishlarni joriy savollar bo'yicha qayta baholash"""
+    exam = await db.scalar(select(Exam).where(
+        Exam.id == exam_id,
+        Exam.institution_id == current_user.institution_id
+    ))
+    
+    if not exam:
+        raise HTTPException(status_code=404, detail="Imtihon topilmadi")
+    
+    if current_user.role not in [UserRole.TEACHER, UserRole.ADMIN]:
+        raise HTTPException(status_code=403, detail="Ruxsat yo'q")
+    if current_user.role == UserRole.TEACHER and exam.created_by != current_user.id:
+        raise HTTPException(status_code=403, detail="Ruxsat yo'q")
+    
+    answer_key = get_answer_key(EXAM, exam)
+    result = await db.execute(select(
+        ExamAttempt.id, ExamAttempt.answers, ExamAttempt.score, ExamAttempt.percentage, ExamAttempt.max_score
+    ).where(
+        ExamAttempt.exam_id == exam_id,
+        ExamAttempt.is_submitted == True
+    ))
+    
+    attempts = result.all()
+    changes = []
+    for attempt_id, answers, old_score, old_percentage, old_max_score in attempts:
+        score, percentage = score_answers(answer_key, answers)
+        if (score, percentage, answer_key.total_points) != (old_score, old_percentage, old_max_score):
+            changes.append({"id": attempt_id, "score": score, "percentage": percentage, "max_score": answer_key.total_points})
+    
+    if changes:
+        # Faqat o'zgargan urinishlar - primary key bo'yicha bitta executemany UPDATE
+        await db.execute(update(ExamAttempt), changes)
+        await db.commit()
+    
+    return {"regraded": len(attempts), "changed": len(changes)}
@@ -1,17 +1,56 @@
-from typing import List, Optional
-from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
+from typing import List, Literal, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from sqlalchemy import select, and_, case, func
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import date
-from app.database import get_db
-from app.models.user import User
+from app.database import get_async_db, dialect_insert
 from app.models.grade import Grade
 from app.models.student import Student
 from app.models.attendance import Attendance
-from app.schemas.grade import GradeCreate, GradeUpdate, GradeResponse
-from app.auth import get_current_user
+from app.models.audit_log import ActionType
+from app.schemas.grade import (
+    GradeCreate, GradeUpdate, GradeResponse,
+    GradeBulkCreate, GradeBulkResponse, GradeBulkError,
+)
+from app.auth import CurrentUser, get_current_user
+from app.utils.keyset import NEXT_CURSOR_HEADER, apply_keyset, split_keyset_page
+from app.utils.export import export_response, iter_query_rows, xlsx_overflow, xlsx_overflow_error
+from app.utils.audit import record_audit
 
 router = APIRouter()
 
+GRADE_CONFLICT_DETAIL = "Bu talabaga shu dars uchun shu turdagi baho allaqachon qo'yilgan"
+
+
+async def commit_grade(db: AsyncSession):
+    """
+    Baho o'zgarishini saqlash - idx_grade_lesson_unique buzilsa 409 (500 emas)
+
+    Parallel yaratish yoki baho turini mavjud boshqa bahoga o'zgartirish shunday tugaydi.
+    """
+    try:
+        await db.commit()
+    except IntegrityError:
+        await db.rollback()
+        raise HTTPException(status_code=409, detail=GRADE_CONFLICT_DETAIL)
+
+
+def filter_grade_query(query, current_user: CurrentUser, date_filter, group, department, subject, student_id):
+    """Ro'yxat va eksport uchun umumiy filterlar"""
+    query = query.where(Grade.institution_id == current_user.institution_id)
+    if date_filter:
+        query = query.where(Grade.date == date_filter)
+    if group:
+        query = query.where(Grade.group == group)
+    if department:
+        query = query.where(Grade.department == department)
+    if subject:
+        query = query.where(Grade.subject == subject)
+    if student_id:
+        query = query.where(Grade.student_id == student_id)
+    return query
+
 
 @router.get("/", response_model=List[GradeResponse])
 async def get_grades(
@@ -22,45 +61,95 @@ async def get_grades(
     department: Optional[str] = None,
     subject: Optional[str] = None,
     student_id: Optional[int] = None,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    cursor: Optional[str] = Query(None, description="Keyset rejimi: birinchi sahifa uchun bo'sh, keyin X-Next-Cursor"),
+    response: Response = None,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: CurrentUser = Depends(get_current_user),
 ):
     """Barcha baholar ro'yxati"""
-    query = db.query(Grade).filter(Grade.institution_id == current_user.institution_id)
+    query = filter_grade_query(
+        select(Grade), current_user, date_filter, group, department, subject, student_id
+    )
     
-    if date_filter:
-        query = query.filter(Grade.date == date_filter)
-    if group:
-        query = query.filter(Grade.group == group)
-    if department:
-        query = query.filter(Grade.department == department)
-    if subject:
-        query = query.filter(Grade.subject == subject)
-    if student_id:
-        query = query.filter(Grade.student_id == student_id)
+    if cursor is not None:
+        result = await db.execute(apply_keyset(db, query, Grade.created_at, Grade.id, cursor, limit))
+        grades, next_cursor = split_keyset_page(result.all(), limit)
+        if next_cursor:
+            response.headers[NEXT_CURSOR_HEADER] = next_cursor
+        return grades
     
-    grades = query.order_by(Grade.date.desc()).offset(skip).limit(limit).all()
-    return grades
+    result = await db.execute(query.order_by(Grade.date.desc()).offset(skip).limit(limit))
+    return result.scalars().all()
+
+
+@router.get("/export")
+async def export_grades(
+    request: Request,
+    export_format: str = Query("csv", alias="format", pattern="^(csv|xlsx)$"),
+    date_filter: Optional[date] = None,
+    group: Optional[str] = None,
+    department: Optional[str] = None,
+    subject: Optional[str] = None,
+    student_id: Optional[int] = None,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: CurrentUser = Depends(get_current_user),
+):
+    """Baholarni eksport qilish (CSV/XLSX)"""
+    query = filter_grade_query(
+        select(
+            Grade.date,
+            Grade.group,
+            Grade.department,
+            Grade.subject,
+            Grade.student_student_id,
+            Grade.student_name,
+            Grade.grade,
+            Grade.grade_type,
+            Grade.description,
+        ),
+        current_user, date_filter, group, department, subject, student_id,
+    ).order_by(Grade.date, Grade.group, Grade.subject, Grade.id)
+    
+    description = (
+        f"format={export_format}, date={date_filter}, group={group}, "
+        f"department={department}, subject={subject}, student_id={student_id}"
+    )
+    overflow = await xlsx_overflow(db, export_format, query)
+    if overflow is not None:
+        description += f", rad etildi: {overflow} qator XLSX chegarasidan oshadi"
+    await record_audit(
+        db, current_user, ActionType.EXPORT, "grade",
+        description=description,
+        request=request,
+    )
+    if overflow is not None:
+        raise xlsx_overflow_error(overflow)
+    return export_response(
+        export_format,
+        f"baholar_{date.today().isoformat()}",
+        ["Sana", "Guruh", "Yo'nalish", "Fan", "Talaba ID", "Talaba", "Baho", "Baho turi", "Izoh"],
+        iter_query_rows(query, tuple),
+    )
 
 
 @router.get("/student/{student_id}", response_model=List[GradeResponse])
 async def get_grades_by_student(
     student_id: int,
     subject: Optional[str] = None,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: CurrentUser = Depends(get_current_user),
 ):
     """Talaba bo'yicha baholar"""
-    query = db.query(Grade).filter(
+    query = select(Grade).where(
         Grade.student_id == student_id,
         Grade.institution_id == current_user.institution_id
     )
     
     if subject:
-        query = query.filter(Grade.subject == subject)
+        query = query.where(Grade.subject == subject)
     
-    grades = query.order_by(Grade.date.desc()).all()
-    return grades
+    result = await db.execute(query.order_by(Grade.date.desc()))
+    return result.scalars().all()
 
 
 @router.get("/group/{group}/subject/{subject}/date/{grade_date}", response_model=List[GradeResponse])
@@ -68,44 +157,44 @@ async def get_grades_by_group_subject_date(
     group: str,
     subject: str,
     grade_date: date,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: CurrentUser = Depends(get_current_user),
 ):
     """Guruh, fan va sana bo'yicha baholar"""
-    grades = db.query(Grade).filter(
+    result = await db.execute(select(Grade).where(
         Grade.group == group,
         Grade.subject == subject,
         Grade.date == grade_date,
         Grade.institution_id == current_user.institution_id
-    ).all()
-    return grades
+    ))
+    return result.scalars().all()
 
 
 @router.post("/", response_model=GradeResponse)
 async def create_grade(
     grade_data: GradeCreate,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: CurrentUser = Depends(get_current_user),
 ):
     """Yangi baho qo'shish"""
     # Talaba mavjudligini tekshirish
-    student = db.query(Student).filter(
+    student = await db.scalar(select(Student).where(
         Student.id == grade_data.student_id,
         Student.institution_id == current_user.institution_id
-    ).first()
+    ))
     
     if not student:
         raise HTTPException(status_code=404, detail="Student not found")
     
     # Talaba uchun davomat olinganligini tekshirish
-    attendance = db.query(Attendance).filter(
+    attendance = await db.scalar(select(Attendance).where(
         Attendance.student_id == grade_data.student_id,
         Attendance.date == grade_data.date,
         Attendance.group == grade_data.group,
         Attendance.subject == grade_data.subject,
         Attendance.institution_id == current_user.institution_id,
         Attendance.status == "present"
-    ).first()
+    ))
     
     if not attendance:
         raise HTTPException(
@@ -114,21 +203,21 @@ async def create_grade(
         )
     
     # Mavjud baho yozuvini tekshirish
-    existing = db.query(Grade).filter(
+    existing = await db.scalar(select(Grade).where(
         Grade.student_id == grade_data.student_id,
         Grade.date == grade_data.date,
         Grade.group == grade_data.group,
         Grade.subject == grade_data.subject,
         Grade.grade_type == grade_data.grade_type,
         Grade.institution_id == current_user.institution_id
-    ).first()
+    ))
     
     if existing:
         # Update qilish
         existing.grade = grade_data.grade
         existing.description = grade_data.description
-        db.commit()
-        db.refresh(existing)
+        await db.commit()
+        await db.refresh(existing)
         return existing
     else:
         # Yangi yaratish
@@ -136,23 +225,110 @@ async def create_grade(
         grade_dict['institution_id'] = current_user.institution_id
         grade = Grade(**grade_dict)
         db.add(grade)
-        db.commit()
-        db.refresh(grade)
+        await commit_grade(db)
+        await db.refresh(grade)
         return grade
 
 
+@router.post("/bulk", response_model=GradeBulkResponse)
+async def create_grades_bulk(
+    bulk_data: GradeBulkCreate,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: CurrentUser = Depends(get_current_user),
+):
+    """Butun guruh baholarini bitta tranzaksiyada saqlash (upsert, har bir qator uchun xatolar)"""
+    # Bir talaba ikki marta yuborilsa - oxirgisi olinadi
+    items = {item.student_id: item for item in bulk_data.grades}
+    student_ids = list(items)
+    
+    # Talaba mavjudligi va davomat ("present") - bitta JOIN so'rov bilan
+    result = await db.execute(
+        select(Student, Attendance.id)
+        .outerjoin(Attendance, and_(
+            Attendance.student_id == Student.id,
+            Attendance.institution_id == current_user.institution_id,
+            Attendance.date == bulk_data.date,
+            Attendance.group == bulk_data.group,
+            Attendance.subject == bulk_data.subject,
+            Attendance.status == "present",
+        ))
+        .where(
+            Student.id.in_(student_ids),
+            Student.institution_id == current_user.institution_id
+        )
+    )
+    found = {student.id: (student, attendance_id) for student, attendance_id in result.all()}
+    
+    rows = []
+    errors = []
+    for student_id, item in items.items():
+        if student_id not in found:
+            errors.append(GradeBulkError(student_id=student_id, detail="Student not found"))
+            continue
+        student, attendance_id = found[student_id]
+        if attendance_id is None:
+            errors.append(GradeBulkError(
+                student_id=student_id,
+                detail="Talaba uchun avval davomat olinishi kerak. Faqat qatnashgan talabalarga baho qo'yish mumkin."
+            ))
+            continue
+        rows.append({
+            "institution_id": current_user.institution_id,
+            "student_id": student_id,
+            "student_name": f"{student.first_name} {student.last_name}",
+            "student_student_id": student.student_id,
+            "group": bulk_data.group,
+            "department": bulk_data.department,
+            "subject": bulk_data.subject,
+            "date": bulk_data.date,
+            "grade": item.grade,
+            "grade_type": bulk_data.grade_type,
+            "description": item.description,
+        })
+    
+    saved = []
+    if rows:
+        stmt = dialect_insert(db, Grade).values(rows)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["institution_id", "student_id", "date", "group", "subject", "grade_type"],
+            set_={
+                "grade": stmt.excluded.grade,
+                "description": stmt.excluded.description,
+                "updated_at": func.now(),
+            },
+        )
+        await db.execute(stmt)
+        await db.commit()
+        
+        result = await db.execute(
+            select(Grade)
+            .where(
+                Grade.institution_id == current_user.institution_id,
+                Grade.student_id.in_([row["student_id"] for row in rows]),
+                Grade.date == bulk_data.date,
+                Grade.group == bulk_data.group,
+                Grade.subject == bulk_data.subject,
+                Grade.grade_type == bulk_data.grade_type,
+            )
+            .execution_options(populate_existing=True)
+        )
+        saved = result.scalars().all()
+    
+    return GradeBulkResponse(saved=saved, errors=errors)
+
+
 @router.put("/{grade_id}", response_model=GradeResponse)
 async def update_grade(
     grade_id: int,
     grade_data: GradeUpdate,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: CurrentUser = Depends(get_current_user),
 ):
     """Bahoni yangilash"""
-    grade = db.query(Grade).filter(
+    grade = await db.scalar(select(Grade).where(
         Grade.id == grade_id,
         Grade.institution_id == current_user.institution_id
-    ).first()
+    ))
     
     if not grade:
         raise HTTPException(status_code=404, detail="Grade not found")
@@ -161,78 +337,132 @@ async def update_grade(
     for field, value in update_data.items():
         setattr(grade, field, value)
     
-    db.commit()
-    db.refresh(grade)
+    await commit_grade(db)
+    await db.refresh(grade)
     return grade
 
 
 @router.delete("/{grade_id}")
 async def delete_grade(
     grade_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: CurrentUser = Depends(get_current_user),
 ):
     """Bahoni o'chirish"""
-    grade = db.query(Grade).filter(
+    grade = await db.scalar(select(Grade).where(
         Grade.id == grade_id,
         Grade.institution_id == current_user.institution_id
-    ).first()
+    ))
     
     if not grade:
         raise HTTPException(status_code=404, detail="Grade not found")
     
-    db.delete(grade)
-    db.commit()
+    await db.delete(grade)
+    await db.commit()
     return {"message": "Grade deleted successfully"}
 
 
+def grade_aggregate_columns():
+    """Baho statistikasi ustunlari - bitta so'rovda AVG va SUM(CASE ...) bo'yicha"""
+    return (
+        func.count(Grade.id).label("total"),
+        func.avg(Grade.grade).label("average"),
+        func.sum(case((Grade.grade >= 90, 1), else_=0)).label("excellent"),  # 5 (90-100)
+        func.sum(case((and_(Grade.grade >= 75, Grade.grade < 90), 1), else_=0)).label("good"),  # 4 (75-89)
+        func.sum(case((and_(Grade.grade >= 60, Grade.grade < 75), 1), else_=0)).label("satisfactory"),  # 3 (60-74)
+        func.sum(case((Grade.grade < 60, 1), else_=0)).label("unsatisfactory"),  # 2 (0-59)
+    )
+
+
+def grade_statistics_dict(row) -> dict:
+    """Aggregate qatorini javob formatiga o'tkazish"""
+    return {
+        "total": row.total or 0,
+        "average": round(row.average or 0, 2),
+        "excellent": row.excellent or 0,
+        "good": row.good or 0,
+        "satisfactory": row.satisfactory or 0,
+        "unsatisfactory": row.unsatisfactory or 0,
+    }
+
+
+def grade_month_column(db: AsyncSession):
+    """Sanadan oy kalitini (YYYY-MM) olish - dialect'ga qarab"""
+    if db.get_bind().dialect.name == "postgresql":
+        return func.to_char(Grade.date, "YYYY-MM")
+    return func.strftime("%Y-%m", Grade.date)
+
+
 @router.get("/statistics/group/{group}/subject/{subject}")
 async def get_grade_statistics(
     group: str,
     subject: str,
     date_from: Optional[date] = None,
     date_to: Optional[date] = None,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: CurrentUser = Depends(get_current_user),
 ):
     """Guruh va fan bo'yicha baho statistikasi"""
-    query = db.query(Grade).filter(
+    query = select(*grade_aggregate_columns()).where(
         Grade.group == group,
         Grade.subject == subject,
         Grade.institution_id == current_user.institution_id
     )
     
     if date_from:
-        query = query.filter(Grade.date >= date_from)
+        query = query.where(Grade.date >= date_from)
     if date_to:
-        query = query.filter(Grade.date <= date_to)
-    
-    grades = query.all()
+        query = query.where(Grade.date <= date_to)
     
-    if not grades:
-        return {
-            "total": 0,
-            "average": 0,
-            "excellent": 0,  # 5 (90-100)
-            "good": 0,  # 4 (75-89)
-            "satisfactory": 0,  # 3 (60-74)
-            "unsatisfactory": 0,  # 2 (0-59)
-        }
+    result = await db.execute(query)
+    return grade_statistics_dict(result.one())
+
+
+@router.get("/statistics/breakdown")
+async def get_grade_statistics_breakdown(
+    group_by: Literal["student", "grade_type", "month"] = Query(..., description="Guruhlash: student, grade_type, month"),
+    group: Optional[str] = None,
+    department: Optional[str] = None,
+    subject: Optional[str] = None,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: CurrentUser = Depends(get_current_user),
+):
+    """Baho statistikasi - talaba, baho turi yoki oy bo'yicha (semestr hisobotlari uchun)"""
+    if group_by == "student":
+        keys = (
+            Grade.student_id.label("student_id"),
+            func.max(Grade.student_name).label("student_name"),
+            func.max(Grade.student_student_id).label("student_student_id"),
+        )
+        group_columns = (Grade.student_id,)
+    elif group_by == "grade_type":
+        keys = (Grade.grade_type.label("grade_type"),)
+        group_columns = (Grade.grade_type,)
+    else:
+        month = grade_month_column(db)
+        keys = (month.label("month"),)
+        group_columns = (month,)
     
-    total = len(grades)
-    total_grade = sum(g.grade for g in grades)
-    average = total_grade / total if total > 0 else 0
+    query = select(*keys, *grade_aggregate_columns()).where(
+        Grade.institution_id == current_user.institution_id
+    )
     
-    excellent = len([g for g in grades if g.grade >= 90])
-    good = len([g for g in grades if 75 <= g.grade < 90])
-    satisfactory = len([g for g in grades if 60 <= g.grade < 75])
-    unsatisfactory = len([g for g in grades if g.grade < 60])
+    if group:
+        query = query.where(Grade.group == group)
+    if department:
+        query = query.where(Grade.department == department)
+    if subject:
+        query = query.where(Grade.subject == subject)
+    if date_from:
+        query = query.where(Grade.date >= date_from)
+    if date_to:
+        query = query.where(Grade.date <= date_to)
     
-    return {
-        "total": total,
-        "average": round(average, 2),
-        "excellent": excellent,
-        "good": good,
-        "satisfactory": satisfactory,
-        "unsatisfactory": unsatisfactory,
-    }
+    result = await db.execute(query.group_by(*group_columns).order_by(*group_columns))
+    key_names = [key.name for key in keys]
+    return [
+        {**{name: row._mapping[name] for name in key_names}, **grade_statistics_dict(row)}
+        for row in result.all()
+    ]
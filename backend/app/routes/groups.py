@@ -2,10 +2,10 @@ from typing import List, Optional
 from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
 from app.database import get_db
-from app.models.user import User
 from app.models.group import Group
 from app.schemas.group import GroupCreate, GroupUpdate, GroupResponse
-from app.auth import get_current_user, get_current_active_admin
+from app.auth import CurrentUser, get_current_user, get_current_active_admin
+from app.utils.dashboard_cache import invalidate_dashboard
 
 router = APIRouter()
 
@@ -17,7 +17,7 @@ async def get_groups(
     department: Optional[str] = None,
     status: Optional[str] = None,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    current_user: CurrentUser = Depends(get_current_user),
 ):
     """Barcha guruhlar ro'yxati"""
     query = db.query(Group).filter(Group.institution_id == current_user.institution_id)
@@ -36,7 +36,7 @@ async def get_groups(
 async def get_group(
     group_id: int,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    current_user: CurrentUser = Depends(get_current_user),
 ):
     """Guruh ma'lumotlari"""
     group = db.query(Group).filter(
@@ -52,7 +52,7 @@ async def get_group(
 async def create_group(
     group_data: GroupCreate,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_admin),
+    current_user: CurrentUser = Depends(get_current_active_admin),
 ):
     """Yangi guruh qo'shish"""
     # Name va code tekshirish (faqat joriy institution'da)
@@ -76,6 +76,7 @@ async def create_group(
     group = Group(**group_data_dict)
     db.add(group)
     db.commit()
+    invalidate_dashboard(current_user.institution_id)
     db.refresh(group)
     return group
 
@@ -85,7 +86,7 @@ async def update_group(
     group_id: int,
     group_data: GroupUpdate,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_admin),
+    current_user: CurrentUser = Depends(get_current_active_admin),
 ):
     """Guruh ma'lumotlarini yangilash"""
     group = db.query(Group).filter(
@@ -117,6 +118,7 @@ async def update_group(
         setattr(group, field, value)
     
     db.commit()
+    invalidate_dashboard(current_user.institution_id)
     db.refresh(group)
     return group
 
@@ -125,7 +127,7 @@ async def update_group(
 async def delete_group(
     group_id: int,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_admin),
+    current_user: CurrentUser = Depends(get_current_active_admin),
 ):
     """Guruhni o'chirish"""
     group = db.query(Group).filter(
@@ -137,5 +139,6 @@ async def delete_group(
     
     db.delete(group)
     db.commit()
+    invalidate_dashboard(current_user.institution_id)
     return {"message": "Group deleted successfully"}
 
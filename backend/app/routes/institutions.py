@@ -2,10 +2,9 @@ from typing import List
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
 from app.database import get_db
-from app.models.user import User
 from app.models.institution import Institution
 from app.schemas.institution import InstitutionCreate, InstitutionUpdate, InstitutionResponse
-from app.auth import get_current_user, get_current_active_admin
+from app.auth import CurrentUser, get_current_user, get_current_active_admin
 
 router = APIRouter()
 
@@ -13,7 +12,7 @@ router = APIRouter()
 @router.get("/", response_model=List[InstitutionResponse])
 async def get_institutions(
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    current_user: CurrentUser = Depends(get_current_user),
 ):
     """Barcha muassasalar ro'yxati (faqat admin ko'ra oladi)"""
     if current_user.role != "admin":
@@ -27,7 +26,7 @@ async def get_institutions(
 async def get_institution(
     institution_id: int,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    current_user: CurrentUser = Depends(get_current_user),
 ):
     """Muassasa ma'lumotlari"""
     institution = db.query(Institution).filter(Institution.id == institution_id).first()
@@ -45,7 +44,7 @@ async def get_institution(
 async def create_institution(
     institution_data: InstitutionCreate,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_admin),
+    current_user: CurrentUser = Depends(get_current_active_admin),
 ):
     """Yangi muassasa yaratish (faqat admin)"""
     # Code uniqueness tekshirish
@@ -65,7 +64,7 @@ async def update_institution(
     institution_id: int,
     institution_data: InstitutionUpdate,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_admin),
+    current_user: CurrentUser = Depends(get_current_active_admin),
 ):
     """Muassasa ma'lumotlarini yangilash (faqat admin)"""
     institution = db.query(Institution).filter(Institution.id == institution_id).first()
@@ -89,7 +88,7 @@ async def update_institution(
 async def delete_institution(
     institution_id: int,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_admin),
+    current_user: CurrentUser = Depends(get_current_active_admin),
 ):
     """Muassasani o'chirish (faqat admin)"""
     institution = db.query(Institution).filter(Institution.id == institution_id).first()
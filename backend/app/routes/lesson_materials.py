@@ -1,17 +1,29 @@
 from typing import List, Optional
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form, Query, Request
-from fastapi.responses import FileResponse
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, UploadFile, File, Form, Path as PathParam, Query, Request
+from sqlalchemy import select
+from sqlalchemy.orm import Session, selectinload
 import os
 import uuid
+from datetime import datetime, timezone
+from urllib.parse import urlencode
 from pathlib import Path
 from jose import jwt, JWTError
 from app.database import get_db
 from app.models.user import User
-from app.models.lesson_material import LessonMaterial
-from app.schemas.lesson_material import LessonMaterialCreate, LessonMaterialUpdate, LessonMaterialResponse
-from app.auth import get_current_user
+from app.models.lesson_material import LessonMaterial, LessonMaterialContent
+from app.schemas.lesson_material import (
+    LessonMaterialCreate, LessonMaterialUpdate, LessonMaterialResponse, LessonMaterialSearchResult,
+)
+from app.auth import CurrentUser, get_current_user
 from app.config import settings
+from app.utils.uploads import UploadTooLarge, receive_upload, discard_upload
+from app.utils.blob_store import blob_key, claim_blob, confirm_blob, release_blob, store_blob, thumbnail_key
+from app.utils.file_response import conditional_file_response, conditional_response, file_chunks, storage_file_response
+from app.utils.storage import get_storage
+from app.utils.material_preview import process_material_content
+from app.utils.material_search import apply_material_search
+from app.utils.signed_url import sign_material_view, verify_material_view, verify_thumbnail
+from app.utils.zip_bundle import BundleFile, ZipBundle, unique_names
 
 router = APIRouter()
 
@@ -22,6 +34,15 @@ UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
 # Ruxsat etilgan fayl turlari
 ALLOWED_EXTENSIONS = {".pdf", ".doc", ".docx", ".ppt", ".pptx"}
 MAX_FILE_SIZE = 5 * 1024 * 1024  # 5 MB in bytes
+MAX_BUNDLE_FILES = 200  # Bitta ZIP arxivdagi materiallar chegarasi
+
+MEDIA_TYPES = {
+    'pdf': 'application/pdf',
+    'doc': 'application/msword',
+    'docx': 'application/vnd.openxmlformats-officedocument.wordprocessingml.document',
+    'ppt': 'application/vnd.ms-powerpoint',
+    'pptx': 'application/vnd.openxmlformats-officedocument.presentationml.presentation',
+}
 
 
 def get_file_extension(filename: str) -> str:
@@ -42,7 +63,7 @@ async def get_lesson_materials(
     group: Optional[str] = None,
     department: Optional[str] = None,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    current_user: CurrentUser = Depends(get_current_user),
 ):
     """Barcha dars materiallari ro'yxati"""
     query = db.query(LessonMaterial).filter(
@@ -56,15 +77,159 @@ async def get_lesson_materials(
     if department:
         query = query.filter(LessonMaterial.department == department)
     
-    materials = query.order_by(LessonMaterial.created_at.desc()).offset(skip).limit(limit).all()
+    materials = query.options(selectinload(LessonMaterial.preview)).order_by(
+        LessonMaterial.created_at.desc()
+    ).offset(skip).limit(limit).all()
     return materials
 
 
+@router.get("/search", response_model=List[LessonMaterialSearchResult])
+async def search_lesson_materials(
+    q: str = Query(..., min_length=2, max_length=200),
+    subject: Optional[str] = None,
+    group: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=100),
+    db: Session = Depends(get_db),
+    current_user: CurrentUser = Depends(get_current_user),
+):
+    """Dars materiallari ichidagi matn bo'yicha qidirish"""
+    stmt = select(LessonMaterial).join(
+        LessonMaterialContent, LessonMaterialContent.content_hash == LessonMaterial.content_hash
+    ).where(LessonMaterial.institution_id == current_user.institution_id)
+    if subject:
+        stmt = stmt.where(LessonMaterial.subject == subject)
+    if group:
+        stmt = stmt.where(LessonMaterial.group == group)
+    
+    stmt, ordering, snippet = apply_material_search(stmt, q)
+    rows = db.execute(
+        stmt.add_columns(snippet.label("snippet"))
+        .options(selectinload(LessonMaterial.preview))
+        .order_by(ordering, LessonMaterial.id.desc())
+        .limit(limit)
+    ).all()
+    
+    results = []
+    for material, snippet_text in rows:
+        result = LessonMaterialSearchResult.model_validate(material)
+        result.snippet = snippet_text
+        results.append(result)
+    return results
+
+
+@router.get("/thumbnails/{content_hash}")
+async def get_lesson_material_thumbnail(
+    request: Request,
+    content_hash: str = PathParam(..., pattern="^[0-9a-f]{64}$"),
+    exp: int = Query(...),
+    sig: str = Query(...),
+):
+    """
+    Material birinchi sahifasining eskizi (xesh bo'yicha - o'zgarmas, uzoq keshlanadi)
+    
+    Havola material ro'yxatida (muassasa bo'yicha) imzolanadi - <img> JWT yubora olmaydi
+    """
+    if not verify_thumbnail(content_hash, exp, sig):
+        raise HTTPException(status_code=403, detail="Invalid or expired link")
+    try:
+        return await storage_file_response(
+            request,
+            get_storage(),
+            thumbnail_key(content_hash),
+            expires_in=settings.S3_PRESIGN_EXPIRE_SECONDS,
+            # Eskiz fonda yaratiladi - yo'q bo'lsa mijozga 404 (presigned havola emas)
+            check_exists=True,
+            media_type="image/webp",
+            filename=f"{content_hash[:12]}.webp",
+            inline=True,
+            # Eskiz manba xeshidan bir xil yaratiladi - ETag sifatida xesh ishlatiladi
+            content_hash=f"{content_hash}-thumb",
+        )
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Thumbnail not found")
+
+
+async def _bundle_file(material: LessonMaterial, name: str) -> Optional[BundleFile]:
+    """Material uchun arxiv yozuvi (fayl topilmasa None)"""
+    mtime = material.created_at.timestamp() if material.created_at else None
+    if material.content_hash:
+        storage = get_storage()
+        key = blob_key(material.content_hash)
+        stored = await storage.stat(key)
+        if stored is None:
+            return None
+        return BundleFile(
+            name, material.content_hash, stored.size, mtime or stored.mtime, material.file_type,
+            lambda start, length: storage.iter_chunks(key, start, length),
+        )
+    path = material.file_path
+    if not path or not os.path.isfile(path):
+        return None
+    st = os.stat(path)
+    return BundleFile(
+        name, f"{path}:{st.st_size}:{st.st_mtime_ns}", st.st_size, mtime or st.st_mtime, material.file_type,
+        lambda start, length: file_chunks(path, start, st.st_size - start if length is None else length),
+    )
+
+
+@router.get("/bundle")
+async def download_lesson_materials_bundle(
+    request: Request,
+    subject: Optional[str] = None,
+    group: Optional[str] = None,
+    department: Optional[str] = None,
+    db: Session = Depends(get_db),
+    current_user: CurrentUser = Depends(get_current_user),
+):
+    """Filtrga mos barcha materiallarni bitta ZIP qilib yuklab olish (Range bilan davom ettiriladi)"""
+    query = db.query(LessonMaterial).filter(
+        LessonMaterial.institution_id == current_user.institution_id
+    )
+    if subject:
+        query = query.filter(LessonMaterial.subject == subject)
+    if group:
+        query = query.filter(LessonMaterial.group == group)
+    if department:
+        query = query.filter(LessonMaterial.department == department)
+    
+    # Tartib barqaror bo'lishi kerak - aks holda arxiv baytlari (va ETag) o'zgaradi
+    materials = query.order_by(LessonMaterial.id).limit(MAX_BUNDLE_FILES + 1).all()
+    if len(materials) > MAX_BUNDLE_FILES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Too many materials for one archive (max {MAX_BUNDLE_FILES}). Narrow the filters",
+        )
+    
+    names = unique_names([material.file_name for material in materials])
+    files = []
+    for material, name in zip(materials, names):
+        bundle_file = await _bundle_file(material, name)
+        if bundle_file is not None:
+            files.append(bundle_file)
+    if not files:
+        raise HTTPException(status_code=404, detail="No lesson materials found")
+    
+    bundle = ZipBundle(files)
+    await bundle.prepare()
+    filename = "_".join(part for part in (subject, group, department) if part) or "materiallar"
+    return conditional_response(
+        request,
+        size=bundle.size,
+        mtime=max(file.mtime for file in files),
+        open_range=bundle.iter_range,
+        media_type="application/zip",
+        filename=f"{filename}.zip",
+        content_hash=bundle.etag,
+        # Filtr natijasi o'zgarishi mumkin - har safar ETag bilan tekshiriladi
+        extra_headers={"Cache-Control": "private, no-cache"},
+    )
+
+
 @router.get("/{material_id}", response_model=LessonMaterialResponse)
 async def get_lesson_material(
     material_id: int,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    current_user: CurrentUser = Depends(get_current_user),
 ):
     """Dars materiali ma'lumotlari"""
     material = db.query(LessonMaterial).filter(
@@ -78,6 +243,7 @@ async def get_lesson_material(
 
 @router.post("/", response_model=LessonMaterialResponse)
 async def create_lesson_material(
+    background_tasks: BackgroundTasks,
     file: UploadFile = File(...),
     subject: str = Form(...),
     group: str = Form(...),
@@ -85,7 +251,7 @@ async def create_lesson_material(
     title: str = Form(...),
     description: Optional[str] = Form(None),
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    current_user: CurrentUser = Depends(get_current_user),
 ):
     """Yangi dars materiali yuklash"""
     
@@ -96,29 +262,21 @@ async def create_lesson_material(
             detail=f"Ruxsat etilmagan fayl turi. Faqat quyidagilar ruxsat etiladi: {', '.join(ALLOWED_EXTENSIONS)}"
         )
     
-    # Fayl hajmini tekshirish
-    file_content = await file.read()
-    file_size = len(file_content)
-    
-    if file_size > MAX_FILE_SIZE:
+    # Faylni bo'laklab vaqtinchalik faylga yozish (hajm yozish davomida tekshiriladi)
+    try:
+        received = await receive_upload(file, UPLOAD_DIR, MAX_FILE_SIZE)
+    except UploadTooLarge:
         raise HTTPException(
-            status_code=400,
-            detail=f"Fayl hajmi juda katta. Maksimal hajm: 5 MB. Sizning faylingiz: {file_size / 1024 / 1024:.2f} MB"
+            status_code=413,
+            detail=f"Fayl hajmi juda katta. Maksimal hajm: {MAX_FILE_SIZE // 1024 // 1024} MB"
         )
-    
-    # Fayl nomini yaratish (unique bo'lishi uchun)
-    file_extension = get_file_extension(file.filename)
-    unique_filename = f"{uuid.uuid4()}{file_extension}"
-    file_path = UPLOAD_DIR / unique_filename
-    
-    # Faylni saqlash
-    try:
-        with open(file_path, "wb") as f:
-            f.write(file_content)
-    except Exception as e:
+    except OSError as e:
         raise HTTPException(status_code=500, detail=f"Faylni saqlashda xatolik: {str(e)}")
+    file_size = received.size
+    file_extension = get_file_extension(file.filename)
+    content_hash = received.sha256
     
-    # Database'ga yozish
+    # Kontent bo'yicha saqlash (bir xil fayl bir marta) va database'ga yozish
     material = LessonMaterial(
         institution_id=current_user.institution_id,
         subject=subject,
@@ -127,25 +285,72 @@ async def create_lesson_material(
         title=title,
         description=description,
         file_name=file.filename,
-        file_path=str(file_path),
+        file_path=blob_key(content_hash),
+        content_hash=content_hash,
         file_size=file_size / 1024 / 1024,  # MB da
         file_type=file_extension[1:],  # .pdf -> pdf
         uploaded_by=current_user.id,
         uploaded_by_name=f"{current_user.first_name} {current_user.last_name}",
     )
     
+    # Fayl omborga, keyin qator (havolasiz qolgan fayl GC belgisi shu tranzaksiyada olinadi)
+    media_type = MEDIA_TYPES.get(file_extension[1:])
+    try:
+        await store_blob(received, media_type)
+    except Exception as e:
+        await discard_upload(received)
+        raise HTTPException(status_code=500, detail=f"Faylni saqlashda xatolik: {str(e)}")
+    
     db.add(material)
-    db.commit()
+    claim_blob(db, content_hash)
+    try:
+        db.commit()
+    except Exception:
+        db.rollback()
+        # Yangi joylangan fayl hech kimga tegishli bo'lmay qolmasligi uchun - GC o'chiradi
+        release_blob(db, content_hash)
+        db.commit()
+        await discard_upload(received)
+        raise HTTPException(status_code=500, detail="Materialni saqlashda xatolik")
+    
+    # GC shu orada faylni o'chirgan bo'lsa qayta joylanadi
+    try:
+        await confirm_blob(received, media_type)
+    except Exception as e:
+        await discard_upload(received)
+        raise HTTPException(status_code=500, detail=f"Faylni saqlashda xatolik: {str(e)}")
+    
     db.refresh(material)
     
+    # Matn va eskiz javobdan keyin fonda (bir xil fayl uchun faqat bir marta) yaratiladi
+    background_tasks.add_task(process_material_content, content_hash, material.file_type)
+    
     return material
 
 
+async def _material_file_response(request: Request, content_hash: Optional[str], legacy_path: Optional[str], **kwargs):
+    """Material faylini qaytarish - kontent omboridan yoki eski (xeshsiz) lokal fayldan"""
+    try:
+        if content_hash:
+            return await storage_file_response(
+                request,
+                get_storage(),
+                blob_key(content_hash),
+                expires_in=settings.S3_PRESIGN_EXPIRE_SECONDS,
+                content_hash=content_hash,
+                **kwargs,
+            )
+        return await conditional_file_response(request, legacy_path, **kwargs)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="File not found on server")
+
+
 @router.get("/{material_id}/download")
 async def download_lesson_material(
     material_id: int,
+    request: Request,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    current_user: CurrentUser = Depends(get_current_user),
 ):
     """Dars materialini yuklab olish"""
     material = db.query(LessonMaterial).filter(
@@ -156,14 +361,51 @@ async def download_lesson_material(
     if not material:
         raise HTTPException(status_code=404, detail="Lesson material not found")
     
-    file_path = Path(material.file_path)
-    if not file_path.exists():
-        raise HTTPException(status_code=404, detail="File not found on server")
-    
-    return FileResponse(
-        path=str(file_path),
+    return await _material_file_response(
+        request,
+        material.content_hash,
+        material.file_path,
+        media_type='application/octet-stream',
         filename=material.file_name,
-        media_type='application/octet-stream'
+    )
+
+
+@router.get("/{material_id}/view-url")
+async def get_lesson_material_view_url(
+    material_id: int,
+    db: Session = Depends(get_db),
+    current_user: CurrentUser = Depends(get_current_user),
+):
+    """Dars materialini ko'rish uchun imzolangan qisqa muddatli havola"""
+    material = db.query(LessonMaterial).filter(
+        LessonMaterial.id == material_id,
+        LessonMaterial.institution_id == current_user.institution_id
+    ).first()
+    
+    if not material:
+        raise HTTPException(status_code=404, detail="Lesson material not found")
+    
+    params = sign_material_view(material, settings.MATERIAL_VIEW_URL_TTL_SECONDS)
+    return {
+        "path": f"/lesson-materials/{material.id}/view?{urlencode(params)}",
+        "expires_at": datetime.fromtimestamp(params["exp"], tz=timezone.utc).isoformat(),
+    }
+
+
+async def _serve_signed_view(request: Request, material_id: int, exp: int, data: str, sig: str):
+    """Imzolangan havola bo'yicha faylni berish - bazaga murojaat qilinmaydi"""
+    signed = verify_material_view(material_id, exp, data, sig)
+    if signed is None:
+        raise HTTPException(status_code=403, detail="Invalid or expired link")
+    
+    return await _material_file_response(
+        request,
+        signed.content_hash,
+        signed.file_path,
+        media_type=MEDIA_TYPES.get(signed.file_type.lower(), 'application/octet-stream'),
+        filename=signed.file_name,
+        inline=True,
+        extra_headers={'X-Content-Type-Options': 'nosniff'},
     )
 
 
@@ -172,9 +414,18 @@ async def view_lesson_material(
     material_id: int,
     request: Request,
     token: Optional[str] = Query(None),
+    exp: Optional[int] = Query(None),
+    d: Optional[str] = Query(None),
+    sig: Optional[str] = Query(None),
     db: Session = Depends(get_db),
 ):
     """Dars materialini ko'rsatish (inline viewing)"""
+    # Imzolangan havola (view-url) - session ochilsa ham so'rov yuborilmaydi
+    if sig is not None:
+        if exp is None or d is None:
+            raise HTTPException(status_code=403, detail="Invalid or expired link")
+        return await _serve_signed_view(request, material_id, exp, d, sig)
+    
     # Token'ni query parameter yoki header'dan olish (iframe uchun)
     auth_token = token
     if not auth_token:
@@ -210,32 +461,17 @@ async def view_lesson_material(
     if not material:
         raise HTTPException(status_code=404, detail="Lesson material not found")
     
-    file_path = Path(material.file_path)
-    if not file_path.exists():
-        raise HTTPException(status_code=404, detail="File not found on server")
-    
     # Media type'ni fayl turiga qarab belgilash
-    media_types = {
-        'pdf': 'application/pdf',
-        'doc': 'application/msword',
-        'docx': 'application/vnd.openxmlformats-officedocument.wordprocessingml.document',
-        'ppt': 'application/vnd.ms-powerpoint',
-        'pptx': 'application/vnd.openxmlformats-officedocument.presentationml.presentation',
-    }
+    media_type = MEDIA_TYPES.get(material.file_type.lower(), 'application/octet-stream')
     
-    media_type = media_types.get(material.file_type.lower(), 'application/octet-stream')
-    
-    # CORS headers qo'shish (iframe uchun kerak)
-    headers = {
-        'Content-Disposition': f'inline; filename="{material.file_name}"',
-        'X-Content-Type-Options': 'nosniff',
-    }
-    
-    return FileResponse(
-        path=str(file_path),
-        filename=material.file_name,
+    return await _material_file_response(
+        request,
+        material.content_hash,
+        material.file_path,
         media_type=media_type,
-        headers=headers
+        filename=material.file_name,
+        inline=True,
+        extra_headers={'X-Content-Type-Options': 'nosniff'},
     )
 
 
@@ -244,7 +480,7 @@ async def update_lesson_material(
     material_id: int,
     material_data: LessonMaterialUpdate,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    current_user: CurrentUser = Depends(get_current_user),
 ):
     """Dars materiali ma'lumotlarini yangilash"""
     material = db.query(LessonMaterial).filter(
@@ -272,7 +508,7 @@ async def update_lesson_material(
 async def delete_lesson_material(
     material_id: int,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    current_user: CurrentUser = Depends(get_current_user),
 ):
     """Dars materialini o'chirish"""
     material = db.query(LessonMaterial).filter(
@@ -287,15 +523,20 @@ async def delete_lesson_material(
     if material.uploaded_by != current_user.id and current_user.role.value != "admin":
         raise HTTPException(status_code=403, detail="You don't have permission to delete this material")
     
-    # Faylni o'chirish
+    content_hash = material.content_hash
     file_path = Path(material.file_path)
-    if file_path.exists():
-        try:
-            file_path.unlink()
-        except Exception as e:
-            print(f"Faylni o'chirishda xatolik: {str(e)}")
     
     db.delete(material)
+    if content_hash:
+        # Kontent ombori fayli GC tomonidan (boshqa havola qolmagan bo'lsa) o'chiriladi
+        release_blob(db, content_hash)
     db.commit()
+    
+    # Xeshsiz (eski) yuklangan fayl
+    try:
+        if not content_hash and file_path.exists():
+            file_path.unlink()
+    except Exception as e:
+        print(f"Faylni o'chirishda xatolik: {str(e)}")
     return {"message": "Lesson material deleted successfully"}
 
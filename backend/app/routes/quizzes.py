@@ -1,54 +1,23 @@
 from typing import List, Optional
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from sqlalchemy import update
 from sqlalchemy.orm import Session
 from datetime import datetime
 from app.database import get_db
-from app.models.user import User
 from app.models.quiz import Quiz, QuizResult
 from app.models.student import Student
 from app.schemas.quiz import QuizCreate, QuizUpdate, QuizResponse, QuizResultCreate, QuizResultResponse
-from app.auth import get_current_user
+from app.auth import CurrentUser, get_current_user
 from app.models.user import UserRole
-from app.routes.exams import calculate_exam_score
+from app.utils.answer_keys import QUIZ, get_answer_key, invalidate_answer_key, score_answers
+from app.utils.keyset import NEXT_CURSOR_HEADER, apply_keyset, split_keyset_page
 
 router = APIRouter()
 
 
 def calculate_quiz_score(quiz: Quiz, answers: dict) -> tuple:
-    """Test ballini hisoblash (exam bilan bir xil)"""
-    total_score = 0
-    max_score = quiz.total_points
-    
-    for question in quiz.questions:
-        q_id = question.get("id")
-        if q_id not in answers:
-            continue
-        
-        student_answer = answers[q_id]
-        q_type = question.get("type")
-        q_points = question.get("points", 1)
-        
-        is_correct = False
-        
-        if q_type == "multiple_choice":
-            correct_option = next(
-                (opt for opt in question.get("options", []) if opt.get("is_correct")),
-                None
-            )
-            if correct_option and student_answer == correct_option.get("id"):
-                is_correct = True
-        elif q_type == "true_false":
-            if student_answer == question.get("correct_answer"):
-                is_correct = True
-        elif q_type == "short_answer":
-            if str(student_answer).strip().lower() == str(question.get("correct_answer", "")).strip().lower():
-                is_correct = True
-        
-        if is_correct:
-            total_score += q_points
-    
-    percentage = int((total_score / max_score) * 100) if max_score > 0 else 0
-    return total_score, percentage
+    """Test ballini hisoblash (exam bilan bir xil, keshlangan javob kaliti bo'yicha)"""
+    return score_answers(get_answer_key(QUIZ, quiz), answers)
 
 
 @router.get("/", response_model=List[QuizResponse])
@@ -59,8 +28,10 @@ async def get_quizzes(
     department: Optional[str] = None,
     is_premium: Optional[bool] = None,
     is_active: Optional[bool] = None,
+    cursor: Optional[str] = Query(None, description="Keyset rejimi: birinchi sahifa uchun bo'sh, keyin X-Next-Cursor"),
+    response: Response = None,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    current_user: CurrentUser = Depends(get_current_user),
 ):
     """Barcha testlar ro'yxati"""
     query = db.query(Quiz).filter(
@@ -75,6 +46,13 @@ async def get_quizzes(
     if is_premium is not None:
         query = query.filter(Quiz.is_premium == is_premium)
     
+    if cursor is not None:
+        rows = apply_keyset(db, query, Quiz.created_at, Quiz.id, cursor, limit).all()
+        quizzes, next_cursor = split_keyset_page(rows, limit)
+        if next_cursor:
+            response.headers[NEXT_CURSOR_HEADER] = next_cursor
+        return quizzes
+    
     quizzes = query.order_by(Quiz.created_at.desc()).offset(skip).limit(limit).all()
     return quizzes
 
@@ -85,7 +63,7 @@ async def get_my_quiz_results(
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=1000),
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    current_user: CurrentUser = Depends(get_current_user),
 ):
     """Talaba uchun o'z test natijalari"""
     student = db.query(Student).filter(
@@ -111,7 +89,7 @@ async def get_my_quiz_results(
 async def get_quiz(
     quiz_id: int,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    current_user: CurrentUser = Depends(get_current_user),
 ):
     """Test ma'lumotlarini olish"""
     quiz = db.query(Quiz).filter(
@@ -130,15 +108,14 @@ async def get_quiz(
 async def create_quiz(
     quiz_data: QuizCreate,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    current_user: CurrentUser = Depends(get_current_user),
 ):
     """Yangi test yaratish (O'qituvchi yoki Admin)"""
     if current_user.role not in [UserRole.TEACHER, UserRole.ADMIN]:
         raise HTTPException(status_code=403, detail="Ruxsat yo'q")
     
     quiz = Quiz(
-        **quiz_data.model_dump(exclude={"questions"}),
-        questions=quiz_data.questions,
+        **quiz_data.model_dump(),
         institution_id=current_user.institution_id,
         created_by=current_user.id,
         created_by_name=f"{current_user.first_name} {current_user.last_name}"
@@ -156,7 +133,7 @@ async def update_quiz(
     quiz_id: int,
     quiz_data: QuizUpdate,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    current_user: CurrentUser = Depends(get_current_user),
 ):
     """Testni yangilash"""
     quiz = db.query(Quiz).filter(
@@ -178,7 +155,10 @@ async def update_quiz(
     for field, value in update_data.items():
         setattr(quiz, field, value)
     
+    # Boshqa worker'lardagi javob kaliti keshi yangi versiya bilan eskiradi
+    quiz.version = Quiz.version + 1
     db.commit()
+    invalidate_answer_key(QUIZ, quiz.id)
     db.refresh(quiz)
     
     return quiz
@@ -188,7 +168,7 @@ async def update_quiz(
 async def delete_quiz(
     quiz_id: int,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    current_user: CurrentUser = Depends(get_current_user),
 ):
     """Testni o'chirish"""
     quiz = db.query(Quiz).filter(
@@ -204,6 +184,7 @@ async def delete_quiz(
     
     db.delete(quiz)
     db.commit()
+    invalidate_answer_key(QUIZ, quiz_id)
     
     return {"message": "Test o'chirildi"}
 
@@ -213,7 +194,7 @@ async def submit_quiz(
     quiz_id: int,
     result_data: QuizResultCreate,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    current_user: CurrentUser = Depends(get_current_user),
 ):
     """Testni topshirish va natijani saqlash"""
     quiz = db.query(Quiz).filter(
@@ -261,7 +242,7 @@ async def get_quiz_results(
     quiz_id: int,
     student_id: Optional[int] = None,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    current_user: CurrentUser = Depends(get_current_user),
 ):
     """Test natijalarini olish (O'qituvchi uchun)"""
     quiz = db.query(Quiz).filter(Quiz.id == quiz_id).first()
@@ -279,3 +260,41 @@ async def get_quiz_results(
     results = query.order_by(QuizResult.completed_at.desc()).all()
     return results
 
+
+@router.post("/{quiz_id}/regrade")
+async def regrade_quiz_results(
+    quiz_id: int,
+    db: Session = Depends(get_db),
+    current_user: CurrentUser = Depends(get_current_user),
+):
+    """Barcha natijalarni joriy savollar bo'yicha qayta baholash"""
+    quiz = db.query(Quiz).filter(
+        Quiz.id == quiz_id,
+        Quiz.institution_id == current_user.institution_id
+    ).first()
+    
+    if not quiz:
+        raise HTTPException(status_code=404, detail="Test topilmadi")
+    
+    if current_user.role not in [UserRole.TEACHER, UserRole.ADMIN]:
+        raise HTTPException(status_code=403, detail="Ruxsat yo'q")
+    if current_user.role == UserRole.TEACHER and quiz.created_by != current_user.id:
+        raise HTTPException(status_code=403, detail="Ruxsat yo'q")
+    
+    answer_key = get_answer_key(QUIZ, quiz)
+    results = db.query(
+        QuizResult.id, QuizResult.answers, QuizResult.score, QuizResult.percentage, QuizResult.max_score
+    ).filter(QuizResult.quiz_id == quiz_id).all()
+    
+    changes = []
+    for result_id, answers, old_score, old_percentage, old_max_score in results:
+        score, percentage = score_answers(answer_key, answers)
+        if (score, percentage, answer_key.total_points) != (old_score, old_percentage, old_max_score):
+            changes.append({"id": result_id, "score": score, "percentage": percentage, "max_score": answer_key.total_points})
+    
+    if changes:
+        # Faqat o'zgargan natijalar - primary key bo'yicha bitta executemany UPDATE
+        db.execute(update(QuizResult), changes)
+        db.commit()
+    
+    return {"regraded": len(results), "changed": len(changes)}
@@ -2,10 +2,9 @@ from typing import List, Optional
 from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
 from app.database import get_db
-from app.models.user import User
 from app.models.schedule import Schedule
 from app.schemas.schedule import ScheduleCreate, ScheduleUpdate, ScheduleResponse
-from app.auth import get_current_user, get_current_active_admin
+from app.auth import CurrentUser, get_current_user, get_current_active_admin
 
 router = APIRouter()
 
@@ -17,7 +16,7 @@ async def get_schedules(
     group: Optional[str] = None,
     day: Optional[str] = None,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    current_user: CurrentUser = Depends(get_current_user),
 ):
     """Barcha dars jadvallari"""
     query = db.query(Schedule).filter(Schedule.institution_id == current_user.institution_id)
@@ -35,7 +34,7 @@ async def get_schedules(
 async def get_schedule(
     schedule_id: int,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    current_user: CurrentUser = Depends(get_current_user),
 ):
     """Dars jadvali ma'lumotlari"""
     schedule = db.query(Schedule).filter(
@@ -51,7 +50,7 @@ async def get_schedule(
 async def get_schedules_by_group(
     group: str,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    current_user: CurrentUser = Depends(get_current_user),
 ):
     """Guruh bo'yicha dars jadvallari"""
     schedules = db.query(Schedule).filter(
@@ -65,7 +64,7 @@ async def get_schedules_by_group(
 async def create_schedule(
     schedule_data: ScheduleCreate,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_admin),
+    current_user: CurrentUser = Depends(get_current_active_admin),
 ):
     """Yangi dars jadvali qo'shish"""
     schedule_dict = schedule_data.model_dump()
@@ -82,7 +81,7 @@ async def update_schedule(
     schedule_id: int,
     schedule_data: ScheduleUpdate,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_admin),
+    current_user: CurrentUser = Depends(get_current_active_admin),
 ):
     """Dars jadvalini yangilash"""
     schedule = db.query(Schedule).filter(
@@ -105,7 +104,7 @@ async def update_schedule(
 async def delete_schedule(
     schedule_id: int,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_admin),
+    current_user: CurrentUser = Depends(get_current_active_admin),
 ):
     """Dars jadvalini o'chirish"""
     schedule = db.query(Schedule).filter(
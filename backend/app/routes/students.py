@@ -1,21 +1,41 @@
 from typing import List, Optional
+from datetime import date
 from fastapi import APIRouter, Depends, HTTPException, Query, Request
-from sqlalchemy.orm import Session
-from sqlalchemy import func
+from sqlalchemy import select, delete, func
+from sqlalchemy.ext.asyncio import AsyncSession
 from slowapi import Limiter
 from slowapi.util import get_remote_address
-from app.database import get_db
+from app.database import get_async_db
 from app.models.user import User, UserRole
 from app.models.student import Student
-from app.schemas.student import StudentCreate, StudentUpdate, StudentResponse
+from app.models.audit_log import ActionType
+from app.schemas.student import StudentCreate, StudentUpdate, StudentResponse, StudentSuggestion
 from app.schemas.pagination import PaginatedResponse, PaginationMeta
-from app.auth import get_current_user, get_current_active_admin, get_password_hash
+from app.utils.attendance_summary import apply_summary_deltas, summary_rollup_select
+from app.utils.dashboard_cache import invalidate_dashboard
+from app.utils.student_search import apply_student_search
+from app.utils.keyset import apply_keyset, split_keyset_page, estimate_count
+from app.utils.export import export_response, iter_query_rows, xlsx_overflow, xlsx_overflow_error
+from app.utils.audit import record_audit
+from app.auth import CurrentUser, get_current_user, get_current_active_admin, get_password_hash_async, invalidate_principal
 from app.config import settings
 
 router = APIRouter()
 limiter = Limiter(key_func=get_remote_address)
 
 
+def filter_student_query(query, current_user: CurrentUser, group, department, status):
+    """Ro'yxat va eksport uchun umumiy filterlar (faqat joriy institution'ning talabalari)"""
+    query = query.where(Student.institution_id == current_user.institution_id)
+    if group:
+        query = query.where(Student.group == group)
+    if department:
+        query = query.where(Student.department == department)
+    if status:
+        query = query.where(Student.status == status)
+    return query
+
+
 @router.get("/", response_model=PaginatedResponse[StudentResponse])
 @limiter.limit(f"{settings.API_RATE_LIMIT_PER_MINUTE}/minute")
 async def get_students(
@@ -26,55 +46,136 @@ async def get_students(
     department: Optional[str] = None,
     status: Optional[str] = None,
     search: Optional[str] = None,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    cursor: Optional[str] = Query(None, description="Keyset rejimi: birinchi sahifa uchun bo'sh, keyin meta.next_cursor"),
+    estimate_total: bool = Query(False, description="Aniq son o'rniga taxminiy son qaytarish"),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: CurrentUser = Depends(get_current_user),
 ):
     """Barcha talabalar ro'yxati (pagination bilan)"""
-    # Base query - faqat joriy institution'ning talabalari
-    query = db.query(Student).filter(Student.institution_id == current_user.institution_id)
-    
-    # Filterlar
-    if group:
-        query = query.filter(Student.group == group)
-    if department:
-        query = query.filter(Student.department == department)
-    if status:
-        query = query.filter(Student.status == status)
+    if cursor is not None and search:
+        raise HTTPException(status_code=400, detail="Cursor pagination is not supported with search")
+
+    # Base query va filterlar
+    query = filter_student_query(select(Student), current_user, group, department, status)
     
-    # Qidirish (ism, familiya, email, student_id bo'yicha)
+    # Qidirish (ism, familiya, email, student_id bo'yicha) - indeksli, relevantlik bo'yicha
+    rank = None
     if search:
-        search_filter = (
-            Student.first_name.ilike(f"%{search}%") |
-            Student.last_name.ilike(f"%{search}%") |
-            Student.email.ilike(f"%{search}%") |
-            Student.student_id.ilike(f"%{search}%")
-        )
-        query = query.filter(search_filter)
+        query, rank = apply_student_search(query, search)
     
     # Total count (filterlardan keyin)
-    total = query.count()
+    if estimate_total:
+        total = await estimate_count(db, query)
+    else:
+        total = await db.scalar(select(func.count()).select_from(query.subquery()))
     
     # Pagination
-    skip = (page - 1) * limit
-    students = query.order_by(Student.created_at.desc()).offset(skip).limit(limit).all()
+    next_cursor = None
+    if cursor is not None:
+        result = await db.execute(apply_keyset(db, query, Student.created_at, Student.id, cursor, limit))
+        students, next_cursor = split_keyset_page(result.all(), limit)
+    else:
+        skip = (page - 1) * limit
+        ordering = [Student.created_at.desc()] if rank is None else [rank, Student.created_at.desc()]
+        result = await db.execute(query.order_by(*ordering).offset(skip).limit(limit))
+        students = result.scalars().all()
     
     # Pagination metadata
-    meta = PaginationMeta.create(total=total, page=page, limit=limit)
+    meta = PaginationMeta.create(
+        total=total,
+        page=page,
+        limit=limit,
+        cursor=cursor,
+        next_cursor=next_cursor,
+        estimated=estimate_total,
+    )
     
     return PaginatedResponse(items=students, meta=meta)
 
 
+@router.get("/export")
+async def export_students(
+    request: Request,
+    export_format: str = Query("csv", alias="format", pattern="^(csv|xlsx)$"),
+    group: Optional[str] = None,
+    department: Optional[str] = None,
+    status: Optional[str] = None,
+    search: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: CurrentUser = Depends(get_current_user),
+):
+    """Talabalar ro'yxatini eksport qilish (CSV/XLSX)"""
+    query = filter_student_query(
+        select(
+            Student.student_id,
+            Student.last_name,
+            Student.first_name,
+            Student.email,
+            Student.phone,
+            Student.group,
+            Student.department,
+            Student.status,
+            Student.created_at,
+        ),
+        current_user, group, department, status,
+    )
+    rank = None
+    if search:
+        query, rank = apply_student_search(query, search)
+    ordering = [Student.group, Student.last_name, Student.first_name] if rank is None else [rank]
+    
+    description = (
+        f"format={export_format}, group={group}, department={department}, "
+        f"status={status}, search={search}"
+    )
+    overflow = await xlsx_overflow(db, export_format, query)
+    if overflow is not None:
+        description += f", rad etildi: {overflow} qator XLSX chegarasidan oshadi"
+    await record_audit(
+        db, current_user, ActionType.EXPORT, "student",
+        description=description,
+        request=request,
+    )
+    if overflow is not None:
+        raise xlsx_overflow_error(overflow)
+    return export_response(
+        export_format,
+        f"talabalar_{date.today().isoformat()}",
+        ["Talaba ID", "Familiya", "Ism", "Email", "Telefon", "Guruh", "Yo'nalish", "Holat", "Qo'shilgan sana"],
+        iter_query_rows(query.order_by(*ordering, Student.id), tuple),
+    )
+
+
+@router.get("/autocomplete", response_model=List[StudentSuggestion])
+@limiter.limit(f"{settings.API_RATE_LIMIT_PER_MINUTE}/minute")
+async def autocomplete_students(
+    request: Request,
+    q: str = Query(..., min_length=1, max_length=100, description="Qidiruv matni (prefiks)"),
+    limit: int = Query(10, ge=1, le=50),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: CurrentUser = Depends(get_current_user),
+):
+    """Talabalarni prefiks bo'yicha tezkor qidirish (autocomplete)"""
+    query = select(
+        Student.id, Student.student_id, Student.first_name, Student.last_name, Student.group
+    ).where(Student.institution_id == current_user.institution_id)
+    query, rank = apply_student_search(query, q, prefix=True)
+    ordering = [Student.last_name, Student.first_name] if rank is None else [rank]
+    result = await db.execute(query.order_by(*ordering).limit(limit))
+    return result.mappings().all()
+
+
 @router.get("/{student_id}", response_model=StudentResponse)
 async def get_student(
     student_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: CurrentUser = Depends(get_current_user),
 ):
     """Talaba ma'lumotlari"""
-    student = db.query(Student).filter(
+    student = await db.scalar(select(Student).where(
         Student.id == student_id,
         Student.institution_id == current_user.institution_id
-    ).first()
+    ))
     if not student:
         raise HTTPException(status_code=404, detail="Student not found")
     return student
@@ -83,15 +184,15 @@ async def get_student(
 @router.get("/group/{group}", response_model=List[StudentResponse])
 async def get_students_by_group(
     group: str,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: CurrentUser = Depends(get_current_user),
 ):
     """Guruh bo'yicha talabalar"""
-    students = db.query(Student).filter(
+    result = await db.execute(select(Student).where(
         Student.group == group,
         Student.institution_id == current_user.institution_id
-    ).all()
-    return students
+    ))
+    return result.scalars().all()
 
 
 @router.post("/", response_model=StudentResponse)
@@ -99,22 +200,22 @@ async def get_students_by_group(
 async def create_student(
     request: Request,
     student_data: StudentCreate,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_admin),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: CurrentUser = Depends(get_current_active_admin),
 ):
     """Yangi talaba qo'shish"""
     # Email va student_id tekshirish (faqat joriy institution'da)
-    existing_email = db.query(Student).filter(
+    existing_email = await db.scalar(select(Student).where(
         Student.email == student_data.email,
         Student.institution_id == current_user.institution_id
-    ).first()
+    ))
     if existing_email:
         raise HTTPException(status_code=400, detail="Email already exists")
     
-    existing_id = db.query(Student).filter(
+    existing_id = await db.scalar(select(Student).where(
         Student.student_id == student_data.student_id,
         Student.institution_id == current_user.institution_id
-    ).first()
+    ))
     if existing_id:
         raise HTTPException(status_code=400, detail="Student ID already exists")
     
@@ -123,15 +224,16 @@ async def create_student(
     student_data_dict['institution_id'] = current_user.institution_id
     student = Student(**student_data_dict)
     db.add(student)
-    db.commit()
-    db.refresh(student)
+    await db.commit()
+    invalidate_dashboard(current_user.institution_id)
+    await db.refresh(student)
 
     # Talaba uchun tizimga kirish akkaunti yaratish (User jadvalida)
     # Default login: email, parol sifatida talaba ID (student_id) ishlatiladi
-    existing_user = db.query(User).filter(
+    existing_user = await db.scalar(select(User).where(
         User.email == student.email,
         User.institution_id == current_user.institution_id
-    ).first()
+    ))
 
     try:
         default_password = student.student_id
@@ -149,13 +251,15 @@ async def create_student(
                 last_name=student.last_name,
                 role=UserRole.STUDENT,
                 institution_id=current_user.institution_id,
-                hashed_password=get_password_hash(default_password),
+                hashed_password=await get_password_hash_async(default_password),
             )
             db.add(new_user)
-        db.commit()
+        await db.commit()
+        if existing_user:
+            invalidate_principal(existing_user.email, existing_user.institution_id)
     except Exception:
         # Agar user yaratishda xatolik bo'lsa, talabani baribir qaytaramiz
-        db.rollback()
+        await db.rollback()
 
     return student
 
@@ -164,14 +268,14 @@ async def create_student(
 async def update_student(
     student_id: int,
     student_data: StudentUpdate,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_admin),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: CurrentUser = Depends(get_current_active_admin),
 ):
     """Talaba ma'lumotlarini yangilash"""
-    student = db.query(Student).filter(
+    student = await db.scalar(select(Student).where(
         Student.id == student_id,
         Student.institution_id == current_user.institution_id
-    ).first()
+    ))
     if not student:
         raise HTTPException(status_code=404, detail="Student not found")
     
@@ -179,37 +283,43 @@ async def update_student(
     for field, value in update_data.items():
         setattr(student, field, value)
     
-    db.commit()
-    db.refresh(student)
+    await db.commit()
+    invalidate_dashboard(current_user.institution_id)
+    await db.refresh(student)
     return student
 
 
 @router.delete("/{student_id}")
 async def delete_student(
     student_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_admin),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: CurrentUser = Depends(get_current_active_admin),
 ):
     """Talabani o'chirish"""
     from app.models.attendance import Attendance
     
-    student = db.query(Student).filter(
+    student = await db.scalar(select(Student).where(
         Student.id == student_id,
         Student.institution_id == current_user.institution_id
-    ).first()
+    ))
     if not student:
         raise HTTPException(status_code=404, detail="Student not found")
     
-    # Talabaga bog'liq attendance yozuvlarini o'chirish
-    attendance_records = db.query(Attendance).filter(
+    # Talabaga bog'liq attendance yozuvlarini o'chirish (kunlik yig'indidan ayirib)
+    student_filter = (
         Attendance.student_id == student_id,
-        Attendance.institution_id == current_user.institution_id
-    ).all()
-    for attendance in attendance_records:
-        db.delete(attendance)
+        Attendance.institution_id == current_user.institution_id,
+    )
+    removed = await db.execute(summary_rollup_select().where(*student_filter))
+    await apply_summary_deltas(db, [
+        ((institution_id, day, group, subject), -present, -absent)
+        for institution_id, day, group, subject, present, absent in removed.all()
+    ])
+    await db.execute(delete(Attendance).where(*student_filter))
     
     # Talabani o'chirish
-    db.delete(student)
-    db.commit()
+    await db.delete(student)
+    await db.commit()
+    invalidate_dashboard(current_user.institution_id)
     return {"message": "Student deleted successfully"}
 
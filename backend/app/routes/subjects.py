@@ -2,10 +2,9 @@ from typing import List
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
 from app.database import get_db
-from app.models.user import User
 from app.models.subject import Subject
 from app.schemas.subject import SubjectCreate, SubjectUpdate, SubjectResponse
-from app.auth import get_current_user, get_current_active_admin
+from app.auth import CurrentUser, get_current_user, get_current_active_admin
 
 router = APIRouter()
 
@@ -13,7 +12,7 @@ router = APIRouter()
 @router.get("/", response_model=List[SubjectResponse])
 async def get_subjects(
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    current_user: CurrentUser = Depends(get_current_user),
 ):
     """Barcha fanlar ro'yxati"""
     subjects = db.query(Subject).filter(
@@ -27,7 +26,7 @@ async def get_subjects(
 async def get_subject(
     subject_id: int,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    current_user: CurrentUser = Depends(get_current_user),
 ):
     """Fan ma'lumotlari"""
     subject = db.query(Subject).filter(
@@ -43,7 +42,7 @@ async def get_subject(
 async def create_subject(
     subject_data: SubjectCreate,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_admin),
+    current_user: CurrentUser = Depends(get_current_active_admin),
 ):
     """Yangi fan qo'shish"""
     # Name tekshirish (faqat joriy institution'da)
@@ -69,7 +68,7 @@ async def update_subject(
     subject_id: int,
     subject_data: SubjectUpdate,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_admin),
+    current_user: CurrentUser = Depends(get_current_active_admin),
 ):
     """Fan ma'lumotlarini yangilash"""
     subject = db.query(Subject).filter(
@@ -103,7 +102,7 @@ async def update_subject(
 async def delete_subject(
     subject_id: int,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_admin),
+    current_user: CurrentUser = Depends(get_current_active_admin),
 ):
     """Fanni o'chirish (soft delete - is_active = False)"""
     subject = db.query(Subject).filter(
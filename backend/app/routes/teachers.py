@@ -5,7 +5,8 @@ from app.database import get_db
 from app.models.user import User
 from app.models.teacher import Teacher
 from app.schemas.teacher import TeacherCreate, TeacherUpdate, TeacherResponse
-from app.auth import get_current_user, get_current_active_admin
+from app.auth import CurrentUser, get_current_user, get_current_active_admin, invalidate_principal
+from app.utils.dashboard_cache import invalidate_dashboard
 
 router = APIRouter()
 
@@ -17,7 +18,7 @@ async def get_teachers(
     department: Optional[str] = None,
     status: Optional[str] = None,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    current_user: CurrentUser = Depends(get_current_user),
 ):
     """Barcha o'qituvchilar ro'yxati"""
     from sqlalchemy.orm import joinedload
@@ -39,7 +40,7 @@ async def get_teachers(
 async def get_teacher(
     teacher_id: int,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    current_user: CurrentUser = Depends(get_current_user),
 ):
     """O'qituvchi ma'lumotlari"""
     from sqlalchemy.orm import joinedload
@@ -57,7 +58,7 @@ async def get_teacher(
 async def create_teacher(
     teacher_data: TeacherCreate,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_admin),
+    current_user: CurrentUser = Depends(get_current_active_admin),
 ):
     """Yangi o'qituvchi qo'shish"""
     # Email tekshirish (User jadvalida) - faqat joriy institution'da
@@ -78,13 +79,13 @@ async def create_teacher(
         raise HTTPException(status_code=400, detail="Email already exists")
     
     # User yaratish
-    from app.auth import get_password_hash
+    from app.auth import get_password_hash_async
     from app.models.user import UserRole
     import secrets
     
     # Agar password yuborilmasa, default password yaratish
     password = teacher_data.password or secrets.token_urlsafe(12)
-    hashed_password = get_password_hash(password)
+    hashed_password = await get_password_hash_async(password)
     
     try:
         user = User(
@@ -117,6 +118,7 @@ async def create_teacher(
         )
         db.add(teacher)
         db.commit()
+        invalidate_dashboard(current_user.institution_id)
         db.refresh(teacher)
         
         # User relationship'ni yuklash
@@ -133,7 +135,7 @@ async def update_teacher(
     teacher_id: int,
     teacher_data: TeacherUpdate,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_admin),
+    current_user: CurrentUser = Depends(get_current_active_admin),
 ):
     """O'qituvchi ma'lumotlarini yangilash"""
     from sqlalchemy.orm import joinedload
@@ -173,6 +175,7 @@ async def update_teacher(
                 setattr(teacher, field, value)
     
     # User ma'lumotlarini yangilash (first_name, last_name, email)
+    previous_email = teacher.user.email if teacher.user else None
     if teacher.user:
         if 'first_name' in update_data:
             teacher.user.first_name = update_data['first_name']
@@ -190,6 +193,9 @@ async def update_teacher(
             teacher.user.email = update_data['email']
     
     db.commit()
+    if previous_email:
+        invalidate_principal(previous_email, current_user.institution_id)
+        invalidate_principal(teacher.user.email, current_user.institution_id)
     db.refresh(teacher)
     db.refresh(teacher, ["user"])
     return teacher
@@ -199,7 +205,7 @@ async def update_teacher(
 async def delete_teacher(
     teacher_id: int,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_admin),
+    current_user: CurrentUser = Depends(get_current_active_admin),
 ):
     """O'qituvchini o'chirish"""
     teacher = db.query(Teacher).filter(
@@ -209,7 +215,11 @@ async def delete_teacher(
     if not teacher:
         raise HTTPException(status_code=404, detail="Teacher not found")
     
+    teacher_email = teacher.user.email if teacher.user else None
     db.delete(teacher)
     db.commit()
+    invalidate_dashboard(current_user.institution_id)
+    if teacher_email:
+        invalidate_principal(teacher_email, current_user.institution_id)
     return {"message": "Teacher deleted successfully"}
 
@@ -1,24 +1,37 @@
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, UploadFile, File, Query, Request
 from fastapi.responses import JSONResponse
 from sqlalchemy.orm import Session
-import os
+from typing import Optional
+import mimetypes
 import uuid
 from pathlib import Path
 from app.database import get_db
 from app.models.user import User
-from app.auth import get_current_user
+from app.auth import get_current_user_record
 from app.config import settings
+from app.utils.uploads import UploadTooLarge, receive_upload, discard_upload
+from app.utils.file_response import storage_file_response
+from app.utils.storage import get_storage
+from app.utils.avatars import (
+    AVATAR_PREFIX, VARIANT_FORMATS, generate_avatar_variants, negotiate_format,
+    original_key, pick_size, variant_key,
+)
 
 router = APIRouter()
 
-# Rasm yuklash uchun papka
-UPLOAD_DIR = Path("uploads/avatars")
+# Rasmlar ombordagi "avatars/" kaliti ostida saqlanadi; bu papka - vaqtinchalik fayllar uchun
+UPLOAD_DIR = Path(settings.STORAGE_LOCAL_ROOT) / AVATAR_PREFIX
 UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
 
 # Ruxsat etilgan rasm turlari
 ALLOWED_IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".gif", ".webp"}
 MAX_IMAGE_SIZE = 5 * 1024 * 1024  # 5 MB in bytes
 
+# Fayl nomlari har yuklashda yangi (uuid) - kontent o'zgarmaydi, uzoq kesh xavfsiz
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+# Variant hali tayyor bo'lmaganda qaytarilgan asl rasm uzoq keshlanmasligi kerak
+FALLBACK_CACHE_CONTROL = "public, max-age=60"
+
 
 def get_file_extension(filename: str) -> str:
     """Fayl kengaytmasini olish"""
@@ -32,8 +45,9 @@ def is_allowed_image(filename: str) -> bool:
 
 @router.post("/avatar")
 async def upload_avatar(
+    background_tasks: BackgroundTasks,
     file: UploadFile = File(...),
-    current_user: User = Depends(get_current_user),
+    current_user: User = Depends(get_current_user_record),
     db: Session = Depends(get_db),
 ):
     """Profil rasmini yuklash"""
@@ -45,26 +59,28 @@ async def upload_avatar(
             detail=f"Ruxsat etilmagan rasm turi. Faqat quyidagilar ruxsat etiladi: {', '.join(ALLOWED_IMAGE_EXTENSIONS)}"
         )
     
-    # Rasm hajmini tekshirish
-    file_content = await file.read()
-    file_size = len(file_content)
-    
-    if file_size > MAX_IMAGE_SIZE:
+    # Rasmni bo'laklab vaqtinchalik faylga yozish (hajm yozish davomida tekshiriladi)
+    try:
+        received = await receive_upload(file, UPLOAD_DIR, MAX_IMAGE_SIZE)
+    except UploadTooLarge:
         raise HTTPException(
-            status_code=400,
-            detail=f"Rasm hajmi juda katta. Maksimal hajm: 5 MB. Sizning rasmingiz: {file_size / 1024 / 1024:.2f} MB"
+            status_code=413,
+            detail=f"Rasm hajmi juda katta. Maksimal hajm: {MAX_IMAGE_SIZE // 1024 // 1024} MB"
         )
+    except OSError as e:
+        raise HTTPException(status_code=500, detail=f"Rasmini saqlashda xatolik: {str(e)}")
     
-    # Rasm nomini yaratish (unique bo'lishi uchun)
+    # Rasm nomini yaratish (unique bo'lishi uchun) va omborga saqlash
     file_extension = get_file_extension(file.filename)
     unique_filename = f"{uuid.uuid4()}{file_extension}"
-    file_path = UPLOAD_DIR / unique_filename
-    
-    # Rasmini saqlash
     try:
-        with open(file_path, "wb") as f:
-            f.write(file_content)
+        await get_storage().put_file(
+            original_key(unique_filename),
+            received.temp_path,
+            mimetypes.guess_type(unique_filename)[0],
+        )
     except Exception as e:
+        await discard_upload(received)
         raise HTTPException(status_code=500, detail=f"Rasmini saqlashda xatolik: {str(e)}")
     
     # URL yaratish (relative path)
@@ -76,6 +92,9 @@ async def upload_avatar(
     db.commit()
     db.refresh(current_user)
     
+    # Kichraytirilgan variantlar javob yuborilgandan keyin fonda yaratiladi
+    background_tasks.add_task(generate_avatar_variants, unique_filename)
+    
     return JSONResponse(content={
         "message": "Rasm muvaffaqiyatli yuklandi",
         "url": image_url,
@@ -84,16 +103,41 @@ async def upload_avatar(
 
 
 @router.get("/avatar/{filename}")
-async def get_avatar(filename: str):
-    """Yuklangan profil rasmini olish"""
-    file_path = UPLOAD_DIR / filename
-    
-    if not file_path.exists():
+async def get_avatar(
+    filename: str,
+    request: Request,
+    size: Optional[int] = Query(None, ge=1, le=2048),
+):
+    """Yuklangan profil rasmini olish (size berilsa mos kichraytirilgan variant)"""
+    storage = get_storage()
+    cache_control = IMMUTABLE_CACHE_CONTROL
+    try:
+        if size is not None:
+            fmt = negotiate_format(request.headers.get("accept"))
+            try:
+                return await storage_file_response(
+                    request,
+                    storage,
+                    variant_key(filename, pick_size(size), fmt),
+                    expires_in=settings.S3_PRESIGN_EXPIRE_SECONDS,
+                    check_exists=True,
+                    media_type=VARIANT_FORMATS[fmt],
+                    filename=f"{pick_size(size)}.{fmt}",
+                    inline=True,
+                    extra_headers={"Cache-Control": cache_control, "Vary": "Accept"},
+                )
+            except FileNotFoundError:
+                # Variant hali yaratilmagan - asl rasm
+                cache_control = FALLBACK_CACHE_CONTROL
+        return await storage_file_response(
+            request,
+            storage,
+            original_key(filename),
+            expires_in=settings.S3_PRESIGN_EXPIRE_SECONDS,
+            media_type=mimetypes.guess_type(filename)[0] or "application/octet-stream",
+            filename=filename,
+            inline=True,
+            extra_headers={"Cache-Control": cache_control},
+        )
+    except (FileNotFoundError, ValueError):
         raise HTTPException(status_code=404, detail="Rasm topilmadi")
-    
-    from fastapi.responses import FileResponse
-    return FileResponse(
-        path=file_path,
-        media_type="image/jpeg"  # yoki rasm turiga qarab
-    )
-
@@ -1,5 +1,5 @@
-from pydantic import BaseModel
-from typing import Optional
+from pydantic import BaseModel, Field
+from typing import List, Optional
 from datetime import datetime, date
 from app.models.attendance import AttendanceStatus
 
@@ -19,6 +19,21 @@ class AttendanceCreate(AttendanceBase):
     longitude: Optional[float] = None  # O'qituvchining joriy koordinatalari
 
 
+class AttendanceBulkItem(BaseModel):
+    student_id: int
+    status: AttendanceStatus = AttendanceStatus.ABSENT
+
+
+class AttendanceBulkCreate(BaseModel):
+    """Bitta dars (guruh, fan, sana) uchun butun guruh davomati"""
+    group: str
+    subject: str
+    date: date
+    records: List[AttendanceBulkItem] = Field(..., min_length=1, max_length=500)
+    latitude: Optional[float] = None  # O'qituvchining joriy koordinatalari
+    longitude: Optional[float] = None  # O'qituvchining joriy koordinatalari
+
+
 class AttendanceUpdate(BaseModel):
     status: Optional[AttendanceStatus] = None
 
@@ -20,8 +20,22 @@ class Question(BaseModel):
     explanation: Optional[str] = None
 
 
+# Talabaga yuboriladigan savol - to'g'ri javob va izohsiz
+class PublicQuestionOption(BaseModel):
+    id: str
+    text: str
+
+
+class PublicQuestion(BaseModel):
+    id: str
+    type: str
+    question: str
+    options: Optional[List[PublicQuestionOption]] = None
+    points: int = 1
+
+
 # Exam schemas
-class ExamBase(BaseModel):
+class ExamInfo(BaseModel):
     title: str
     description: Optional[str] = None
     subject: str
@@ -31,13 +45,16 @@ class ExamBase(BaseModel):
     end_time: datetime
     duration_minutes: int = Field(default=60, ge=1, description="Davomiyligi daqiqalarda")
     max_attempts: int = Field(default=1, ge=1, description="Urinishlar soni")
-    questions: List[Question]
     total_points: int = Field(default=100, ge=1)
     allowed_students: Optional[List[Dict[str, Any]]] = None  # [{"id": 1, "name": "..."}, ...]
     excluded_students: Optional[List[Dict[str, Any]]] = None  # [{"id": 2, "name": "..."}, ...]
     auto_close: bool = Field(default=True, description="Avtomatik yopish")
 
 
+class ExamBase(ExamInfo):
+    questions: List[Question]
+
+
 class ExamCreate(ExamBase):
     pass
 
@@ -73,6 +90,42 @@ class ExamResponse(ExamBase):
         from_attributes = True
 
 
+class ExamListResponse(ExamInfo):
+    """Ro'yxatlar uchun - savollarsiz (questions ustuni yuklanmaydi)"""
+    id: int
+    institution_id: int
+    is_active: bool
+    created_by: int
+    created_by_name: str
+    created_at: datetime
+    updated_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
+
+
+class ExamPublicResponse(BaseModel):
+    """Talaba uchun imtihon - javoblarsiz savollar, talabalar ro'yxatlarisiz"""
+    id: int
+    title: str
+    description: Optional[str] = None
+    subject: str
+    group: str
+    department: str
+    start_time: datetime
+    end_time: datetime
+    duration_minutes: int
+    max_attempts: int
+    total_points: int
+    auto_close: bool
+    is_active: bool
+    questions: List[PublicQuestion]
+    updated_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
+
+
 # Exam Attempt schemas
 class ExamAttemptBase(BaseModel):
     exam_id: int
@@ -108,3 +161,6 @@ class ExamAttemptSubmit(BaseModel):
     answers: Dict[str, Any]  # {"question_id": "answer_id", ...}
     time_spent_minutes: int
 
+
+class ExamAttemptAutosave(BaseModel):
+    answers: Dict[str, Any]  # Faqat o'zgargan javoblar: {"question_id": "answer_id", ...}
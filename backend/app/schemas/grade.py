@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from typing import Optional
+from typing import List, Optional
 from datetime import datetime, date
 
 
@@ -20,6 +20,27 @@ class GradeCreate(GradeBase):
     pass
 
 
+class GradeBulkItem(BaseModel):
+    student_id: int
+    grade: float = Field(..., ge=2, le=5, description="Baho (2-5)")
+    description: Optional[str] = None
+
+
+class GradeBulkCreate(BaseModel):
+    """Bitta dars (guruh, fan, sana, baho turi) uchun butun guruh baholari"""
+    group: str
+    department: str
+    subject: str
+    date: date
+    grade_type: str = Field(default="oral", description="Baho turi: oral, written, practical, test, exam")
+    grades: List[GradeBulkItem] = Field(..., min_length=1, max_length=500)
+
+
+class GradeBulkError(BaseModel):
+    student_id: int
+    detail: str
+
+
 class GradeUpdate(BaseModel):
     grade: Optional[float] = Field(None, ge=2, le=5)
     grade_type: Optional[str] = None
@@ -33,3 +54,8 @@ class GradeResponse(GradeBase):
 
     class Config:
         from_attributes = True
+
+
+class GradeBulkResponse(BaseModel):
+    saved: List[GradeResponse]
+    errors: List[GradeBulkError]
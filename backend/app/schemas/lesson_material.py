@@ -33,7 +33,12 @@ class LessonMaterialResponse(LessonMaterialBase):
     uploaded_by_name: str
     created_at: datetime
     updated_at: Optional[datetime] = None
+    thumbnail_url: Optional[str] = None
 
     class Config:
         from_attributes = True
 
+
+class LessonMaterialSearchResult(LessonMaterialResponse):
+    snippet: Optional[str] = None  # Matndan topilgan joy atrofidagi parcha
+
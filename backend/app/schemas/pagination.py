@@ -1,5 +1,8 @@
+import base64
+import json
+from datetime import datetime
 from pydantic import BaseModel
-from typing import List, TypeVar, Generic
+from typing import List, Optional, Tuple, TypeVar, Generic
 
 T = TypeVar('T')
 
@@ -12,18 +15,41 @@ class PaginationMeta(BaseModel):
     total_pages: int
     has_next: bool
     has_prev: bool
+    next_cursor: Optional[str] = None  # Keyset rejimida keyingi sahifa uchun
+    estimated: bool = False  # total taxminiy (aniq COUNT qilinmagan)
 
     @classmethod
-    def create(cls, total: int, page: int, limit: int):
-        """Pagination metadata yaratish"""
+    def create(
+        cls,
+        total: int,
+        page: int,
+        limit: int,
+        cursor: Optional[str] = None,
+        next_cursor: Optional[str] = None,
+        estimated: bool = False,
+    ):
+        """
+        Pagination metadata yaratish
+
+        cursor berilgan bo'lsa (keyset rejimi) has_next/has_prev sahifa raqamidan emas,
+        cursor'lardan aniqlanadi.
+        """
         total_pages = (total + limit - 1) // limit if total > 0 else 0
+        if cursor is not None:
+            has_next = next_cursor is not None
+            has_prev = bool(cursor)
+        else:
+            has_next = page < total_pages
+            has_prev = page > 1
         return cls(
             total=total,
             page=page,
             limit=limit,
             total_pages=total_pages,
-            has_next=page < total_pages,
-            has_prev=page > 1,
+            has_next=has_next,
+            has_prev=has_prev,
+            next_cursor=next_cursor,
+            estimated=estimated,
         )
 
 
@@ -32,3 +58,34 @@ class PaginatedResponse(BaseModel, Generic[T]):
     items: List[T]
     meta: PaginationMeta
 
+
+def encode_cursor(created_at, id: int) -> str:
+    """(created_at, id) juftligini shaffof bo'lmagan (opaque) cursor satriga aylantirish"""
+    if isinstance(created_at, datetime):
+        payload = ["d", created_at.isoformat(), id]
+    else:
+        # SQLite - saqlangan matn ko'rinishida
+        payload = ["s", created_at, id]
+    raw = json.dumps(payload, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[object, int]:
+    """
+    Cursor satrini (created_at, id) ga qaytarish
+
+    Raises:
+        ValueError: Cursor noto'g'ri bo'lsa
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        kind, created_at, id = json.loads(raw)
+        if kind == "d":
+            created_at = datetime.fromisoformat(created_at)
+        elif kind != "s" or not isinstance(created_at, str):
+            raise ValueError(kind)
+        if not isinstance(id, int):
+            raise ValueError(id)
+    except (TypeError, ValueError) as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+    return created_at, id
@@ -36,3 +36,15 @@ class StudentResponse(StudentBase):
     class Config:
         from_attributes = True
 
+
+
+class StudentSuggestion(BaseModel):
+    """Autocomplete uchun yengil javob"""
+    id: int
+    student_id: str
+    first_name: str
+    last_name: str
+    group: str
+
+    class Config:
+        from_attributes = True
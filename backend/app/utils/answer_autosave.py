@@ -0,0 +1,303 @@
+"""
+Imtihon javoblarini avtomatik saqlash - yozuvlarni birlashtirish (write coalescing)
+
+Har bir autosave so'rovi bazaga yozilmaydi: javob o'zgarishlari urinish bo'yicha xotirada
+birlashtiriladi va har AUTOSAVE_FLUSH_SECONDS sekundda bitta executemany UPDATE bilan
+yoziladi. 500 talaba har bir tugma bosishda JSON ustunini qayta yozmaydi.
+
+Jarayon yiqilsa xotiradagi o'zgarishlar yo'qolmasligi uchun har bir o'zgarish avval
+jurnalga (JSONL) yoziladi; ilova ishga tushganda jurnal qayta o'ynaladi (replay).
+Topshirilgan urinishlarga yozilmaydi - topshirish urinishning buferini o'zi oladi
+(davom etayotgan yozish tugashini kutib - drain).
+
+Bufer process ichida, shuning uchun har bir worker o'z jurnaliga yozadi:
+AUTOSAVE_JOURNAL_PATH="autosave/answers.jsonl" bo'lsa "autosave/answers-<pid>.jsonl".
+Jurnal egasi process yonidagi ".lock" faylini ishlash davomida qulflab turadi. Ishga
+tushishda qulfi bo'sh (egasi yiqilgan/to'xtagan) boshqa jurnallar shu process'ning
+jurnaliga ko'chirib olinadi va bazaga yoziladi.
+"""
+import asyncio
+import json
+import logging
+import os
+import threading
+from pathlib import Path
+from typing import Any, Dict, Iterable, Optional
+from sqlalchemy import JSON, bindparam, case, cast, func, literal_column
+from app.config import settings
+from app.database import AsyncSessionLocal
+from app.models.exam import ExamAttempt
+
+logger = logging.getLogger(__name__)
+
+FLUSH_BATCH_SIZE = 500
+
+_attempts = ExamAttempt.__table__
+
+
+def _merged_answers(dialect_name: str):
+    """
+    Bazadagi javoblarga buferdagi o'zgarishlarni SQL ichida qo'shish (b_delta ustun)
+
+    Qatorni o'qib Python'da birlashtirib yozish (read-modify-write) ikki worker bir urinishni
+    bir vaqtda yozganda birining kalitlarini o'chirib yuborardi. Birlashtirish UPDATE'ning
+    o'zida bo'lsa qator qulfi ostida bajariladi.
+    """
+    delta = bindparam("b_delta", type_=JSON)
+    if dialect_name == "postgresql":
+        from sqlalchemy.dialects.postgresql import JSONB
+        current = cast(_attempts.c.answers, JSONB)
+        base = case(
+            (func.jsonb_typeof(current) == "object", current),
+            else_=literal_column("'{}'::jsonb"),
+        )
+        return cast(base.op("||")(cast(delta, JSONB)), JSON)
+    if dialect_name == "sqlite":
+        # json_patch (RFC 7396): obyekt bo'lmagan/NULL qiymat {} deb olinadi; null javob kalitni o'chiradi
+        return func.json_patch(func.coalesce(_attempts.c.answers, "{}"), delta)
+    raise NotImplementedError(f"Javoblarni birlashtirish {dialect_name} uchun qo'llab-quvvatlanmaydi")
+
+
+_update_statements = {}
+
+
+def _update_answers(dialect_name: str):
+    if dialect_name not in _update_statements:
+        _update_statements[dialect_name] = _attempts.update().where(
+            _attempts.c.id == bindparam("b_id"),
+            _attempts.c.is_submitted == False,
+        ).values(answers=_merged_answers(dialect_name))
+    return _update_statements[dialect_name]
+
+
+def _try_lock(handle) -> bool:
+    """Faylni process tugaguncha qulflash (bloklamasdan) - boshqa process egallagan bo'lsa False"""
+    try:
+        if os.name == "nt":
+            import msvcrt
+            msvcrt.locking(handle.fileno(), msvcrt.LK_NBLCK, 1)
+        else:
+            import fcntl
+            fcntl.flock(handle.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        return False
+    return True
+
+
+def _flushing_path(journal_path: Path) -> Path:
+    return journal_path.with_name(journal_path.name + ".flushing")
+
+
+def _lock_path(journal_path: Path) -> Path:
+    return journal_path.with_suffix(".lock")
+
+
+class AnswerAutosaveBuffer:
+    """
+    Urinishlar bo'yicha birlashtirilgan javoblar buferi + jurnal
+
+    Args:
+        journal_path: Jurnal fayli namunasi (JSONL) - process jurnali "<nom>-<pid><kengaytma>".
+            Yozish paytida jurnal ".flushing" nusxasiga almashtiriladi
+        flush_interval: Bazaga yozish oralig'i (sekund)
+    """
+
+    def __init__(self, journal_path: str, flush_interval: float):
+        self.base_path = Path(journal_path)
+        self.flush_interval = flush_interval
+        self._pending: Dict[int, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self._flush_lock = asyncio.Lock()
+        self._journal = None
+        self._owner_pid: Optional[int] = None
+        self._owner_lock = None
+
+    def _journal_for(self, pid: int) -> Path:
+        return self.base_path.with_name(f"{self.base_path.stem}-{pid}{self.base_path.suffix}")
+
+    @property
+    def journal_path(self) -> Path:
+        """Shu process'ning jurnali (birinchi murojaatda qulflab egallanadi)"""
+        pid = os.getpid()
+        if self._owner_pid != pid:
+            # Birinchi murojaat yoki fork'dan keyingi bola process - ota process'ning
+            # fayl handle'lari va buferi unga tegishli emas
+            path = self._journal_for(pid)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            owner_lock = open(_lock_path(path), "a+")
+            if not _try_lock(owner_lock):
+                owner_lock.close()
+                raise RuntimeError(f"Autosave jurnali boshqa process tomonidan band: {path}")
+            self._owner_lock = owner_lock
+            self._owner_pid = pid
+            self._journal = None
+            self._pending = {}
+        return self._journal_for(pid)
+
+    @property
+    def flushing_path(self) -> Path:
+        return _flushing_path(self.journal_path)
+
+    def _append(self, attempt_id: int, answers: Dict[str, Any]):
+        # self._lock ichida chaqiriladi
+        line = json.dumps({"a": attempt_id, "d": answers}, ensure_ascii=False, separators=(",", ":"))
+        journal_path = self.journal_path
+        if self._journal is None:
+            self._journal = open(journal_path, "a", encoding="utf-8")
+        self._journal.write(line + "\n")
+        self._journal.flush()
+        self._pending.setdefault(attempt_id, {}).update(answers)
+
+    def add(self, attempt_id: int, answers: Dict[str, Any]):
+        """Javob o'zgarishlarini buferga (va jurnalga) qo'shish"""
+        with self._lock:
+            self._append(attempt_id, answers)
+
+    def take(self, attempt_id: int) -> Optional[Dict[str, Any]]:
+        """Urinishning hali yozilmagan javoblarini buferdan olish (topshirishda)"""
+        with self._lock:
+            return self._pending.pop(attempt_id, None)
+
+    async def drain(self, attempt_id: int) -> Optional[Dict[str, Any]]:
+        """
+        Topshirishdan oldin: davom etayotgan yozish tugashini kutib, urinish javoblarini olish
+
+        Yozish paytida urinish javoblari buferda emas (_rotate ularni olib qo'ygan) - lock
+        bo'shagach ular yo bazaga yozilgan (urinish qatorini qayta o'qish kerak) yoki
+        xatolik sabab buferga qaytarilgan bo'ladi.
+        """
+        async with self._flush_lock:
+            return self.take(attempt_id)
+
+    def pending_count(self) -> int:
+        with self._lock:
+            return len(self._pending)
+
+    def _rotate(self) -> Dict[int, Dict[str, Any]]:
+        # self._lock ichida chaqiriladi: joriy bufer va jurnal ".flushing"ga o'tadi
+        journal_path, flushing_path = self.journal_path, self.flushing_path
+        batch, self._pending = self._pending, {}
+        if self._journal is not None:
+            self._journal.close()
+            self._journal = None
+        if journal_path.exists():
+            if flushing_path.exists():
+                # Oldingi yozish muvaffaqiyatsiz bo'lgan - yozuvlar yo'qolmasligi uchun qo'shib qo'yiladi
+                with open(flushing_path, "a", encoding="utf-8") as target:
+                    target.write(journal_path.read_text(encoding="utf-8"))
+                journal_path.unlink()
+            else:
+                journal_path.replace(flushing_path)
+        return batch
+
+    async def flush(self) -> int:
+        """
+        Buferdagi o'zgarishlarni bazaga yozish
+
+        Returns:
+            Yangilangan urinishlar soni
+        """
+        async with self._flush_lock:
+            with self._lock:
+                batch = self._rotate()
+            try:
+                updated = await self._write(batch)
+            except Exception:
+                # Keyingi urinishda qayta yoziladi; shu orada kelgan yangi javoblar ustun
+                with self._lock:
+                    for attempt_id, answers in batch.items():
+                        self._pending[attempt_id] = {**answers, **self._pending.get(attempt_id, {})}
+                raise
+            self.flushing_path.unlink(missing_ok=True)
+            return updated
+
+    async def _write(self, batch: Dict[int, Dict[str, Any]]) -> int:
+        if not batch:
+            return 0
+        async with AsyncSessionLocal() as db:
+            statement = _update_answers(db.get_bind().dialect.name)
+            params = [{"b_id": attempt_id, "b_delta": delta} for attempt_id, delta in batch.items()]
+            updated = 0
+            for i in range(0, len(params), FLUSH_BATCH_SIZE):
+                chunk = params[i:i + FLUSH_BATCH_SIZE]
+                result = await db.execute(statement, chunk)
+                # asyncpg executemany uchun rowcount qaytarmaydi (-1)
+                updated += result.rowcount if result.rowcount >= 0 else len(chunk)
+            await db.commit()
+        return updated
+
+    @staticmethod
+    def _read_journal(paths: Iterable[Path]):
+        for path in paths:
+            if not path.exists():
+                continue
+            with open(path, encoding="utf-8") as journal:
+                for line in journal:
+                    try:
+                        entry = json.loads(line)
+                        yield int(entry["a"]), dict(entry["d"])
+                    except (ValueError, KeyError, TypeError):
+                        # Yiqilish paytida chala yozilgan oxirgi qator
+                        continue
+
+    def _adopt_orphans(self) -> int:
+        # self._lock ichida chaqiriladi: egasi ishlamayotgan jurnallarni shu process'ga ko'chirish
+        own = self.journal_path
+        directory = self.base_path.parent
+        if not directory.is_dir():
+            return 0
+        stem, suffix = self.base_path.stem, self.base_path.suffix
+        candidates = set(directory.glob(f"{stem}*{suffix}"))
+        candidates.update(
+            path.with_name(path.name[:-len(".flushing")]) for path in directory.glob(f"{stem}*{suffix}.flushing")
+        )
+        # Toza to'xtagan process'lardan faqat qulf fayli qolgan bo'lishi mumkin
+        candidates.update(path.with_suffix(suffix) for path in directory.glob(f"{stem}-*.lock"))
+        adopted = 0
+        for path in sorted(candidates - {own}):
+            with open(_lock_path(path), "a+") as orphan_lock:
+                if not _try_lock(orphan_lock):
+                    # Egasi hali ishlayapti
+                    continue
+                entries = list(self._read_journal((_flushing_path(path), path)))
+                for attempt_id, answers in entries:
+                    self._append(attempt_id, answers)
+                _flushing_path(path).unlink(missing_ok=True)
+                path.unlink(missing_ok=True)
+                adopted += bool(entries)
+                try:
+                    # Qulf ushlab turilgan holda - yangi egasi bilan poyga bo'lmasligi uchun
+                    _lock_path(path).unlink(missing_ok=True)
+                except OSError:
+                    # Windows ochiq faylni o'chirmaydi - keyingi ishga tushishda qayta uriniladi
+                    pass
+        return adopted
+
+    async def replay(self) -> int:
+        """Oldingi ishga tushishlardan qolgan jurnallarni bazaga yozish (ilova ishga tushganda)"""
+        with self._lock:
+            # O'z jurnali (pid qayta ishlatilgan bo'lsa) va egasiz qolgan boshqa jurnallar
+            for attempt_id, answers in self._read_journal((self.flushing_path, self.journal_path)):
+                self._pending.setdefault(attempt_id, {}).update(answers)
+            adopted = self._adopt_orphans()
+        if adopted:
+            logger.info(f"Autosave: {adopted} ta egasiz jurnal ko'chirib olindi")
+        return await self.flush()
+
+    async def run(self):
+        """Jurnalni qayta o'ynash va bufer'ni davriy yozish (fon vazifasi)"""
+        try:
+            replayed = await self.replay()
+            if replayed:
+                logger.info(f"Autosave jurnalidan {replayed} ta urinish tiklandi")
+        except Exception as e:
+            logger.error(f"Autosave jurnalini tiklashda xatolik: {e!r}")
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"Autosave javoblarini yozishda xatolik: {e!r}")
+
+
+answer_autosave = AnswerAutosaveBuffer(settings.AUTOSAVE_JOURNAL_PATH, settings.AUTOSAVE_FLUSH_SECONDS)
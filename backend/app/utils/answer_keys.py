@@ -0,0 +1,108 @@
+"""
+Imtihon va testlar uchun oldindan tayyorlangan (kompilyatsiya qilingan) javob kalitlari
+
+Har bir topshirishda questions JSON'ini qayta aylanib chiqish va variantlar ichidan to'g'ri
+javobni qidirish o'rniga kalit bir marta tuziladi: savol id -> (kutilgan javob, ball).
+Kalit (tur, id, version) bo'yicha keshlanadi va imtihon/test yangilanganda o'chiriladi.
+version har bir yangilashda oshadi - boshqa worker'lar eski kalitni ishlatmaydi.
+"""
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+from app.utils.cache import TTLCache
+
+EXAM = "exam"
+QUIZ = "quiz"
+
+
+class AnswerKeyItem(NamedTuple):
+    expected: Any  # Kutilgan javob (short_answer uchun normallashtirilgan)
+    points: int
+    normalize: bool  # Talaba javobini ham normallashtirib solishtirish (short_answer)
+
+
+class AnswerKey(NamedTuple):
+    items: Dict[str, AnswerKeyItem]
+    total_points: int
+
+
+answer_key_cache = TTLCache(maxsize=2048, ttl=6 * 3600)
+
+
+def normalize_answer(value: Any) -> str:
+    """Qisqa javobni solishtirish uchun: bo'shliqlarsiz va kichik harflarda"""
+    return str(value).strip().lower()
+
+
+def compile_answer_key(questions: Optional[List[dict]], total_points: int) -> AnswerKey:
+    """
+    questions JSON'idan javob kalitini tuzish
+
+    To'g'ri javobi aniqlanmagan savollar (to'g'ri variant yo'q, noma'lum tur) kalitga
+    kirmaydi - ular uchun ball berilmaydi.
+    """
+    items = {}
+    for question in questions or []:
+        q_id = question.get("id")
+        q_type = question.get("type")
+        points = question.get("points", 1)
+        if q_type == "multiple_choice":
+            correct_option = next(
+                (opt for opt in question.get("options") or [] if opt.get("is_correct")),
+                None
+            )
+            if correct_option:
+                items[q_id] = AnswerKeyItem(correct_option.get("id"), points, False)
+        elif q_type == "true_false":
+            items[q_id] = AnswerKeyItem(question.get("correct_answer"), points, False)
+        elif q_type == "short_answer":
+            items[q_id] = AnswerKeyItem(normalize_answer(question.get("correct_answer", "")), points, True)
+    return AnswerKey(items, total_points)
+
+
+def _cache_key(kind: str, item) -> tuple:
+    return kind, item.id, item.version
+
+
+def cached_answer_key(kind: str, item) -> Optional[AnswerKey]:
+    """Keshdagi javob kaliti yoki None (questions ustunini yuklamaydi)"""
+    return answer_key_cache.get(_cache_key(kind, item))
+
+
+def get_answer_key(kind: str, item) -> AnswerKey:
+    """
+    Exam yoki Quiz uchun keshlangan javob kaliti
+
+    Args:
+        kind: EXAM yoki QUIZ
+        item: Exam yoki Quiz obyekti (questions yuklangan bo'lishi kerak)
+    """
+    answer_key = cached_answer_key(kind, item)
+    if answer_key is None:
+        answer_key = compile_answer_key(item.questions, item.total_points)
+        answer_key_cache.set(_cache_key(kind, item), answer_key)
+    return answer_key
+
+
+def invalidate_answer_key(kind: str, item_id: int):
+    """Imtihon/test yangilanganda yoki o'chirilganda uning barcha kalit versiyalarini o'chirish"""
+    answer_key_cache.pop_matching(lambda key: key[0] == kind and key[1] == item_id)
+
+
+def score_answers(answer_key: AnswerKey, answers: Optional[dict]) -> Tuple[int, int]:
+    """
+    Javoblarni kalit bo'yicha baholash
+
+    Returns:
+        (ball, foiz)
+    """
+    total_score = 0
+    for q_id, student_answer in (answers or {}).items():
+        item = answer_key.items.get(q_id)
+        if item is None:
+            continue
+        if item.normalize:
+            student_answer = normalize_answer(student_answer)
+        if student_answer == item.expected:
+            total_score += item.points
+    max_score = answer_key.total_points
+    percentage = int((total_score / max_score) * 100) if max_score > 0 else 0
+    return total_score, percentage
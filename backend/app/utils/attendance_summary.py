@@ -0,0 +1,119 @@
+"""
+Kunlik davomat yig'indisini (AttendanceDailySummary) inkremental yangilash
+"""
+from datetime import date
+from typing import Iterable, Tuple
+from sqlalchemy import select, func, case, delete
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.database import dialect_insert
+from app.models.attendance import Attendance, AttendanceDailySummary, AttendanceStatus
+
+# (institution_id, date, group, subject) -> (present_delta, absent_delta)
+SummaryKey = Tuple[int, date, str, str]
+
+
+def status_counts(status) -> Tuple[int, int]:
+    """Davomat holatini (present, absent) hissasiga aylantirish"""
+    if status == AttendanceStatus.PRESENT:
+        return 1, 0
+    if status == AttendanceStatus.ABSENT:
+        return 0, 1
+    return 0, 0
+
+
+def status_change(old_status, new_status) -> Tuple[int, int]:
+    """Holat o'zgarishi uchun (present_delta, absent_delta)"""
+    old_present, old_absent = status_counts(old_status)
+    new_present, new_absent = status_counts(new_status)
+    return new_present - old_present, new_absent - old_absent
+
+
+def _upsert_statement(db, rows: list):
+    """Yig'indi qatorlarini qo'shish yoki mavjudiga delta qo'shish"""
+    stmt = dialect_insert(db, AttendanceDailySummary).values(rows)
+    return stmt.on_conflict_do_update(
+        index_elements=["institution_id", "date", "group", "subject"],
+        set_={
+            "present": AttendanceDailySummary.present + stmt.excluded.present,
+            "absent": AttendanceDailySummary.absent + stmt.excluded.absent,
+            "updated_at": func.now(),
+        },
+    )
+
+
+async def apply_summary_deltas(db: AsyncSession, deltas: Iterable[Tuple[SummaryKey, int, int]]):
+    """
+    Yig'indi jadvaliga deltalarni qo'llash (joriy tranzaksiya ichida, commit chaqiruvchida)
+
+    Args:
+        db: Async session
+        deltas: ((institution_id, date, group, subject), present_delta, absent_delta) ro'yxati
+    """
+    merged = {}
+    for key, present_delta, absent_delta in deltas:
+        present, absent = merged.get(key, (0, 0))
+        merged[key] = (present + present_delta, absent + absent_delta)
+
+    rows = [
+        {
+            "institution_id": key[0],
+            "date": key[1],
+            "group": key[2],
+            "subject": key[3],
+            "present": present,
+            "absent": absent,
+        }
+        for key, (present, absent) in merged.items()
+        if present or absent
+    ]
+    if rows:
+        await db.execute(_upsert_statement(db, rows))
+
+
+async def apply_summary_delta(
+    db: AsyncSession,
+    institution_id: int,
+    attendance_date: date,
+    group: str,
+    subject: str,
+    present_delta: int,
+    absent_delta: int,
+):
+    """Bitta kalit uchun deltani qo'llash"""
+    await apply_summary_deltas(
+        db, [((institution_id, attendance_date, group, subject), present_delta, absent_delta)]
+    )
+
+
+def summary_rollup_select():
+    """Attendance jadvalidan yig'indi qatorlarini hisoblaydigan SELECT"""
+    return select(
+        Attendance.institution_id,
+        Attendance.date,
+        Attendance.group,
+        Attendance.subject,
+        func.sum(case((Attendance.status == AttendanceStatus.PRESENT, 1), else_=0)),
+        func.sum(case((Attendance.status == AttendanceStatus.ABSENT, 1), else_=0)),
+    ).group_by(
+        Attendance.institution_id,
+        Attendance.date,
+        Attendance.group,
+        Attendance.subject,
+    )
+
+
+def rebuild_attendance_summary(connection):
+    """
+    Yig'indi jadvalini Attendance'dan qaytadan to'ldirish (sync connection, migratsiya uchun)
+
+    Returns:
+        Yozilgan qatorlar soni
+    """
+    connection.execute(delete(AttendanceDailySummary))
+    result = connection.execute(
+        AttendanceDailySummary.__table__.insert().from_select(
+            ["institution_id", "date", "group", "subject", "present", "absent"],
+            summary_rollup_select(),
+        )
+    )
+    return result.rowcount
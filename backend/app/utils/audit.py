@@ -0,0 +1,43 @@
+"""
+Audit log yozuvlarini yaratish
+"""
+from typing import Optional
+from fastapi import Request
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models.audit_log import AuditLog, ActionType
+
+
+async def record_audit(
+    db: AsyncSession,
+    current_user,
+    action: ActionType,
+    resource_type: str,
+    description: Optional[str] = None,
+    resource_id: Optional[int] = None,
+    request: Optional[Request] = None,
+) -> AuditLog:
+    """
+    Audit log yozuvini saqlash (alohida commit bilan)
+
+    Args:
+        db: Async session
+        current_user: Amalni bajargan foydalanuvchi (CurrentUser)
+        action: Amal turi
+        resource_type: Resurs turi ("student", "attendance", ...)
+        description: Qo'shimcha izoh
+        resource_id: Resurs ID (agar bitta resurs bo'lsa)
+        request: IP manzil va user agent uchun
+    """
+    log = AuditLog(
+        user_id=current_user.id,
+        user_email=current_user.email,
+        action=action,
+        resource_type=resource_type,
+        resource_id=resource_id,
+        description=description,
+        ip_address=request.client.host if request and request.client else None,
+        user_agent=request.headers.get("user-agent") if request else None,
+    )
+    db.add(log)
+    await db.commit()
+    return log
@@ -0,0 +1,102 @@
+"""
+Profil rasmlari uchun kichraytirilgan variantlar (48/128/512 px, WebP + JPEG)
+
+Ro'yxatlarda 40 px'lik avatar uchun 5 MB'lik asl rasmni yuborish o'rniga yuklashdan
+keyin fonda (process pool'da, so'rovdan tashqarida) kvadrat variantlar yaratiladi.
+Variantlar hali tayyor bo'lmasa yoki Pillow o'rnatilmagan bo'lsa asl rasm qaytariladi.
+
+Kalitlar: avatars/<id>.<ext> - asl rasm, avatars/<id>/<o'lcham>.webp|jpg - variantlar.
+"""
+import io
+import logging
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+from app.config import settings
+from app.utils.storage import get_storage
+from app.utils.worker_pool import WorkerPool
+
+logger = logging.getLogger(__name__)
+
+AVATAR_PREFIX = "avatars"
+AVATAR_SIZES = (48, 128, 512)
+VARIANT_FORMATS = {"webp": "image/webp", "jpg": "image/jpeg"}
+
+# Rasm qayta ishlash CPU'ga og'ir va GIL'ni to'liq bo'shatmaydi - alohida process'larda
+image_pool = WorkerPool(
+    name="images",
+    max_workers=settings.IMAGE_WORKERS,
+    max_pending=settings.IMAGE_MAX_PENDING,
+    use_processes=True,
+)
+
+
+def original_key(filename: str) -> str:
+    return f"{AVATAR_PREFIX}/{filename}"
+
+
+def variant_key(filename: str, size: int, fmt: str) -> str:
+    return f"{AVATAR_PREFIX}/{Path(filename).stem}/{size}.{fmt}"
+
+
+def pick_size(requested: int) -> int:
+    """So'ralgan o'lchamdan kichik bo'lmagan eng kichik variant (eng kattasidan oshmaydi)"""
+    for size in AVATAR_SIZES:
+        if size >= requested:
+            return size
+    return AVATAR_SIZES[-1]
+
+
+def render_variants(data: bytes) -> Dict[Tuple[int, str], bytes]:
+    """
+    Asl rasmdan barcha variantlarni yaratish (process pool ichida ishlaydi)
+
+    Returns:
+        {(o'lcham, format): baytlar}
+    """
+    from PIL import Image, ImageOps
+
+    with Image.open(io.BytesIO(data)) as image:
+        # JPEG'ni kerakli o'lchamga yaqin qilib dekodlash - katta fotolarda bir necha marta tezroq
+        image.draft("RGB", (AVATAR_SIZES[-1], AVATAR_SIZES[-1]))
+        image = ImageOps.exif_transpose(image)
+        if image.mode not in ("RGB", "RGBA"):
+            image = image.convert("RGBA" if "transparency" in image.info or image.mode in ("LA", "PA") else "RGB")
+        variants = {}
+        for size in AVATAR_SIZES:
+            # Avatar doira/kvadrat ko'rinishida chiqadi - markazdan kesib olinadi
+            square = ImageOps.fit(image, (size, size), Image.LANCZOS)
+            out = io.BytesIO()
+            square.save(out, "WEBP", quality=80, method=4)
+            variants[(size, "webp")] = out.getvalue()
+            if square.mode == "RGBA":
+                # JPEG'da shaffoflik yo'q - oq fonga joylash
+                background = Image.new("RGB", square.size, (255, 255, 255))
+                background.paste(square, mask=square.getchannel("A"))
+                square = background
+            out = io.BytesIO()
+            square.save(out, "JPEG", quality=82, optimize=True, progressive=True)
+            variants[(size, "jpg")] = out.getvalue()
+        return variants
+
+
+async def generate_avatar_variants(filename: str):
+    """
+    Avatar variantlarini yaratib omborga yozish (BackgroundTasks orqali chaqiriladi)
+
+    Xatolik so'rovga ta'sir qilmaydi - faqat log'ga yoziladi, asl rasm ishlatilaveradi.
+    """
+    storage = get_storage()
+    try:
+        data = b"".join([chunk async for chunk in storage.iter_chunks(original_key(filename))])
+        variants = await image_pool.run(render_variants, data, timeout=settings.IMAGE_JOB_TIMEOUT_SECONDS)
+        for (size, fmt), content in variants.items():
+            await storage.put_bytes(variant_key(filename, size, fmt), content, VARIANT_FORMATS[fmt])
+    except ImportError:
+        logger.warning("Pillow o'rnatilmagan - avatar variantlari yaratilmadi. pip install Pillow")
+    except Exception as e:
+        logger.error(f"Avatar variantlarini yaratishda xatolik ({filename}): {str(e)}")
+
+
+def negotiate_format(accept: Optional[str]) -> str:
+    """Brauzer WebP qabul qilsa webp, aks holda jpg"""
+    return "webp" if accept and "image/webp" in accept else "jpg"
@@ -0,0 +1,144 @@
+"""
+Dars materiallari uchun kontent bo'yicha manzillanadigan (content-addressed) fayl ombori
+
+Fayl SHA-256 xeshi bo'yicha bir marta saqlanadi: bir xil fayl o'nlab guruhlarga
+yuklansa ham diskda bitta nusxa bo'ladi. Havolalar soni - shu xeshga ega LessonMaterial
+qatorlari soni.
+
+Oxirgi havola o'chirilganda fayl darhol o'chirilmaydi: xesh OrphanBlob sifatida
+belgilanadi va BLOB_GC_GRACE_SECONDS'dan keyin fon GC'si o'chiradi. Bir nechta worker
+(yoki server) bo'lganda muvofiqlashtirish database orqali:
+- yuklash material qatorini qo'shish bilan bir tranzaksiyada OrphanBlob qatorini o'chiradi
+  va commit'dan keyin fayl omborda borligini tekshiradi (yo'q bo'lsa qayta joylaydi);
+- GC OrphanBlob qatorini o'chirib (qulflab) havolalarni qayta sanaydi va faylni shu
+  tranzaksiya commit bo'lishidan oldin o'chiradi - parallel yuklash commit'i uni kutadi.
+
+Kalit xesh prefiksi bo'yicha bo'lingan: blobs/ab/cd/abcd... - bitta papkada
+yuz minglab fayl to'planib qolmaydi. Fayllar tanlangan omborda (lokal disk yoki S3) saqlanadi.
+"""
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+from sqlalchemy import delete, func, select
+from sqlalchemy.orm import Session
+from app.config import settings
+from app.database import AsyncSessionLocal, dialect_insert
+from app.models.lesson_material import LessonMaterial, LessonMaterialContent, OrphanBlob
+from app.utils.storage import get_storage
+from app.utils.uploads import ReceivedUpload, discard_upload
+
+logger = logging.getLogger(__name__)
+
+BLOB_PREFIX = "lesson_materials/blobs"
+THUMBNAIL_PREFIX = "lesson_materials/thumbnails"
+GC_BATCH_SIZE = 100
+
+
+def blob_key(sha256: str) -> str:
+    """Xesh bo'yicha ombordagi kalit (ikki darajali prefiks)"""
+    return f"{BLOB_PREFIX}/{sha256[:2]}/{sha256[2:4]}/{sha256}"
+
+
+def thumbnail_key(sha256: str) -> str:
+    """Fayl birinchi sahifasi eskizining kaliti"""
+    return f"{THUMBNAIL_PREFIX}/{sha256[:2]}/{sha256[2:4]}/{sha256}.webp"
+
+
+async def store_blob(received: ReceivedUpload, content_type: Optional[str] = None) -> str:
+    """
+    Vaqtinchalik faylni omborga joylash (material qatori commit bo'lishidan oldin)
+
+    Bunday kontent allaqachon mavjud bo'lsa vaqtinchalik fayl saqlanib qoladi - commit'dan
+    keyin confirm_blob uni o'chiradi yoki (GC shu orada faylni o'chirgan bo'lsa) joylaydi.
+    """
+    storage = get_storage()
+    key = blob_key(received.sha256)
+    if not await storage.exists(key):
+        await storage.put_file(key, received.temp_path, content_type)
+    return key
+
+
+async def confirm_blob(received: ReceivedUpload, content_type: Optional[str] = None):
+    """Material qatori commit bo'lgandan keyin: fayl omborda bo'lishini kafolatlash"""
+    if not received.temp_path.exists():
+        # store_blob faylni joylagan
+        return
+    storage = get_storage()
+    key = blob_key(received.sha256)
+    if await storage.exists(key):
+        await discard_upload(received)
+    else:
+        await storage.put_file(key, received.temp_path, content_type)
+
+
+def claim_blob(db: Session, sha256: str):
+    """Xeshni qayta ishlatish - GC belgisi olib tashlanadi (material qo'shish tranzaksiyasida)"""
+    db.execute(delete(OrphanBlob).where(OrphanBlob.content_hash == sha256))
+
+
+def release_blob(db: Session, sha256: str):
+    """
+    Havola o'chirilayotganda (shu tranzaksiyada, commit'dan oldin) chaqiriladi - xeshni GC uchun
+    belgilaydi. Havolalar GC vaqtida sanaladi: boshqa material qolgan bo'lsa fayl o'chirilmaydi.
+    """
+    stmt = dialect_insert(db, OrphanBlob).values(content_hash=sha256, released_at=datetime.now(timezone.utc))
+    db.execute(stmt.on_conflict_do_update(
+        index_elements=["content_hash"],
+        set_={"released_at": stmt.excluded.released_at},
+    ))
+
+
+async def _collect_blob(content_hash: str, released_before: datetime) -> bool:
+    async with AsyncSessionLocal() as db:
+        # Belgini o'chirish qatorni commit'gacha qulflaydi - parallel claim_blob kutadi
+        claimed = await db.execute(delete(OrphanBlob).where(
+            OrphanBlob.content_hash == content_hash,
+            OrphanBlob.released_at < released_before,
+        ))
+        if not claimed.rowcount:
+            return False
+        references = await db.scalar(select(func.count(LessonMaterial.id)).where(
+            LessonMaterial.content_hash == content_hash
+        ))
+        if references:
+            await db.commit()
+            return False
+        storage = get_storage()
+        await storage.delete(blob_key(content_hash))
+        await storage.delete(thumbnail_key(content_hash))
+        await db.execute(delete(LessonMaterialContent).where(LessonMaterialContent.content_hash == content_hash))
+        await db.commit()
+        return True
+
+
+async def collect_orphan_blobs() -> int:
+    """
+    Kutish muddati o'tgan havolasiz fayllarni o'chirish
+
+    Returns:
+        O'chirilgan fayllar soni
+    """
+    released_before = datetime.now(timezone.utc) - timedelta(seconds=settings.BLOB_GC_GRACE_SECONDS)
+    async with AsyncSessionLocal() as db:
+        hashes = (await db.execute(
+            select(OrphanBlob.content_hash)
+            .where(OrphanBlob.released_at < released_before)
+            .limit(GC_BATCH_SIZE)
+        )).scalars().all()
+    removed = 0
+    for content_hash in hashes:
+        removed += await _collect_blob(content_hash, released_before)
+    return removed
+
+
+async def run_blob_gc():
+    """Havolasiz fayllarni davriy tozalash (fon vazifasi)"""
+    while True:
+        try:
+            removed = await collect_orphan_blobs()
+            if removed:
+                logger.info(f"{removed} ta havolasiz material fayli o'chirildi")
+        except Exception as e:
+            logger.error(f"Havolasiz fayllarni tozalashda xatolik: {e!r}")
+        await asyncio.sleep(settings.BLOB_GC_INTERVAL_SECONDS)
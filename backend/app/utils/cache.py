@@ -0,0 +1,118 @@
+"""
+Process ichidagi (in-memory) cache yordamchilari
+"""
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+
+_MISSING = object()
+
+
+class TTLCache:
+    """
+    TTL (yashash muddati) va LRU (eng kam ishlatilgan) siyosatli thread-safe cache
+
+    Args:
+        maxsize: Maksimal elementlar soni - oshsa eng eski ishlatilgan element chiqariladi
+        ttl: Elementning yashash muddati sekundlarda
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = max(1, maxsize)
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Qiymatni olish (muddati o'tgan bo'lsa default qaytariladi)"""
+        with self._lock:
+            item = self._data.get(key, _MISSING)
+            if item is _MISSING:
+                return default
+            expires_at, value = item
+            if expires_at <= time.monotonic():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None):
+        """Qiymatni saqlash"""
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        """Qiymatni cache'dan olib tashlash"""
+        with self._lock:
+            item = self._data.pop(key, _MISSING)
+        return default if item is _MISSING else item[1]
+
+    def pop_matching(self, predicate: Callable[[Hashable], bool]) -> int:
+        """Shartga mos kalitlarni olib tashlash, olib tashlanganlar sonini qaytaradi"""
+        with self._lock:
+            keys = [key for key in self._data if predicate(key)]
+            for key in keys:
+                del self._data[key]
+        return len(keys)
+
+    def clear(self):
+        """Butun cache'ni tozalash"""
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._data)
+
+
+class SingleFlightCache(TTLCache):
+    """
+    Async hisoblashlar uchun TTL cache - bir kalit uchun bir vaqtda faqat bitta hisoblash
+
+    Bir nechta so'rov bir vaqtda cache'da yo'q kalitni so'rasa, hisoblash bir marta
+    bajariladi va barcha kutayotganlar o'sha natijani oladi (request coalescing).
+    Hisoblash davomida kalit invalidate qilinsa, eskirgan natija cache'ga yozilmaydi.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        super().__init__(maxsize, ttl)
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+        self._generation = 0
+
+    async def get_or_compute(self, key: Hashable, compute: Callable[[], Awaitable[Any]]) -> Any:
+        """Qiymatni cache'dan olish yoki (bitta) hisoblash orqali to'ldirish"""
+        value = self.get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._compute(key, compute, self._generation))
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._forget(key, done))
+        # shield - bitta so'rov bekor qilinsa ham boshqalar uchun hisoblash davom etadi
+        return await asyncio.shield(task)
+
+    def _forget(self, key: Hashable, task: asyncio.Future):
+        # Invalidatsiyadan keyin shu kalit uchun yangi hisoblash boshlangan bo'lishi mumkin
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+
+    async def _compute(self, key: Hashable, compute: Callable[[], Awaitable[Any]], generation: int) -> Any:
+        value = await compute()
+        if generation == self._generation:
+            self.set(key, value)
+        return value
+
+    def pop_matching(self, predicate: Callable[[Hashable], bool]) -> int:
+        # Davom etayotgan hisoblashlar natijasi endi eskirgan hisoblanadi
+        self._generation += 1
+        for key in [key for key in self._inflight if predicate(key)]:
+            self._inflight.pop(key, None)
+        return super().pop_matching(predicate)
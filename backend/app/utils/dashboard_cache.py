@@ -0,0 +1,17 @@
+"""
+Dashboard statistikasi uchun muassasa bo'yicha cache
+"""
+from app.config import settings
+from app.utils.cache import SingleFlightCache
+
+# Kalitlar: (institution_id, bo'lim, ...parametrlar)
+dashboard_cache = SingleFlightCache(maxsize=4096, ttl=settings.CACHE_TTL_SECONDS)
+
+
+def invalidate_dashboard(institution_id: int):
+    """
+    Muassasaning barcha dashboard ma'lumotlarini cache'dan olib tashlash
+
+    Talaba, o'qituvchi, kitob yoki davomat o'zgarganda (commit'dan keyin) chaqiriladi.
+    """
+    dashboard_cache.pop_matching(lambda key: key[0] == institution_id)
@@ -0,0 +1,99 @@
+"""
+Imtihonga kirish huquqlari (exam_access jadvali) - allowed_students / excluded_students
+JSON ro'yxatlarining indekslangan nusxasi
+
+Qoida: talaba chetlashtirilmagan bo'lsa va imtihonda ruxsat ro'yxati yo'q yoki talaba
+unda bo'lsa - imtihon unga ochiq. JSON maydonlar ko'rsatish uchun saqlanib qoladi,
+exam_access ular o'zgarganda qayta yoziladi.
+"""
+from datetime import datetime
+from typing import Iterable, List, Optional, Set
+from sqlalchemy import and_, delete, exists, insert, not_, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models.exam import Exam, ExamAccess
+
+
+def student_ids(entries: Optional[Iterable[dict]]) -> Set[int]:
+    """[{"id": 1, "name": "..."}, ...] ro'yxatidan talaba id'lari"""
+    ids = set()
+    for entry in entries or []:
+        value = entry.get("id") if isinstance(entry, dict) else None
+        try:
+            ids.add(int(value))
+        except (TypeError, ValueError):
+            continue
+    return ids
+
+
+def access_rows(exam_id: int, allowed_students, excluded_students) -> List[dict]:
+    """exam_access jadvaliga yoziladigan qatorlar"""
+    rows = [
+        {"exam_id": exam_id, "student_id": student_id, "is_allowed": True}
+        for student_id in sorted(student_ids(allowed_students))
+    ]
+    rows.extend(
+        {"exam_id": exam_id, "student_id": student_id, "is_allowed": False}
+        for student_id in sorted(student_ids(excluded_students))
+    )
+    return rows
+
+
+async def sync_exam_access(db: AsyncSession, exam: Exam):
+    """
+    Imtihon uchun exam_access qatorlarini qayta yozish (commit chaqiruvchida)
+
+    Args:
+        db: Async session
+        exam: id'si mavjud (flush qilingan) imtihon
+    """
+    await db.execute(delete(ExamAccess).where(ExamAccess.exam_id == exam.id))
+    rows = access_rows(exam.id, exam.allowed_students, exam.excluded_students)
+    if rows:
+        await db.execute(insert(ExamAccess), rows)
+
+
+def rebuild_exam_access(conn) -> int:
+    """
+    exam_access jadvalini barcha imtihonlardan to'liq qayta yaratish (sync connection)
+
+    Returns:
+        Yozilgan qatorlar soni
+    """
+    conn.execute(delete(ExamAccess))
+    rows = []
+    result = conn.execute(
+        select(Exam.id, Exam.allowed_students, Exam.excluded_students).where(
+            or_(Exam.allowed_students.isnot(None), Exam.excluded_students.isnot(None))
+        )
+    )
+    for exam_id, allowed_students, excluded_students in result:
+        rows.extend(access_rows(exam_id, allowed_students, excluded_students))
+    if rows:
+        conn.execute(insert(ExamAccess), rows)
+    return len(rows)
+
+
+def _access_rule(is_allowed: bool, *conditions):
+    return exists().where(ExamAccess.exam_id == Exam.id, ExamAccess.is_allowed == is_allowed, *conditions)
+
+
+def available_exams_filter(student_id: int):
+    """Talabaga ochiq imtihonlar sharti (idx_exam_access_rule bo'yicha korrelyatsiyalangan EXISTS)"""
+    return and_(
+        not_(_access_rule(False, ExamAccess.student_id == student_id)),
+        or_(
+            not_(_access_rule(True)),
+            _access_rule(True, ExamAccess.student_id == student_id),
+        ),
+    )
+
+
+def available_exams_query(institution_id: int, student_id: int, now: datetime):
+    """Talaba uchun hozir ochiq imtihonlar so'rovi (tartib va sahifalash chaqiruvchida)"""
+    return select(Exam).where(
+        Exam.institution_id == institution_id,
+        Exam.is_active == True,
+        Exam.start_time <= now,
+        Exam.end_time >= now,
+        available_exams_filter(student_id),
+    )
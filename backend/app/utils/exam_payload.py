@@ -0,0 +1,51 @@
+"""
+Talabalarga yuboriladigan imtihon ma'lumotlari (savollar, javoblarsiz) uchun cache
+
+Imtihon ochilganda yuzlab talaba bir daqiqa ichida get_exam'ni chaqiradi. Katta questions
+JSON'ini har safar yuklab qayta serializatsiya qilish o'rniga tayyor JSON baytlari
+(imtihon id, versiya) bo'yicha saqlanadi; versiya - har yangilashda oshadigan Exam.version.
+Bir vaqtdagi so'rovlar uchun hisoblash faqat bir marta bajariladi (single-flight).
+"""
+from typing import Optional
+from app.database import AsyncSessionLocal
+from app.models.exam import Exam
+from app.schemas.exam import ExamPublicResponse
+from app.utils.cache import SingleFlightCache
+
+# Kalitlar: (exam_id, versiya)
+exam_payload_cache = SingleFlightCache(maxsize=512, ttl=3600)
+
+
+def exam_version(exam: Exam):
+    """Imtihon versiyasi - o'zgarganda yangi cache kaliti"""
+    return exam.version
+
+
+async def _render_public_exam(exam_id: int) -> Optional[bytes]:
+    # O'z session'i: natija bir nechta so'rovga tegishli (dashboard cache bilan bir xil)
+    async with AsyncSessionLocal() as db:
+        exam = await db.get(Exam, exam_id)
+        if exam is None:
+            return None
+        return ExamPublicResponse.model_validate(exam).model_dump_json().encode()
+
+
+async def public_exam_payload(exam: Exam) -> Optional[bytes]:
+    """
+    Talaba uchun imtihon JSON'i (to'g'ri javoblar olib tashlangan)
+
+    Args:
+        exam: Imtihon (questions yuklanmagan - defer - bo'lishi mumkin)
+
+    Returns:
+        JSON baytlari yoki imtihon o'chirilgan bo'lsa None
+    """
+    return await exam_payload_cache.get_or_compute(
+        (exam.id, exam_version(exam)),
+        lambda: _render_public_exam(exam.id),
+    )
+
+
+def invalidate_exam_payload(exam_id: int):
+    """Imtihon yangilanganda yoki o'chirilganda uning barcha versiyalarini o'chirish"""
+    exam_payload_cache.pop_matching(lambda key: key[0] == exam_id)
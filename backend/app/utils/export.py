@@ -0,0 +1,212 @@
+"""
+Katta hajmdagi ma'lumotlarni CSV/XLSX ko'rinishida oqim (stream) bilan eksport qilish
+
+Qatorlar server-side cursor orqali (yield_per) partiyalab o'qiladi va darhol javobga
+yoziladi - xotira sarfi qatorlar soniga bog'liq emas.
+"""
+import csv
+import io
+import re
+from datetime import date, datetime
+from enum import Enum
+from typing import AsyncIterator, Callable, Iterable, List, Optional, Sequence
+from urllib.parse import quote
+from xml.sax.saxutils import escape
+from fastapi import HTTPException
+from fastapi.responses import StreamingResponse
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.database import AsyncSessionLocal
+from app.utils.zipstream import ZipStreamWriter
+
+EXPORT_FORMATS = ("csv", "xlsx")
+EXPORT_BATCH_SIZE = 1000
+# Javobga yozishdan oldin yig'iladigan bayt miqdori
+CHUNK_SIZE = 64 * 1024
+# Excel varag'ining qatorlar chegarasi (sarlavha bilan) - to'liq ma'lumot uchun CSV ishlatiladi
+XLSX_MAX_ROWS = 1048576
+# Sanash va oqim orasida qo'shilgan qatorlar tufayli chegaraga yetilsa oxirgi qatorga yoziladi
+XLSX_TRUNCATED_MARKER = "... ma'lumot Excel chegarasida kesildi, to'liq eksport uchun format=csv"
+
+_MEDIA_TYPES = {
+    "csv": "text/csv; charset=utf-8",
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+}
+# XML 1.0 da ruxsat etilmagan boshqaruv belgilari
+_INVALID_XML_CHARS = re.compile("[\x00-\x08\x0b\x0c\x0e-\x1f]")
+
+
+def _cell_text(value) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, Enum):
+        return str(value.value)
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    return str(value)
+
+
+async def iter_query_rows(stmt, row_mapper: Callable[[tuple], Sequence]) -> AsyncIterator[Sequence]:
+    """
+    So'rov natijalarini partiyalab o'qish
+
+    Generator o'z session'ini ochadi: StreamingResponse davomida request
+    dependency'dagi session allaqachon yopilgan bo'ladi.
+    """
+    async with AsyncSessionLocal() as db:
+        result = await db.stream(stmt.execution_options(yield_per=EXPORT_BATCH_SIZE))
+        async for row in result:
+            yield row_mapper(row)
+
+
+async def xlsx_overflow(db: AsyncSession, export_format: str, stmt) -> Optional[int]:
+    """
+    XLSX eksport varaqqa sig'masligini oldindan tekshirish
+
+    Returns:
+        Qatorlar soni (chegaradan oshsa) yoki None
+    """
+    if export_format != "xlsx":
+        return None
+    total = await db.scalar(select(func.count()).select_from(stmt.order_by(None).subquery()))
+    return total if total >= XLSX_MAX_ROWS else None
+
+
+def xlsx_overflow_error(total: int) -> HTTPException:
+    """Varaqqa sig'maydigan XLSX eksport uchun xatolik (CSV taklif qilinadi)"""
+    return HTTPException(
+        status_code=413,
+        detail=(
+            f"Eksportda {total} qator bor, XLSX varag'iga {XLSX_MAX_ROWS - 1} tadan ortiq qator sig'maydi. "
+            f"format=csv bilan eksport qiling yoki filterlarni toraytiring."
+        ),
+    )
+
+
+async def csv_stream(header: Sequence[str], rows: AsyncIterator[Sequence]) -> AsyncIterator[bytes]:
+    """CSV baytlari oqimi (Excel to'g'ri ochishi uchun UTF-8 BOM bilan)"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    buffer.write("\ufeff")
+    writer.writerow(header)
+    async for row in rows:
+        writer.writerow([_cell_text(value) for value in row])
+        if buffer.tell() >= CHUNK_SIZE:
+            yield buffer.getvalue().encode("utf-8")
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue().encode("utf-8")
+
+
+def _xlsx_row(values: Iterable) -> str:
+    cells = []
+    for value in values:
+        if isinstance(value, bool) or value is None:
+            value = _cell_text(value)
+        if isinstance(value, (int, float)):
+            cells.append(f"<c><v>{value}</v></c>")
+        else:
+            text = escape(_INVALID_XML_CHARS.sub("", _cell_text(value)))
+            cells.append(f'<c t="inlineStr"><is><t xml:space="preserve">{text}</t></is></c>')
+    return "<row>" + "".join(cells) + "</row>"
+
+
+_XLSX_CONTENT_TYPES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/xl/workbook.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+    '<Override PartName="/xl/worksheets/sheet1.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+    '</Types>'
+)
+_XLSX_ROOT_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+    'Target="xl/workbook.xml"/>'
+    '</Relationships>'
+)
+_XLSX_WORKBOOK_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+    'Target="worksheets/sheet1.xml"/>'
+    '</Relationships>'
+)
+
+
+def _xlsx_workbook(sheet_name: str) -> str:
+    return (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+        f'<sheets><sheet name="{escape(sheet_name[:31])}" sheetId="1" r:id="rId1"/></sheets>'
+        '</workbook>'
+    )
+
+
+async def xlsx_stream(sheet_name: str, header: Sequence[str], rows: AsyncIterator[Sequence]) -> AsyncIterator[bytes]:
+    """Bitta varaqli XLSX fayl oqimi (ZIP arxiv oqim bilan yoziladi)"""
+    zip_writer = ZipStreamWriter()
+    yield zip_writer.add("[Content_Types].xml", _XLSX_CONTENT_TYPES.encode())
+    yield zip_writer.add("_rels/.rels", _XLSX_ROOT_RELS.encode())
+    yield zip_writer.add("xl/workbook.xml", _xlsx_workbook(sheet_name).encode())
+    yield zip_writer.add("xl/_rels/workbook.xml.rels", _XLSX_WORKBOOK_RELS.encode())
+
+    yield zip_writer.start_entry("xl/worksheets/sheet1.xml")
+    parts: List[str] = [
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>',
+        _xlsx_row(header),
+    ]
+    size = 0
+    written_rows = 1
+    async for row in rows:
+        if written_rows >= XLSX_MAX_ROWS - 1:
+            parts.append(_xlsx_row([XLSX_TRUNCATED_MARKER]))
+            break
+        part = _xlsx_row(row)
+        parts.append(part)
+        size += len(part)
+        written_rows += 1
+        if size >= CHUNK_SIZE:
+            chunk = zip_writer.write("".join(parts).encode("utf-8"))
+            parts.clear()
+            size = 0
+            if chunk:
+                yield chunk
+    parts.append("</sheetData></worksheet>")
+    yield zip_writer.write("".join(parts).encode("utf-8")) + zip_writer.end_entry()
+    yield zip_writer.finish()
+
+
+def export_response(
+    export_format: str,
+    filename: str,
+    header: Sequence[str],
+    rows: AsyncIterator[Sequence],
+) -> StreamingResponse:
+    """
+    Eksport uchun StreamingResponse
+
+    Args:
+        export_format: "csv" yoki "xlsx"
+        filename: Fayl nomi (kengaytmasiz)
+        header: Ustun sarlavhalari
+        rows: Qatorlar oqimi (iter_query_rows)
+    """
+    if export_format == "xlsx":
+        body = xlsx_stream(filename, header, rows)
+    else:
+        body = csv_stream(header, rows)
+    disposition = f"attachment; filename*=UTF-8''{quote(f'{filename}.{export_format}')}"
+    return StreamingResponse(
+        body,
+        media_type=_MEDIA_TYPES[export_format],
+        headers={"Content-Disposition": disposition, "Cache-Control": "no-store"},
+    )
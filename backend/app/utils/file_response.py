@@ -0,0 +1,257 @@
+"""
+Shartli GET (ETag / If-None-Match / If-Modified-Since) va HTTP Range qo'llab-quvvatlaydigan fayl javobi
+
+Starlette FileResponse (0.38) Range so'rovlarini qo'llab-quvvatlamaydi va validator'larni
+tekshirmaydi - PDF viewer'lar va uzilgan yuklab olishlar uchun shu helper ishlatiladi.
+"""
+import os
+import re
+from email.utils import formatdate, parsedate_to_datetime
+from typing import AsyncIterator, Callable, Dict, Optional, Tuple
+from urllib.parse import quote
+import anyio
+from fastapi import Request
+from fastapi.responses import RedirectResponse, Response, StreamingResponse
+from starlette.concurrency import run_in_threadpool
+
+CHUNK_SIZE = 64 * 1024
+# O'zgarmas (kontent xeshi bo'yicha) fayllar uchun - foydalanuvchiga xos, shuning uchun private
+IMMUTABLE_CACHE_CONTROL = "private, max-age=31536000, immutable"
+DEFAULT_CACHE_CONTROL = "private, no-cache"
+# Presigned havolaga yo'naltirish havola muddati tugashidan shuncha sekund oldin keshdan chiqadi
+PRESIGN_CACHE_MARGIN_SECONDS = 60
+
+_RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+def content_disposition(disposition: str, filename: str) -> str:
+    """Content-Disposition (ASCII bo'lmagan nomlar uchun RFC 5987 filename* bilan)"""
+    fallback = filename.encode("ascii", "ignore").decode().replace('"', "") or "file"
+    return f"{disposition}; filename=\"{fallback}\"; filename*=UTF-8''{quote(filename)}"
+
+
+def _etag_matches(header: str, etag: str) -> bool:
+    """If-None-Match uchun kuchsiz (weak) solishtirish"""
+    if header.strip() == "*":
+        return True
+    bare = etag[2:] if etag.startswith("W/") else etag
+    for candidate in header.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == bare:
+            return True
+    return False
+
+
+def _not_modified(request: Request, etag: str, mtime: float) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        return _etag_matches(if_none_match, etag)
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            since = parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+        return int(mtime) <= since
+    return False
+
+
+def _range_applies(request: Request, etag: str, mtime: float) -> bool:
+    """If-Range: validator mos kelmasa Range e'tiborsiz qoldiriladi (to'liq fayl yuboriladi)"""
+    if_range = request.headers.get("if-range")
+    if if_range is None:
+        return True
+    if_range = if_range.strip()
+    if if_range.startswith('"') or if_range.startswith("W/"):
+        # Faqat kuchli ETag bilan
+        return not etag.startswith("W/") and if_range == etag
+    try:
+        return int(mtime) == int(parsedate_to_datetime(if_range).timestamp())
+    except (TypeError, ValueError):
+        return False
+
+
+def parse_range(header: str, size: int) -> Optional[Tuple[int, int]]:
+    """
+    Bitta baytlar oralig'ini tahlil qilish
+
+    Returns:
+        (start, end) - ikkalasi ham kiritilgan; sintaksis noto'g'ri yoki bir nechta oraliq
+        bo'lsa None (Range e'tiborsiz qoldiriladi)
+
+    Raises:
+        ValueError: Oraliq fayl chegarasidan tashqarida (416)
+    """
+    match = _RANGE_RE.match(header.strip())
+    if not match:
+        return None
+    start_text, end_text = match.groups()
+    if not start_text and not end_text:
+        return None
+    if not start_text:
+        # bytes=-N - oxirgi N bayt
+        length = int(end_text)
+        if length == 0:
+            raise ValueError(header)
+        return max(0, size - length), size - 1
+    start = int(start_text)
+    end = int(end_text) if end_text else size - 1
+    if start >= size or end < start:
+        raise ValueError(header)
+    return start, min(end, size - 1)
+
+
+async def file_chunks(path: str, start: int, length: int) -> AsyncIterator[bytes]:
+    async with await anyio.open_file(path, "rb") as f:
+        await f.seek(start)
+        remaining = length
+        while remaining > 0:
+            chunk = await f.read(min(CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
+def conditional_response(
+    request: Request,
+    *,
+    size: int,
+    mtime: float,
+    open_range: Callable[[int, int], AsyncIterator[bytes]],
+    media_type: str,
+    filename: str,
+    content_hash: Optional[str] = None,
+    inline: bool = False,
+    extra_headers: Optional[Dict[str, str]] = None,
+) -> Response:
+    """
+    Validator'lar va Range bilan javob (manba - open_range(start, length) bo'laklari)
+
+    Args:
+        request: Joriy so'rov (shartli header'lar uchun)
+        size, mtime: Kontent hajmi va o'zgartirilgan vaqti
+        open_range: (start, length) bo'yicha baytlarni oqim qilib beruvchi funksiya
+        media_type: Content-Type
+        filename: Foydalanuvchiga ko'rsatiladigan fayl nomi
+        content_hash: SHA-256 - berilsa kuchli ETag va uzoq muddatli (immutable) kesh
+        inline: True - brauzer ichida ko'rsatish, False - yuklab olish
+        extra_headers: Qo'shimcha header'lar
+    """
+    if content_hash:
+        etag = f'"{content_hash}"'
+        cache_control = IMMUTABLE_CACHE_CONTROL
+    else:
+        # Xeshsiz (eski) fayllar - hajm va vaqt bo'yicha kuchsiz ETag
+        etag = f'W/"{size:x}-{int(mtime * 1000):x}"'
+        cache_control = DEFAULT_CACHE_CONTROL
+
+    headers = {
+        "ETag": etag,
+        "Last-Modified": formatdate(mtime, usegmt=True),
+        "Cache-Control": cache_control,
+        "Accept-Ranges": "bytes",
+    }
+    if extra_headers:
+        headers.update(extra_headers)
+
+    if _not_modified(request, etag, mtime):
+        return Response(status_code=304, headers=headers)
+
+    headers["Content-Disposition"] = content_disposition("inline" if inline else "attachment", filename)
+
+    range_header = request.headers.get("range")
+    byte_range = None
+    if range_header and _range_applies(request, etag, mtime):
+        try:
+            byte_range = parse_range(range_header, size)
+        except ValueError:
+            headers["Content-Range"] = f"bytes */{size}"
+            return Response(status_code=416, headers=headers)
+
+    if byte_range is None:
+        headers["Content-Length"] = str(size)
+        return StreamingResponse(open_range(0, size), media_type=media_type, headers=headers)
+
+    start, end = byte_range
+    length = end - start + 1
+    headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+    headers["Content-Length"] = str(length)
+    return StreamingResponse(
+        open_range(start, length),
+        status_code=206,
+        media_type=media_type,
+        headers=headers,
+    )
+
+
+async def conditional_file_response(request: Request, path: str, **kwargs) -> Response:
+    """
+    Lokal faylni validator'lar va Range bilan qaytarish (parametrlar - conditional_response)
+
+    Raises:
+        FileNotFoundError: Fayl mavjud bo'lmasa
+    """
+    stat = await run_in_threadpool(os.stat, path)
+    return conditional_response(
+        request,
+        size=stat.st_size,
+        mtime=stat.st_mtime,
+        open_range=lambda start, length: file_chunks(path, start, length),
+        **kwargs,
+    )
+
+
+async def storage_file_response(
+    request: Request,
+    storage,
+    key: str,
+    *,
+    expires_in: int,
+    check_exists: bool = False,
+    **kwargs,
+) -> Response:
+    """
+    Ombordagi obyektni qaytarish
+
+    Drayver presigned havola bera olsa (S3) mijoz unga yo'naltiriladi - fayl web worker
+    orqali o'tmaydi. Aks holda (lokal disk) conditional_response bilan oqim qilinadi.
+    Yo'naltirish havola amal qiladigan muddatdan biroz kamroq vaqtga keshlanadi.
+
+    Args:
+        check_exists: Yo'naltirishdan oldin obyekt borligini tekshirish (fonda yaratiladigan
+            variant/eskizlar uchun - yo'q bo'lsa chaqiruvchi asl faylga qaytishi mumkin)
+
+    Raises:
+        FileNotFoundError: Obyekt mavjud bo'lmasa (presigned havolada faqat check_exists bilan)
+    """
+    stored = await storage.stat(key) if check_exists else None
+    if check_exists and stored is None:
+        raise FileNotFoundError(key)
+    url = await storage.presigned_get(
+        key,
+        expires_in,
+        filename=kwargs.get("filename"),
+        content_type=kwargs.get("media_type"),
+        inline=kwargs.get("inline", False),
+    )
+    if url:
+        max_age = expires_in - PRESIGN_CACHE_MARGIN_SECONDS
+        headers = {"Cache-Control": f"private, max-age={max_age}" if max_age > 0 else "private, no-store"}
+        vary = (kwargs.get("extra_headers") or {}).get("Vary")
+        if vary:
+            headers["Vary"] = vary
+        return RedirectResponse(url, status_code=307, headers=headers)
+    if stored is None:
+        stored = await storage.stat(key)
+    if stored is None:
+        raise FileNotFoundError(key)
+    return conditional_response(
+        request,
+        size=stored.size,
+        mtime=stored.mtime,
+        open_range=lambda start, length: storage.iter_chunks(key, start, length),
+        **kwargs,
+    )
@@ -0,0 +1,94 @@
+"""
+Keyset (cursor) pagination yordamchilari - (created_at, id) bo'yicha kamayish tartibida
+
+OFFSET chuqur sahifalarda barcha oldingi qatorlarni o'tkazib yuboradi; keyset rejimida
+har bir sahifa oldingi sahifaning oxirgi (created_at, id) juftligidan indeks orqali boshlanadi.
+"""
+import json
+from typing import List, Optional, Tuple
+from fastapi import HTTPException
+from sqlalchemy import String, func, literal, select, tuple_, type_coerce
+from app.schemas.pagination import encode_cursor, decode_cursor
+
+# List endpoint'larida keyingi sahifa cursor'i shu header'da qaytariladi
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+# SQLite'da taxminiy son uchun COUNT shu chegaradan oshmaydi
+ESTIMATE_COUNT_CAP = 10000
+
+
+def _dialect_name(db) -> str:
+    return db.get_bind().dialect.name
+
+
+def keyset_column(db, column):
+    """
+    Cursor solishtiriladigan ustun
+
+    SQLite DateTime'ni matn sifatida saqlaydi va server_default (CURRENT_TIMESTAMP) bilan
+    Python qiymatlari formati farq qiladi - shuning uchun saqlangan matn bo'yicha solishtiriladi.
+    """
+    if _dialect_name(db) == "sqlite":
+        return type_coerce(column, String)
+    return column
+
+
+def apply_keyset(db, query, created_column, id_column, cursor: Optional[str], limit: int):
+    """
+    So'rovga keyset tartiblash va filtrini qo'shish
+
+    Args:
+        db: Session yoki AsyncSession
+        query: Select yoki legacy Query (tartiblashsiz)
+        created_column: created_at ustuni
+        id_column: Primary key ustuni
+        cursor: Oldingi sahifadan olingan cursor (bo'sh satr - birinchi sahifa)
+        limit: Sahifa hajmi (keyingi sahifa borligini bilish uchun limit + 1 o'qiladi)
+
+    Returns:
+        Natija qatorlari (element, created_at, id) ko'rinishida bo'lgan so'rov
+    """
+    key = keyset_column(db, created_column)
+    query = query.add_columns(key.label("keyset_created_at"), id_column.label("keyset_id"))
+    if cursor:
+        try:
+            created_at, last_id = decode_cursor(cursor)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        query = query.filter(
+            tuple_(key, id_column) < tuple_(literal(created_at, key.type), literal(last_id))
+        )
+    return query.order_by(key.desc(), id_column.desc()).limit(limit + 1)
+
+
+def split_keyset_page(rows: list, limit: int) -> Tuple[List, Optional[str]]:
+    """apply_keyset natijasini (elementlar, keyingi cursor) ga ajratish"""
+    items = [row[0] for row in rows[:limit]]
+    next_cursor = None
+    if len(rows) > limit:
+        last = rows[limit - 1]
+        next_cursor = encode_cursor(last[-2], last[-1])
+    return items, next_cursor
+
+
+async def estimate_count(db, query) -> int:
+    """
+    Taxminiy qatorlar soni (aniq COUNT o'rniga)
+
+    PostgreSQL'da planner bahosi (EXPLAIN) ishlatiladi, boshqa hollarda
+    COUNT ESTIMATE_COUNT_CAP bilan cheklanadi.
+    """
+    bind = db.get_bind()
+    if bind.dialect.name == "postgresql":
+        try:
+            compiled = query.compile(dialect=bind.dialect, compile_kwargs={"literal_binds": True})
+            connection = await db.connection()
+            result = await connection.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {compiled}")
+            plan = result.scalar()
+            if isinstance(plan, str):
+                plan = json.loads(plan)
+            return int(plan[0]["Plan"]["Plan Rows"])
+        except Exception:
+            pass
+    capped = query.order_by(None).limit(ESTIMATE_COUNT_CAP).subquery()
+    return await db.scalar(select(func.count()).select_from(capped)) or 0
@@ -0,0 +1,303 @@
+"""
+Dars materiallaridan fonda matn ajratib olish va birinchi sahifa eskizini (thumbnail) yaratish
+
+Har bir fayl (kontent xeshi) bir marta qayta ishlanadi: natija lesson_material_contents
+jadvaliga, eskiz esa omborga (lesson_materials/thumbnails/...) yoziladi. Ish process
+pool'da bajariladi va vaqt chegarasi bor - buzilgan yoki juda katta hujjat serverni
+band qilib qo'ymaydi.
+
+- DOCX / PPTX: zipfile + XML (qo'shimcha kutubxonasiz), eskiz - docProps/thumbnail.jpeg
+- PDF: pypdfium2 (matn + birinchi sahifa rasmi, requirements.txt'da) yoki pypdf (faqat matn)
+- DOC / PPT (eski binar format): qo'llab-quvvatlanmaydi
+
+Kerakli kutubxona o'rnatilmagan bo'lsa natija saqlanmaydi - kutubxona o'rnatilgach
+keyingi ishga tushishdagi backfill faylni qayta ishlaydi.
+"""
+import asyncio
+import io
+import logging
+import re
+import signal
+import zipfile
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional, Tuple
+from xml.etree import ElementTree
+from sqlalchemy import delete, func, select
+from sqlalchemy.exc import IntegrityError
+from app.config import settings
+from app.database import AsyncSessionLocal
+from app.models.lesson_material import LessonMaterial, LessonMaterialContent
+from app.utils.blob_store import blob_key, thumbnail_key
+from app.utils.storage import get_storage
+from app.utils.worker_pool import WorkerPool, WorkerPoolBusy
+
+logger = logging.getLogger(__name__)
+
+MAX_TEXT_LENGTH = 200_000  # Saqlanadigan matn chegarasi (belgilar)
+MAX_XML_MEMBER_SIZE = 50 * 1024 * 1024  # Zip ichidagi bitta XML'ning ochilgan hajmi chegarasi
+MAX_PDF_PAGES = 300
+THUMBNAIL_WIDTH = 320
+
+_W = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+_A = "{http://schemas.openxmlformats.org/drawingml/2006/main}"
+_SLIDE_RE = re.compile(r"^ppt/slides/slide(\d+)\.xml$")
+
+STATUS_PENDING = "pending"
+STATUS_DONE = "done"
+STATUS_FAILED = "failed"
+STATUS_UNSUPPORTED = "unsupported"
+# extract_material natijasi, bazaga yozilmaydi: format qo'llab-quvvatlanadi, kutubxona yo'q
+LIBRARY_MISSING = "library_missing"
+
+# Shundan eski "pending" yozuv tashlab ketilgan hisoblanadi: ish vaqt chegarasi (navbat bilan)
+# tugagach yozuv albatta yangilanadi, qo'shimcha vaqt - fayl o'qish uchun zaxira
+STALE_PENDING_SECONDS = settings.DOCUMENT_JOB_TIMEOUT_SECONDS + 5 + 300
+
+document_pool = WorkerPool(
+    name="documents",
+    max_workers=settings.DOCUMENT_WORKERS,
+    max_pending=settings.DOCUMENT_MAX_PENDING,
+    use_processes=True,
+)
+
+
+class ExtractionTimeout(Exception):
+    """Hujjatni qayta ishlash vaqt chegarasidan oshdi"""
+
+
+def _read_member(archive: zipfile.ZipFile, name: str) -> Optional[bytes]:
+    try:
+        info = archive.getinfo(name)
+    except KeyError:
+        return None
+    if info.file_size > MAX_XML_MEMBER_SIZE:
+        raise ValueError(f"{name} juda katta ({info.file_size} bayt)")
+    return archive.read(info)
+
+
+def _paragraphs(xml: bytes, paragraph_tag: str, text_tag: str) -> List[str]:
+    root = ElementTree.fromstring(xml)
+    lines = []
+    for paragraph in root.iter(paragraph_tag):
+        line = "".join(node.text or "" for node in paragraph.iter(text_tag)).strip()
+        if line:
+            lines.append(line)
+    return lines
+
+
+def _make_thumbnail(image) -> bytes:
+    from PIL import Image
+
+    if image.mode not in ("RGB", "RGBA"):
+        image = image.convert("RGB")
+    if image.width > THUMBNAIL_WIDTH:
+        height = max(1, round(image.height * THUMBNAIL_WIDTH / image.width))
+        image = image.resize((THUMBNAIL_WIDTH, height), Image.LANCZOS)
+    out = io.BytesIO()
+    image.save(out, "WEBP", quality=75)
+    return out.getvalue()
+
+
+def _office_thumbnail(archive: zipfile.ZipFile) -> Optional[bytes]:
+    """Office hujjati ichiga saqlangan eskiz (Word/PowerPoint "Save thumbnail" bilan)"""
+    data = _read_member(archive, "docProps/thumbnail.jpeg")
+    if data is None:
+        return None
+    try:
+        from PIL import Image
+    except ImportError:
+        return None
+    with Image.open(io.BytesIO(data)) as image:
+        return _make_thumbnail(image)
+
+
+def _extract_docx(data: bytes) -> Tuple[str, Optional[bytes]]:
+    with zipfile.ZipFile(io.BytesIO(data)) as archive:
+        xml = _read_member(archive, "word/document.xml")
+        lines = _paragraphs(xml, _W + "p", _W + "t") if xml else []
+        return "\n".join(lines), _office_thumbnail(archive)
+
+
+def _extract_pptx(data: bytes) -> Tuple[str, Optional[bytes]]:
+    with zipfile.ZipFile(io.BytesIO(data)) as archive:
+        slides = sorted(
+            (int(match.group(1)), name)
+            for name in archive.namelist()
+            if (match := _SLIDE_RE.match(name))
+        )
+        lines = []
+        for _, name in slides:
+            lines.extend(_paragraphs(_read_member(archive, name), _A + "p", _A + "t"))
+        return "\n".join(lines), _office_thumbnail(archive)
+
+
+def _extract_pdf(data: bytes) -> Optional[Tuple[str, Optional[bytes]]]:
+    try:
+        import pypdfium2 as pdfium
+    except ImportError:
+        pdfium = None
+    if pdfium is not None:
+        document = pdfium.PdfDocument(data)
+        try:
+            parts = []
+            for index in range(min(len(document), MAX_PDF_PAGES)):
+                page = document[index]
+                textpage = page.get_textpage()
+                parts.append(textpage.get_text_bounded())
+                textpage.close()
+                page.close()
+            thumbnail = None
+            if len(document):
+                try:
+                    page = document[0]
+                    scale = THUMBNAIL_WIDTH / max(page.get_width(), 1)
+                    thumbnail = _make_thumbnail(page.render(scale=scale).to_pil())
+                    page.close()
+                except ImportError:
+                    pass
+            return "\n".join(parts), thumbnail
+        finally:
+            document.close()
+    try:
+        from pypdf import PdfReader
+    except ImportError:
+        return None
+    reader = PdfReader(io.BytesIO(data))
+    return "\n".join((page.extract_text() or "") for page in reader.pages[:MAX_PDF_PAGES]), None
+
+
+_EXTRACTORS = {
+    "docx": _extract_docx,
+    "pptx": _extract_pptx,
+    "pdf": _extract_pdf,
+}
+
+
+def _on_alarm(signum, frame):
+    raise ExtractionTimeout()
+
+
+def extract_material(data: bytes, file_type: str, timeout: int) -> Tuple[str, Optional[str], Optional[bytes]]:
+    """
+    Fayldan matn va eskiz olish (process pool ichida ishlaydi)
+
+    Vaqt chegarasi worker process ichida SIGALRM bilan qo'yiladi - osilib qolgan ish
+    process'ni band qilib qo'ymaydi (Windows'da faqat tashqi timeout ishlaydi).
+
+    Returns:
+        (status, matn, eskiz WebP baytlari)
+    """
+    extractor = _EXTRACTORS.get(file_type.lower())
+    if extractor is None:
+        return STATUS_UNSUPPORTED, None, None
+    use_alarm = hasattr(signal, "SIGALRM")
+    if use_alarm:
+        previous = signal.signal(signal.SIGALRM, _on_alarm)
+        signal.alarm(timeout)
+    try:
+        result = extractor(data)
+    finally:
+        if use_alarm:
+            signal.alarm(0)
+            signal.signal(signal.SIGALRM, previous)
+    if result is None:
+        return LIBRARY_MISSING, None, None
+    text, thumbnail = result
+    text = re.sub(r"[ \t]+", " ", text).strip()[:MAX_TEXT_LENGTH]
+    return STATUS_DONE, text, thumbnail
+
+
+async def process_material_content(content_hash: str, file_type: str):
+    """
+    Fayl uchun matn va eskizni yaratish (BackgroundTasks yoki ishga tushishdagi backfill'dan)
+
+    Xesh allaqachon qayta ishlangan yoki ishlanayotgan bo'lsa hech narsa qilmaydi.
+    """
+    async with AsyncSessionLocal() as db:
+        # Navbatni "egallash" - unique content_hash parallel ikki marta ishlashdan saqlaydi
+        content = LessonMaterialContent(content_hash=content_hash, status=STATUS_PENDING)
+        db.add(content)
+        try:
+            await db.commit()
+        except IntegrityError:
+            await db.rollback()
+            return
+
+        try:
+            data = b"".join([chunk async for chunk in get_storage().iter_chunks(blob_key(content_hash))])
+            status, extracted, thumbnail = await document_pool.run(
+                extract_material, data, file_type, settings.DOCUMENT_JOB_TIMEOUT_SECONDS,
+                # Ichki (SIGALRM) chegara ishlamagan holat uchun zaxira
+                timeout=settings.DOCUMENT_JOB_TIMEOUT_SECONDS + 5,
+            )
+            if status == LIBRARY_MISSING:
+                logger.warning(f"{file_type} fayllari uchun kutubxona o'rnatilmagan - material keyinroq qayta ishlanadi")
+                await db.delete(content)
+                await db.commit()
+                return
+            if thumbnail:
+                await get_storage().put_bytes(thumbnail_key(content_hash), thumbnail, "image/webp")
+            content.status = status
+            content.text = extracted
+            content.has_thumbnail = bool(thumbnail)
+        except WorkerPoolBusy:
+            # Keyingi ishga tushishda qayta uriniladi
+            await db.delete(content)
+            await db.commit()
+            return
+        except Exception as e:
+            logger.error(f"Material kontentini ajratishda xatolik ({content_hash[:12]}): {e!r}")
+            content.status = STATUS_FAILED
+            content.error = (str(e) or type(e).__name__)[:500]
+        content.processed_at = datetime.now(timezone.utc)
+        await db.commit()
+
+
+async def _reclaim_and_process() -> int:
+    async with AsyncSessionLocal() as db:
+        # Faqat eskirgan (yiqilgan process'dan qolgan) pending yozuvlar - boshqa worker hozir
+        # ishlayotgan yozuvlarga tegilmaydi
+        stale_before = datetime.now(timezone.utc) - timedelta(seconds=STALE_PENDING_SECONDS)
+        await db.execute(delete(LessonMaterialContent).where(
+            LessonMaterialContent.status == STATUS_PENDING,
+            LessonMaterialContent.created_at < stale_before,
+        ))
+        # Avvalgi versiyalar kutubxona yo'qligida PDF'larni "unsupported" deb saqlagan -
+        # ajratuvchisi bor formatlar qayta ishlanadi
+        await db.execute(delete(LessonMaterialContent).where(
+            LessonMaterialContent.status == STATUS_UNSUPPORTED,
+            LessonMaterialContent.content_hash.in_(
+                select(LessonMaterial.content_hash).where(func.lower(LessonMaterial.file_type).in_(list(_EXTRACTORS)))
+            ),
+        ))
+        await db.commit()
+        rows = (await db.execute(
+            select(LessonMaterial.content_hash, LessonMaterial.file_type)
+            .outerjoin(LessonMaterialContent, LessonMaterialContent.content_hash == LessonMaterial.content_hash)
+            .where(LessonMaterial.content_hash.isnot(None), LessonMaterialContent.id.is_(None))
+            .distinct()
+        )).all()
+    seen = set()
+    for content_hash, file_type in rows:
+        if content_hash not in seen:
+            seen.add(content_hash)
+            await process_material_content(content_hash, file_type)
+    return len(seen)
+
+
+async def backfill_material_previews():
+    """
+    Hali qayta ishlanmagan materiallarni navbat bilan qayta ishlash (ilova ishga tushganda)
+
+    Yarim qolgan (pending) yozuvlar STALE_PENDING_SECONDS'dan eskirgach qaytadan ishlanadi:
+    ishga tushishda va shu muddatdan keyin yana bir marta (qayta ishga tushishdan oldingi
+    yiqilishda qolgan yangi yozuvlar uchun).
+    """
+    for delay in (0, STALE_PENDING_SECONDS):
+        await asyncio.sleep(delay)
+        try:
+            processed = await _reclaim_and_process()
+            if processed:
+                logger.info(f"{processed} ta material fayli qayta ishlandi")
+        except Exception as e:
+            logger.error(f"Materiallarni qayta ishlashda xatolik: {e!r}")
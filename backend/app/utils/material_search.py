@@ -0,0 +1,119 @@
+"""
+Dars materiallari matni bo'yicha qidirish (PostgreSQL - tsvector GIN, SQLite - FTS5)
+
+Matn fonda ajratib olinadi (app/utils/material_preview.py) va lesson_material_contents
+jadvalida saqlanadi. Indeks ilova ishga tushganda `setup_material_search` orqali yaratiladi;
+yaratib bo'lmasa oddiy ILIKE qidiruviga qaytiladi.
+"""
+from typing import Optional, Tuple
+from sqlalchemy import column, func, literal_column, table, text, and_
+from sqlalchemy.sql import Select
+from app.models.lesson_material import LessonMaterialContent
+from app.utils.student_search import fts_match_query, search_tokens
+
+FTS_TABLE = "lesson_material_contents_fts"
+TSVECTOR_INDEX = "idx_material_content_tsv"
+SNIPPET_WORDS = 16
+
+# PostgreSQL: indeks ifodasi bilan so'rovdagi ifoda bir xil bo'lishi kerak
+TSVECTOR_EXPRESSION = "to_tsvector('simple', coalesce(lesson_material_contents.text, ''))"
+
+_SQLITE_SETUP = [
+    f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        text, content='lesson_material_contents', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON lesson_material_contents BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, text) VALUES (new.id, new.text);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON lesson_material_contents BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, text) VALUES ('delete', old.id, old.text);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au
+    AFTER UPDATE OF text ON lesson_material_contents BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, text) VALUES ('delete', old.id, old.text);
+        INSERT INTO {FTS_TABLE}(rowid, text) VALUES (new.id, new.text);
+    END
+    """,
+]
+
+_POSTGRES_SETUP = [
+    f"CREATE INDEX IF NOT EXISTS {TSVECTOR_INDEX} ON lesson_material_contents USING gin ({TSVECTOR_EXPRESSION})",
+]
+
+_fts = table(FTS_TABLE, column("rowid"))
+_backend: Optional[str] = None
+
+
+def setup_material_search(engine) -> Optional[str]:
+    """
+    Matn qidiruv indeksini yaratish (idempotent)
+
+    Args:
+        engine: Sync SQLAlchemy engine
+
+    Returns:
+        Faollashtirilgan backend nomi ("fts5", "tsvector") yoki None
+    """
+    global _backend
+    dialect = engine.dialect.name
+    if dialect == "sqlite":
+        with engine.begin() as conn:
+            exists = conn.execute(
+                text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+                {"name": FTS_TABLE},
+            ).first() is not None
+            for statement in _SQLITE_SETUP:
+                conn.execute(text(statement))
+            if not exists:
+                conn.execute(text(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')"))
+        _backend = "fts5"
+    elif dialect == "postgresql":
+        with engine.begin() as conn:
+            for statement in _POSTGRES_SETUP:
+                conn.execute(text(statement))
+        _backend = "tsvector"
+    return _backend
+
+
+def apply_material_search(stmt: Select, search: str) -> Tuple[Select, object, object]:
+    """
+    LessonMaterialContent join qilingan so'rovga matn qidiruvi shartini qo'shish
+
+    Args:
+        stmt: lesson_material_contents join qilingan SELECT (institution/fan filtri chaqiruvchida)
+        search: Qidiruv matni
+
+    Returns:
+        (yangi so'rov, relevantlik bo'yicha tartiblash ifodasi, matndan parcha (snippet) ifodasi)
+    """
+    tokens = search_tokens(search)
+    content_text = LessonMaterialContent.text
+
+    if tokens and _backend == "fts5":
+        match = literal_column(FTS_TABLE).op("MATCH")(fts_match_query(tokens, prefix=False))
+        stmt = stmt.join(_fts, _fts.c.rowid == LessonMaterialContent.id).where(match)
+        rank = func.bm25(literal_column(FTS_TABLE))
+        snippet = func.snippet(literal_column(FTS_TABLE), 0, "", "", "…", SNIPPET_WORDS)
+        return stmt, rank.asc(), snippet
+
+    if tokens and _backend == "tsvector":
+        # Har bir so'z prefiks sifatida (so'z qo'shimchalari uchun): "algebra:* & tenglama:*"
+        query = func.to_tsquery("simple", " & ".join(f"{token}:*" for token in tokens))
+        vector = literal_column(TSVECTOR_EXPRESSION)
+        stmt = stmt.where(vector.op("@@")(query))
+        snippet = func.ts_headline(
+            "simple", content_text, query,
+            f"StartSel=\"\", StopSel=\"\", MaxWords={SNIPPET_WORDS}, MinWords=8",
+        )
+        return stmt, func.ts_rank(vector, query).desc(), snippet
+
+    stmt = stmt.where(and_(*[content_text.ilike(f"%{token}%") for token in tokens or [search]]))
+    return stmt, LessonMaterialContent.id.desc(), func.substr(content_text, 1, 200)
@@ -0,0 +1,55 @@
+"""
+Ilova ishga tushganda va qo'lda ishlatiladigan migratsiya skriptlari uchun yordamchilar
+(Alembic versiyalari yo'q)
+"""
+from sqlalchemy import and_, delete, func, inspect, select
+
+
+def deduplicate_rows(conn, model, column_names) -> int:
+    """
+    Berilgan ustunlar bo'yicha takrorlangan qatorlardan eng oxirgisini (max id) qoldirish
+
+    NULL qiymatli kalitlar tegilmaydi - unique index ularni baribir takror hisoblamaydi.
+
+    Returns:
+        O'chirilgan qatorlar soni
+    """
+    table = model.__table__
+    columns = [table.c[name] for name in column_names]
+    latest = select(func.max(table.c.id)).group_by(*columns)
+    result = conn.execute(delete(table).where(
+        and_(*[column.isnot(None) for column in columns]),
+        table.c.id.not_in(latest),
+    ))
+    return result.rowcount
+
+
+def ensure_unique_index(engine, model, index_name: str, hint: str = ""):
+    """
+    Mavjud jadvalga unique index qo'shish
+
+    ON CONFLICT shu indeksga tayanadigan endpoint'lar index'siz ishlamaydi - yaratib
+    bo'lmasa ilova ishga tushmasligi uchun xatolik ko'tariladi. Takror qatorlar bu yerda
+    o'chirilmaydi: ular alohida skript bilan ko'rib chiqilib tozalanadi (deduplicate_rows).
+
+    Args:
+        engine: Sync engine
+        model: ORM model
+        index_name: __table_args__ dagi index nomi
+        hint: Xatolik xabariga qo'shiladigan ko'rsatma (masalan tozalash skripti)
+    """
+    table = model.__table__
+    index = next(index for index in table.indexes if index.name == index_name)
+
+    def exists() -> bool:
+        return index_name in {item["name"] for item in inspect(engine).get_indexes(table.name)}
+
+    if exists():
+        return
+    try:
+        index.create(bind=engine)
+    except Exception as e:
+        # Bir vaqtda ishga tushgan boshqa worker index'ni yaratib qo'ygan bo'lishi mumkin
+        if exists():
+            return
+        raise RuntimeError(f"{index_name} yaratilmadi: {e}" + (f"\n{hint}" if hint else "")) from e
@@ -0,0 +1,115 @@
+"""
+Dars materiallarini ko'rish uchun imzolangan (HMAC), qisqa muddatli havolalar
+
+PDF viewer bitta fayl uchun o'nlab Range so'rov yuboradi. Har birida JWT'ni tekshirib
+foydalanuvchini bazadan qidirmaslik uchun havola bir marta (autentifikatsiya bilan)
+yaratiladi: faylni topish uchun kerakli ma'lumot (xesh yoki yo'l, turi, nomi) havolaning
+o'zida imzolangan holda bo'ladi, shuning uchun ko'rsatishda baza umuman ishlatilmaydi.
+
+Imzo material id'siga bog'langan - boshqa materialning URL'iga ko'chirib bo'lmaydi.
+
+Eskizlar (<img> so'rovi Authorization sarlavhasini yubormaydi) ham shunday: havola
+muassasa bo'yicha filtrlangan material ro'yxatida imzolanadi va xeshga bog'lanadi.
+"""
+import base64
+import hashlib
+import hmac
+import json
+import time
+from typing import Optional
+from app.config import settings
+
+# JWT kaliti bilan bir xil imzo bo'lmasligi uchun alohida kalit hosil qilinadi
+_KEY = hashlib.sha256(b"lesson-material-view:" + settings.SECRET_KEY.encode()).digest()
+
+
+class SignedMaterial:
+    """Imzosi tekshirilgan havoladagi material ma'lumotlari"""
+
+    __slots__ = ("content_hash", "file_path", "file_type", "file_name")
+
+    def __init__(self, content_hash: Optional[str], file_path: Optional[str], file_type: str, file_name: str):
+        self.content_hash = content_hash
+        self.file_path = file_path
+        self.file_type = file_type
+        self.file_name = file_name
+
+
+def _b64encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode()
+
+
+def _b64decode(text: str) -> bytes:
+    return base64.urlsafe_b64decode(text + "=" * (-len(text) % 4))
+
+
+def _signature(material_id: int, exp: int, data: str) -> str:
+    message = f"{material_id}:{exp}:{data}".encode()
+    return _b64encode(hmac.new(_KEY, message, hashlib.sha256).digest())
+
+
+def sign_material_view(material, expires_in: int) -> dict:
+    """
+    Material uchun imzolangan query parametrlarini yaratish
+
+    Args:
+        material: LessonMaterial
+        expires_in: Amal qilish muddati (sekund)
+
+    Returns:
+        {"exp": ..., "d": ..., "sig": ...}
+    """
+    exp = int(time.time()) + expires_in
+    payload = {"t": material.file_type, "n": material.file_name}
+    if material.content_hash:
+        payload["h"] = material.content_hash
+    else:
+        # Eski (xeshsiz) fayllar - yo'l imzo ichida, tashqaridan o'zgartirib bo'lmaydi
+        payload["p"] = material.file_path
+    data = _b64encode(json.dumps(payload, separators=(",", ":")).encode())
+    return {"exp": exp, "d": data, "sig": _signature(material.id, exp, data)}
+
+
+def verify_material_view(material_id: int, exp: int, data: str, sig: str) -> Optional[SignedMaterial]:
+    """
+    Imzo va muddatni tekshirish
+
+    Returns:
+        Imzo to'g'ri va muddati o'tmagan bo'lsa SignedMaterial, aks holda None
+    """
+    if exp < time.time():
+        return None
+    if not hmac.compare_digest(_signature(material_id, exp, data), sig):
+        return None
+    try:
+        payload = json.loads(_b64decode(data))
+    except ValueError:
+        return None
+    return SignedMaterial(payload.get("h"), payload.get("p"), payload.get("t", ""), payload.get("n", "file"))
+
+
+def _thumbnail_signature(content_hash: str, exp: int) -> str:
+    message = f"thumbnail:{content_hash}:{exp}".encode()
+    return _b64encode(hmac.new(_KEY, message, hashlib.sha256).digest())
+
+
+def sign_thumbnail(content_hash: str, expires_in: int) -> dict:
+    """
+    Eskiz uchun imzolangan query parametrlari
+
+    Muddat expires_in oralig'ining oxirigacha yaxlitlanadi: shu oraliqda ro'yxat qayta
+    yuklansa URL o'zgarmaydi va brauzer keshidagi eskiz ishlatiladi. Havola kamida
+    expires_in sekund amal qiladi.
+
+    Returns:
+        {"exp": ..., "sig": ...}
+    """
+    exp = (int(time.time()) // expires_in + 2) * expires_in
+    return {"exp": exp, "sig": _thumbnail_signature(content_hash, exp)}
+
+
+def verify_thumbnail(content_hash: str, exp: int, sig: str) -> bool:
+    """Eskiz havolasining imzosi va muddatini tekshirish"""
+    if exp < time.time():
+        return False
+    return hmac.compare_digest(_thumbnail_signature(content_hash, exp), sig)
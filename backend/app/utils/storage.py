@@ -0,0 +1,348 @@
+"""
+Fayl ombori (storage) abstraksiyasi: lokal disk va S3-mos (AWS S3, MinIO, ...) drayverlar
+
+Bir nechta app server ishlaganda fayllar umumiy omborda bo'lishi kerak. Route'lar
+faqat kalit (key) bilan ishlaydi, qaysi drayver ishlatilishi STORAGE_BACKEND
+sozlamasi bilan tanlanadi. S3 drayveri presigned GET havolalarini qaytaradi -
+katta fayllar web worker orqali proksi qilinmaydi, mijoz to'g'ridan-to'g'ri
+ombordan yuklab oladi.
+
+S3 drayveri uchun boto3 kerak (ixtiyoriy): pip install boto3
+"""
+import os
+import shutil
+import tempfile
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import AsyncIterator, List, Optional, Tuple
+import anyio
+from starlette.concurrency import run_in_threadpool
+from app.config import settings
+
+READ_CHUNK_SIZE = 64 * 1024
+
+
+class StoredObject:
+    """Ombordagi obyekt haqida ma'lumot"""
+
+    __slots__ = ("size", "mtime")
+
+    def __init__(self, size: int, mtime: float):
+        self.size = size
+        self.mtime = mtime
+
+
+class StorageBackend(ABC):
+    """Drayverlar uchun umumiy interfeys"""
+
+    name = ""
+
+    @abstractmethod
+    async def put_file(self, key: str, source: Path, content_type: Optional[str] = None):
+        """Lokal (vaqtinchalik) faylni omborga joylash - muvaffaqiyatli bo'lsa manba fayl o'chiriladi"""
+
+    @abstractmethod
+    async def put_bytes(self, key: str, data: bytes, content_type: Optional[str] = None):
+        """Kichik obyektni (eskiz, rasm varianti) xotiradan yozish"""
+
+    async def exists(self, key: str) -> bool:
+        return await self.stat(key) is not None
+
+    @abstractmethod
+    async def stat(self, key: str) -> Optional[StoredObject]:
+        """Obyekt hajmi va o'zgartirilgan vaqti (obyekt bo'lmasa None)"""
+
+    @abstractmethod
+    def iter_chunks(self, key: str, start: int = 0, length: Optional[int] = None) -> AsyncIterator[bytes]:
+        """Obyektni (yoki uning bir qismini) bo'laklab o'qish"""
+
+    @abstractmethod
+    async def delete(self, key: str):
+        """Obyektni o'chirish (bo'lmasa xatolik bermaydi)"""
+
+    async def presigned_get(
+        self,
+        key: str,
+        expires_in: int,
+        filename: Optional[str] = None,
+        content_type: Optional[str] = None,
+        inline: bool = False,
+    ) -> Optional[str]:
+        """Vaqtinchalik yuklab olish havolasi (drayver qo'llab-quvvatlamasa None)"""
+        return None
+
+
+def _safe_key(key: str) -> str:
+    parts = Path(key).parts
+    if not parts or Path(key).is_absolute() or ".." in parts:
+        raise ValueError(f"Noto'g'ri kalit: {key!r}")
+    return key
+
+
+def _move_file(source: Path, destination: Path):
+    destination.parent.mkdir(parents=True, exist_ok=True)
+    try:
+        os.replace(source, destination)
+    except OSError:
+        # Boshqa disk (EXDEV) - nusxalab, keyin atomar almashtirish
+        fd, temp_name = tempfile.mkstemp(dir=destination.parent, prefix=".move-", suffix=".part")
+        os.close(fd)
+        try:
+            shutil.copyfile(source, temp_name)
+            os.replace(temp_name, destination)
+        except BaseException:
+            os.unlink(temp_name)
+            raise
+        os.unlink(source)
+
+
+class LocalStorage(StorageBackend):
+    """Lokal disk (bitta server yoki umumiy NFS papka uchun)"""
+
+    name = "local"
+
+    def __init__(self, root: str):
+        self.root = Path(root)
+
+    def local_path(self, key: str) -> Path:
+        """Kalitga mos fayl yo'li"""
+        return self.root / _safe_key(key)
+
+    async def put_file(self, key: str, source: Path, content_type: Optional[str] = None):
+        await run_in_threadpool(_move_file, Path(source), self.local_path(key))
+
+    def _write_bytes(self, key: str, data: bytes):
+        destination = self.local_path(key)
+        destination.parent.mkdir(parents=True, exist_ok=True)
+        fd, temp_name = tempfile.mkstemp(dir=destination.parent, prefix=".write-", suffix=".part")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(temp_name, destination)
+        except BaseException:
+            os.unlink(temp_name)
+            raise
+
+    async def put_bytes(self, key: str, data: bytes, content_type: Optional[str] = None):
+        await run_in_threadpool(self._write_bytes, key, data)
+
+    async def stat(self, key: str) -> Optional[StoredObject]:
+        try:
+            st = await run_in_threadpool(os.stat, self.local_path(key))
+        except FileNotFoundError:
+            return None
+        return StoredObject(st.st_size, st.st_mtime)
+
+    async def iter_chunks(self, key: str, start: int = 0, length: Optional[int] = None) -> AsyncIterator[bytes]:
+        async with await anyio.open_file(self.local_path(key), "rb") as f:
+            await f.seek(start)
+            remaining = length
+            while remaining is None or remaining > 0:
+                size = READ_CHUNK_SIZE if remaining is None else min(READ_CHUNK_SIZE, remaining)
+                chunk = await f.read(size)
+                if not chunk:
+                    break
+                if remaining is not None:
+                    remaining -= len(chunk)
+                yield chunk
+
+    def _delete(self, path: Path):
+        try:
+            path.unlink()
+        except FileNotFoundError:
+            return
+        # Bo'shab qolgan prefiks papkalarni tozalash (yuqori ikki daraja - masalan
+        # "lesson_materials/blobs" - saqlanib qoladi)
+        directory = path.parent
+        while len(directory.relative_to(self.root).parts) > 2:
+            try:
+                directory.rmdir()
+            except OSError:
+                break
+            directory = directory.parent
+
+    async def delete(self, key: str):
+        await run_in_threadpool(self._delete, self.local_path(key))
+
+
+class S3Storage(StorageBackend):
+    """S3-mos ombor (AWS S3, MinIO, Cloudflare R2, ...)"""
+
+    name = "s3"
+
+    def __init__(
+        self,
+        bucket: str,
+        endpoint_url: Optional[str] = None,
+        region: Optional[str] = None,
+        access_key_id: Optional[str] = None,
+        secret_access_key: Optional[str] = None,
+        prefix: str = "",
+        multipart_threshold: int = 8 * 1024 * 1024,
+        multipart_chunk_size: int = 8 * 1024 * 1024,
+        path_style: bool = False,
+    ):
+        try:
+            import boto3
+            from botocore.config import Config
+        except ImportError:
+            raise RuntimeError("S3 ombori uchun boto3 kutubxonasi kerak. pip install boto3")
+        self.bucket = bucket
+        self.prefix = prefix.strip("/")
+        self.multipart_threshold = multipart_threshold
+        # S3 talabi: oxirgisidan boshqa qismlar kamida 5 MB
+        self.multipart_chunk_size = max(multipart_chunk_size, 5 * 1024 * 1024)
+        self.client = boto3.client(
+            "s3",
+            endpoint_url=endpoint_url or None,
+            region_name=region or None,
+            aws_access_key_id=access_key_id or None,
+            aws_secret_access_key=secret_access_key or None,
+            config=Config(
+                signature_version="s3v4",
+                # MinIO va boshqa lokal serverlar uchun path-style manzil
+                s3={"addressing_style": "path" if path_style else "auto"},
+            ),
+        )
+
+    def _key(self, key: str) -> str:
+        key = _safe_key(key)
+        return f"{self.prefix}/{key}" if self.prefix else key
+
+    async def put_file(self, key: str, source: Path, content_type: Optional[str] = None):
+        source = Path(source)
+        size = (await run_in_threadpool(os.stat, source)).st_size
+        if size > self.multipart_threshold:
+            await self._put_multipart(key, source, content_type)
+        else:
+            extra = {"ContentType": content_type} if content_type else {}
+
+            def _put():
+                with open(source, "rb") as body:
+                    self.client.put_object(Bucket=self.bucket, Key=self._key(key), Body=body, **extra)
+
+            await run_in_threadpool(_put)
+        await run_in_threadpool(os.unlink, source)
+
+    async def put_bytes(self, key: str, data: bytes, content_type: Optional[str] = None):
+        extra = {"ContentType": content_type} if content_type else {}
+        await run_in_threadpool(
+            self.client.put_object, Bucket=self.bucket, Key=self._key(key), Body=data, **extra,
+        )
+
+    async def _put_multipart(self, key: str, source: Path, content_type: Optional[str]):
+        upload_id = await self._create_multipart_upload(key, content_type)
+        parts = []
+        try:
+            async with await anyio.open_file(source, "rb") as f:
+                part_number = 1
+                while True:
+                    data = await f.read(self.multipart_chunk_size)
+                    if not data:
+                        break
+                    parts.append((part_number, await self._upload_part(key, upload_id, part_number, data)))
+                    part_number += 1
+            await self._complete_multipart_upload(key, upload_id, parts)
+        except BaseException:
+            await self._abort_multipart_upload(key, upload_id)
+            raise
+
+    async def stat(self, key: str) -> Optional[StoredObject]:
+        from botocore.exceptions import ClientError
+        try:
+            head = await run_in_threadpool(self.client.head_object, Bucket=self.bucket, Key=self._key(key))
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+                return None
+            raise
+        return StoredObject(head["ContentLength"], head["LastModified"].timestamp())
+
+    async def iter_chunks(self, key: str, start: int = 0, length: Optional[int] = None) -> AsyncIterator[bytes]:
+        params = {"Bucket": self.bucket, "Key": self._key(key)}
+        if start or length is not None:
+            end = "" if length is None else str(start + length - 1)
+            params["Range"] = f"bytes={start}-{end}"
+        response = await run_in_threadpool(self.client.get_object, **params)
+        body = response["Body"]
+        try:
+            while True:
+                chunk = await run_in_threadpool(body.read, READ_CHUNK_SIZE)
+                if not chunk:
+                    break
+                yield chunk
+        finally:
+            body.close()
+
+    async def delete(self, key: str):
+        await run_in_threadpool(self.client.delete_object, Bucket=self.bucket, Key=self._key(key))
+
+    async def presigned_get(
+        self,
+        key: str,
+        expires_in: int,
+        filename: Optional[str] = None,
+        content_type: Optional[str] = None,
+        inline: bool = False,
+    ) -> Optional[str]:
+        from app.utils.file_response import content_disposition
+        params = {"Bucket": self.bucket, "Key": self._key(key)}
+        if filename:
+            params["ResponseContentDisposition"] = content_disposition("inline" if inline else "attachment", filename)
+        if content_type:
+            params["ResponseContentType"] = content_type
+        return await run_in_threadpool(
+            self.client.generate_presigned_url, "get_object", Params=params, ExpiresIn=expires_in,
+        )
+
+    # Multipart upload - put_file katta fayllarni qismlab yuklaydi
+    async def _create_multipart_upload(self, key: str, content_type: Optional[str] = None) -> str:
+        extra = {"ContentType": content_type} if content_type else {}
+        response = await run_in_threadpool(
+            self.client.create_multipart_upload, Bucket=self.bucket, Key=self._key(key), **extra,
+        )
+        return response["UploadId"]
+
+    async def _upload_part(self, key: str, upload_id: str, part_number: int, data: bytes) -> str:
+        response = await run_in_threadpool(
+            self.client.upload_part,
+            Bucket=self.bucket, Key=self._key(key), UploadId=upload_id, PartNumber=part_number, Body=data,
+        )
+        return response["ETag"]
+
+    async def _complete_multipart_upload(self, key: str, upload_id: str, parts: List[Tuple[int, str]]):
+        await run_in_threadpool(
+            self.client.complete_multipart_upload,
+            Bucket=self.bucket,
+            Key=self._key(key),
+            UploadId=upload_id,
+            MultipartUpload={"Parts": [{"PartNumber": n, "ETag": etag} for n, etag in sorted(parts)]},
+        )
+
+    async def _abort_multipart_upload(self, key: str, upload_id: str):
+        await run_in_threadpool(
+            self.client.abort_multipart_upload, Bucket=self.bucket, Key=self._key(key), UploadId=upload_id,
+        )
+
+
+_storage: Optional[StorageBackend] = None
+
+
+def get_storage() -> StorageBackend:
+    """Sozlamalar bo'yicha tanlangan ombor drayveri (bitta nusxa)"""
+    global _storage
+    if _storage is None:
+        if settings.STORAGE_BACKEND == "s3":
+            _storage = S3Storage(
+                bucket=settings.S3_BUCKET,
+                endpoint_url=settings.S3_ENDPOINT_URL,
+                region=settings.S3_REGION,
+                access_key_id=settings.S3_ACCESS_KEY_ID,
+                secret_access_key=settings.S3_SECRET_ACCESS_KEY,
+                prefix=settings.S3_PREFIX,
+                multipart_threshold=settings.S3_MULTIPART_THRESHOLD,
+                multipart_chunk_size=settings.S3_MULTIPART_CHUNK_SIZE,
+                path_style=settings.S3_PATH_STYLE,
+            )
+        else:
+            _storage = LocalStorage(settings.STORAGE_LOCAL_ROOT)
+    return _storage
@@ -0,0 +1,161 @@
+"""
+Talabalarni indeksli qidirish (PostgreSQL - pg_trgm, SQLite - FTS5)
+
+Qidiruv indeksi ilova ishga tushganda `setup_student_search` orqali yaratiladi.
+Indeks yaratib bo'lmasa (masalan, pg_trgm extension'iga ruxsat yo'q yoki SQLite
+FTS5'siz yig'ilgan) oddiy ILIKE qidiruviga qaytiladi.
+"""
+import re
+from typing import List, Optional, Tuple
+from sqlalchemy import String, column, literal_column, table, text, func, and_
+from sqlalchemy.sql import Select
+from app.models.student import Student
+
+FTS_TABLE = "students_fts"
+TRGM_INDEX = "idx_student_search_trgm"
+
+# PostgreSQL: indeks ifodasi bilan so'rovdagi ifoda bir xil bo'lishi kerak
+TRGM_EXPRESSION = (
+    "lower(students.first_name || ' ' || students.last_name || ' ' || "
+    "students.email || ' ' || students.student_id)"
+)
+
+_SQLITE_SETUP = [
+    f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        first_name, last_name, email, student_id,
+        content='students', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+    )
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON students BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, first_name, last_name, email, student_id)
+        VALUES (new.id, new.first_name, new.last_name, new.email, new.student_id);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON students BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, first_name, last_name, email, student_id)
+        VALUES ('delete', old.id, old.first_name, old.last_name, old.email, old.student_id);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au
+    AFTER UPDATE OF first_name, last_name, email, student_id ON students BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, first_name, last_name, email, student_id)
+        VALUES ('delete', old.id, old.first_name, old.last_name, old.email, old.student_id);
+        INSERT INTO {FTS_TABLE}(rowid, first_name, last_name, email, student_id)
+        VALUES (new.id, new.first_name, new.last_name, new.email, new.student_id);
+    END
+    """,
+]
+
+_POSTGRES_SETUP = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    f"CREATE INDEX IF NOT EXISTS {TRGM_INDEX} ON students USING gin ({TRGM_EXPRESSION} gin_trgm_ops)",
+]
+
+_fts = table(FTS_TABLE, column("rowid"))
+_backend: Optional[str] = None
+
+
+def get_search_backend() -> Optional[str]:
+    """Faol qidiruv backend'i: "fts5", "trgm" yoki None (ILIKE)"""
+    return _backend
+
+
+def setup_student_search(engine) -> Optional[str]:
+    """
+    Qidiruv indeksini yaratish (idempotent)
+
+    Args:
+        engine: Sync SQLAlchemy engine
+
+    Returns:
+        Faollashtirilgan backend nomi yoki None
+    """
+    global _backend
+    dialect = engine.dialect.name
+    if dialect == "sqlite":
+        with engine.begin() as conn:
+            exists = conn.execute(
+                text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+                {"name": FTS_TABLE},
+            ).first() is not None
+            for statement in _SQLITE_SETUP:
+                conn.execute(text(statement))
+            if not exists:
+                # Mavjud talabalarni indeksga yuklash
+                conn.execute(text(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')"))
+        _backend = "fts5"
+    elif dialect == "postgresql":
+        with engine.begin() as conn:
+            for statement in _POSTGRES_SETUP:
+                conn.execute(text(statement))
+        _backend = "trgm"
+    return _backend
+
+
+def search_tokens(search: str) -> List[str]:
+    """Qidiruv matnini kichik harfli so'zlarga ajratish"""
+    return re.findall(r"\w+", search.lower())
+
+
+def _escape_like(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def fts_match_query(tokens: List[str], prefix: bool) -> str:
+    """FTS5 MATCH ifodasi - har bir so'z qo'shtirnoqda (maxsus belgilar xavfsiz)"""
+    terms = []
+    for i, token in enumerate(tokens):
+        # Qidiruvda faqat oxirgi (hali yozilayotgan) so'z prefiks, autocomplete'da hammasi
+        as_prefix = prefix or i == len(tokens) - 1
+        terms.append(f'"{token}"*' if as_prefix else f'"{token}"')
+    return " ".join(terms)
+
+
+def _ilike_filter(search: str):
+    return (
+        Student.first_name.ilike(f"%{search}%") |
+        Student.last_name.ilike(f"%{search}%") |
+        Student.email.ilike(f"%{search}%") |
+        Student.student_id.ilike(f"%{search}%")
+    )
+
+
+def apply_student_search(stmt: Select, search: str, prefix: bool = False) -> Tuple[Select, Optional[object]]:
+    """
+    Student so'roviga qidiruv shartini qo'shish
+
+    Args:
+        stmt: Student'lar bo'yicha SELECT (institution filtri chaqiruvchida)
+        search: Qidiruv matni
+        prefix: Autocomplete rejimi - barcha so'zlar prefiks sifatida qidiriladi
+
+    Returns:
+        (yangi so'rov, relevantlik bo'yicha tartiblash ifodasi yoki None)
+    """
+    tokens = search_tokens(search)
+    if not tokens:
+        return stmt.where(_ilike_filter(search)), None
+
+    if _backend == "fts5":
+        match = literal_column(FTS_TABLE).op("MATCH")(fts_match_query(tokens, prefix))
+        stmt = stmt.join(_fts, _fts.c.rowid == Student.id).where(match)
+        # bm25 - kichik qiymat yaxshiroq; ism-familiya mosligi email'dan ustun
+        rank = func.bm25(literal_column(FTS_TABLE), 10.0, 10.0, 2.0, 5.0)
+        return stmt, rank.asc()
+
+    if _backend == "trgm":
+        expression = literal_column(TRGM_EXPRESSION, String)
+        # Har bir so'z alohida LIKE - GIN trigram indeksidan foydalanadi
+        stmt = stmt.where(and_(*[
+            expression.like(f"%{_escape_like(token)}%", escape="\\") for token in tokens
+        ]))
+        query = " ".join(tokens)
+        similarity = func.word_similarity(query, expression) if prefix else func.similarity(expression, query)
+        return stmt, similarity.desc()
+
+    return stmt.where(_ilike_filter(search)), None
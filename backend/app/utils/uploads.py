@@ -0,0 +1,98 @@
+"""
+Yuklangan fayllarni bo'laklab (chunk) diskka yozish
+
+Fayl butunlay xotiraga o'qilmaydi: bo'laklar event loop'dan tashqarida (thread'da)
+vaqtinchalik faylga yoziladi, hajm chegarasi yozish davomida tekshiriladi va SHA-256
+bir vaqtda hisoblanadi. Tayyor fayl maqsad joyiga atomar (os.replace) ko'chiriladi,
+shuning uchun yarim yozilgan fayl hech qachon asosiy nom ostida ko'rinmaydi.
+"""
+import hashlib
+import os
+import tempfile
+from pathlib import Path
+from fastapi import UploadFile
+from starlette.concurrency import run_in_threadpool
+
+CHUNK_SIZE = 1024 * 1024  # 1 MB
+TEMP_PREFIX = ".upload-"
+TEMP_SUFFIX = ".part"
+
+
+class UploadTooLarge(Exception):
+    """Fayl ruxsat etilgan hajmdan katta"""
+
+    def __init__(self, max_size: int):
+        super().__init__(f"Fayl hajmi {max_size} baytdan oshdi")
+        self.max_size = max_size
+
+
+class ReceivedUpload:
+    """Vaqtinchalik faylga yozilgan upload"""
+
+    __slots__ = ("temp_path", "size", "sha256")
+
+    def __init__(self, temp_path: Path, size: int, sha256: str):
+        self.temp_path = temp_path
+        self.size = size
+        self.sha256 = sha256
+
+
+def _unlink_quietly(path: Path):
+    try:
+        os.unlink(path)
+    except FileNotFoundError:
+        pass
+
+
+def _copy_to_temp(source, directory: Path, max_size: int) -> ReceivedUpload:
+    """Manba fayldan bo'laklab o'qib vaqtinchalik faylga yozish (thread ichida ishlaydi)"""
+    directory.mkdir(parents=True, exist_ok=True)
+    fd, temp_name = tempfile.mkstemp(dir=directory, prefix=TEMP_PREFIX, suffix=TEMP_SUFFIX)
+    temp_path = Path(temp_name)
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        with os.fdopen(fd, "wb") as out:
+            while True:
+                chunk = source.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > max_size:
+                    raise UploadTooLarge(max_size)
+                digest.update(chunk)
+                out.write(chunk)
+            out.flush()
+            os.fsync(out.fileno())
+    except BaseException:
+        _unlink_quietly(temp_path)
+        raise
+    return ReceivedUpload(temp_path, size, digest.hexdigest())
+
+
+async def receive_upload(upload: UploadFile, directory: Path, max_size: int) -> ReceivedUpload:
+    """
+    Upload'ni vaqtinchalik faylga yozish
+
+    Args:
+        upload: FastAPI UploadFile
+        directory: Vaqtinchalik fayl papkasi (atomar rename uchun maqsad bilan bir diskda bo'lishi kerak)
+        max_size: Maksimal hajm baytlarda
+
+    Raises:
+        UploadTooLarge: Hajm chegarasidan oshsa (vaqtinchalik fayl o'chiriladi)
+    """
+    await upload.seek(0)
+    return await run_in_threadpool(_copy_to_temp, upload.file, directory, max_size)
+
+
+async def commit_upload(received: ReceivedUpload, destination: Path) -> Path:
+    """Vaqtinchalik faylni maqsad joyiga atomar ko'chirish"""
+    destination.parent.mkdir(parents=True, exist_ok=True)
+    await run_in_threadpool(os.replace, received.temp_path, destination)
+    return destination
+
+
+async def discard_upload(received: ReceivedUpload):
+    """Vaqtinchalik faylni o'chirish"""
+    await run_in_threadpool(_unlink_quietly, received.temp_path)
@@ -0,0 +1,133 @@
+"""
+CPU'ga og'ir ishlarni event loop'dan tashqarida bajarish uchun cheklangan worker pool
+"""
+import asyncio
+import threading
+import time
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+
+class WorkerPoolBusy(Exception):
+    """Navbat to'lgan - yangi ish qabul qilinmaydi"""
+
+
+def _timed_call(fn: Callable, *args) -> tuple:
+    """Funksiyani bajarish va boshlanish vaqtini qaytarish (navbatda kutish vaqtini o'lchash uchun)"""
+    started_at = time.time()
+    return started_at, fn(*args)
+
+
+class WorkerPool:
+    """
+    Thread yoki process pool ustidagi cheklangan executor
+
+    Args:
+        name: Pool nomi (log va metrikalar uchun)
+        max_workers: Bir vaqtda ishlaydigan workerlar soni (concurrency cap)
+        max_pending: Navbatdagi + ishlayotgan ishlar maksimal soni (0 - cheklanmagan)
+        use_processes: True bo'lsa ProcessPoolExecutor ishlatiladi
+    """
+
+    def __init__(self, name: str, max_workers: int, max_pending: int = 0, use_processes: bool = False):
+        self.name = name
+        self.max_workers = max(1, max_workers)
+        self.max_pending = max_pending
+        self.use_processes = use_processes
+        self._executor: Optional[Executor] = None
+        self._lock = threading.Lock()
+        # Metrikalar
+        self._pending = 0
+        self._submitted = 0
+        self._completed = 0
+        self._failed = 0
+        self._rejected = 0
+        self._total_wait = 0.0
+        self._max_wait = 0.0
+        self._total_run = 0.0
+
+    def _get_executor(self) -> Executor:
+        """Executor'ni birinchi kerak bo'lganda yaratish"""
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    if self.use_processes:
+                        self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+                    else:
+                        self._executor = ThreadPoolExecutor(
+                            max_workers=self.max_workers,
+                            thread_name_prefix=self.name,
+                        )
+        return self._executor
+
+    async def run(self, fn: Callable, *args, timeout: Optional[float] = None) -> Any:
+        """
+        Funksiyani pool'da bajarish
+
+        Raises:
+            WorkerPoolBusy: Navbat to'lgan bo'lsa
+            asyncio.TimeoutError: timeout berilgan va oshib ketgan bo'lsa
+        """
+        with self._lock:
+            if self.max_pending and self._pending >= self.max_pending:
+                self._rejected += 1
+                raise WorkerPoolBusy(f"{self.name} pool band ({self._pending} ta ish navbatda)")
+            self._pending += 1
+            self._submitted += 1
+
+        submitted_at = time.time()
+        try:
+            job = self._get_executor().submit(_timed_call, fn, *args)
+        except BaseException:
+            with self._lock:
+                self._pending -= 1
+                self._failed += 1
+            raise
+        # Navbat hisobi executor'dagi ish tugaganda kamayadi - timeout yoki so'rov bekor qilinsa
+        # ham ish davom etadi va max_pending uni hisobga olishi kerak
+        job.add_done_callback(lambda done: self._job_done(done, submitted_at))
+
+        future = asyncio.wrap_future(job)
+        if timeout is not None:
+            _, result = await asyncio.wait_for(future, timeout)
+        else:
+            _, result = await future
+        return result
+
+    def _job_done(self, job: Future, submitted_at: float):
+        finished_at = time.time()
+        with self._lock:
+            self._pending -= 1
+            if job.cancelled() or job.exception() is not None:
+                self._failed += 1
+                return
+            started_at, _ = job.result()
+            wait = max(0.0, started_at - submitted_at)
+            self._completed += 1
+            self._total_wait += wait
+            self._max_wait = max(self._max_wait, wait)
+            self._total_run += max(0.0, finished_at - started_at)
+
+    def stats(self) -> Dict[str, Any]:
+        """Pool metrikalari (navbatda kutish vaqtlari millisekundlarda)"""
+        with self._lock:
+            completed = self._completed
+            return {
+                "max_workers": self.max_workers,
+                "max_pending": self.max_pending,
+                "pending": self._pending,
+                "submitted": self._submitted,
+                "completed": completed,
+                "failed": self._failed,
+                "rejected": self._rejected,
+                "avg_queue_wait_ms": round(self._total_wait / completed * 1000, 2) if completed else 0.0,
+                "max_queue_wait_ms": round(self._max_wait * 1000, 2),
+                "avg_run_ms": round(self._total_run / completed * 1000, 2) if completed else 0.0,
+            }
+
+    def shutdown(self):
+        """Executor'ni to'xtatish"""
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
@@ -0,0 +1,170 @@
+"""
+Bir nechta materialni bitta ZIP sifatida oqim qilib berish (to'liq arxiv yig'ilmaydi)
+
+Arxiv tuzilishi (har bir yozuvning offset'i, hajmi, CRC'si) yuborishdan oldin hisoblanadi:
+local header'larda hajm va CRC bor, data descriptor yo'q. Shu sabab arxiv deterministik -
+bir xil materiallar uchun har doim bir xil baytlar - va Content-Length, kuchli ETag va
+Range (uzilgan yuklab olishni davom ettirish) ishlaydi.
+
+Allaqachon siqilgan formatlar (pdf, docx, pptx) siqilmasdan (stored), eski binar
+formatlar (doc, ppt) deflate bilan yoziladi. CRC va siqilgan hajm kontent xeshi bo'yicha
+keshlanadi - takroriy yuklab olishda fayllar qayta o'qilmaydi.
+"""
+import asyncio
+import hashlib
+import json
+import zlib
+from typing import AsyncIterator, Callable, List, Optional, Tuple
+from starlette.concurrency import run_in_threadpool
+from app.utils.cache import SingleFlightCache
+from app.utils.zipstream import ZipStreamWriter
+
+COMPRESS_LEVEL = 6
+PREPARE_CONCURRENCY = 4  # CRC hisoblash uchun bir vaqtda o'qiladigan fayllar
+# Ichida o'zi siqilgan formatlar - qayta siqish foyda bermaydi
+STORED_TYPES = {"pdf", "docx", "pptx", "zip", "jpg", "jpeg", "png", "webp"}
+
+# (manba identifikatori, siqilganmi) -> (crc, siqilgan hajm)
+_entry_info_cache = SingleFlightCache(maxsize=20000, ttl=7 * 24 * 3600)
+
+ChunkReader = Callable[[int, Optional[int]], AsyncIterator[bytes]]
+
+
+class BundleFile:
+    """Arxivga qo'shiladigan fayl"""
+
+    __slots__ = ("name", "source_id", "size", "mtime", "compress", "read")
+
+    def __init__(self, name: str, source_id: str, size: int, mtime: float, file_type: str, read: ChunkReader):
+        """
+        Args:
+            name: Arxiv ichidagi nom
+            source_id: Kontentni bir xil aniqlaydigan qiymat (kontent xeshi yoki yo'l+hajm+vaqt)
+            size: Fayl hajmi (bayt)
+            mtime: Arxivga yoziladigan vaqt
+            file_type: Fayl turi (siqish usulini tanlash uchun)
+            read: read(start, length) - fayl baytlarini oqim qilib beradi
+        """
+        self.name = name
+        self.source_id = source_id
+        self.size = size
+        self.mtime = mtime
+        self.compress = file_type.lower() not in STORED_TYPES
+        self.read = read
+
+
+def unique_names(names: List[str]) -> List[str]:
+    """Arxiv ichidagi nomlarni takrorlanmas qilish: a.pdf, a (2).pdf, ..."""
+    seen = set()
+    result = []
+    for name in names:
+        name = name.replace("/", "_").replace("\\", "_").strip() or "file"
+        candidate = name
+        stem, dot, ext = name.rpartition(".")
+        if not dot:
+            stem, ext = name, ""
+        counter = 2
+        while candidate.lower() in seen:
+            candidate = f"{stem} ({counter}){dot}{ext}"
+            counter += 1
+        seen.add(candidate.lower())
+        result.append(candidate)
+    return result
+
+
+async def _deflate_stream(file: BundleFile) -> AsyncIterator[bytes]:
+    compressor = zlib.compressobj(COMPRESS_LEVEL, zlib.DEFLATED, -15)
+    async for chunk in file.read(0, None):
+        data = await run_in_threadpool(compressor.compress, chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+async def _compute_entry_info(file: BundleFile) -> Tuple[int, int]:
+    crc = 0
+    if file.compress:
+        compressed = 0
+        compressor = zlib.compressobj(COMPRESS_LEVEL, zlib.DEFLATED, -15)
+        async for chunk in file.read(0, None):
+            crc = zlib.crc32(chunk, crc)
+            compressed += len(await run_in_threadpool(compressor.compress, chunk))
+        compressed += len(compressor.flush())
+        return crc, compressed
+    async for chunk in file.read(0, None):
+        crc = zlib.crc32(chunk, crc)
+    return crc, file.size
+
+
+class ZipBundle:
+    """Oldindan hisoblangan tuzilishli ZIP arxiv"""
+
+    def __init__(self, files: List[BundleFile]):
+        self.files = files
+        self.size = 0
+        self.etag = ""
+        # (offset, length, header baytlari yoki None, fayl yoki None)
+        self._segments: List[tuple] = []
+
+    async def prepare(self):
+        """CRC/hajmlarni olish va arxiv tuzilishini hisoblash"""
+        semaphore = asyncio.Semaphore(PREPARE_CONCURRENCY)
+
+        async def entry_info(file: BundleFile) -> Tuple[int, int]:
+            async with semaphore:
+                return await _entry_info_cache.get_or_compute(
+                    (file.source_id, file.compress),
+                    lambda: _compute_entry_info(file),
+                )
+
+        infos = await asyncio.gather(*[entry_info(file) for file in self.files])
+        writer = ZipStreamWriter(COMPRESS_LEVEL)
+        segments = []
+        fingerprint = []
+        for file, (crc, compressed_size) in zip(self.files, infos):
+            header = writer.add_known(file.name, file.compress, file.mtime, file.size, crc, compressed_size)
+            header_offset = writer.offset - compressed_size - len(header)
+            segments.append((header_offset, len(header), header, None))
+            segments.append((header_offset + len(header), compressed_size, None, file))
+            fingerprint.append([file.name, file.source_id, int(file.mtime), file.compress])
+        directory = writer.finish()
+        segments.append((writer.offset - len(directory), len(directory), directory, None))
+        self._segments = segments
+        self.size = writer.offset
+        digest = hashlib.sha256(json.dumps(
+            [zlib.ZLIB_RUNTIME_VERSION, COMPRESS_LEVEL, fingerprint], separators=(",", ":"),
+        ).encode())
+        self.etag = digest.hexdigest()
+
+    async def _file_range(self, file: BundleFile, start: int, length: int) -> AsyncIterator[bytes]:
+        if not file.compress:
+            async for chunk in file.read(start, length):
+                yield chunk
+            return
+        # Deflate natijasi deterministik - qayta siqib kerakli qismini kesib olinadi
+        position = 0
+        end = start + length
+        async for chunk in _deflate_stream(file):
+            chunk_end = position + len(chunk)
+            if chunk_end > start and position < end:
+                yield chunk[max(0, start - position):min(len(chunk), end - position)]
+            position = chunk_end
+            if position >= end:
+                break
+
+    async def iter_range(self, start: int, length: int) -> AsyncIterator[bytes]:
+        """Arxivning [start, start + length) qismini oqim qilish"""
+        end = start + length
+        for offset, size, data, file in self._segments:
+            segment_end = offset + size
+            if segment_end <= start or size == 0:
+                continue
+            if offset >= end:
+                break
+            local_start = max(0, start - offset)
+            local_end = min(size, end - offset)
+            if data is not None:
+                yield data[local_start:local_end]
+            else:
+                async for chunk in self._file_range(file, local_start, local_end - local_start):
+                    yield chunk
@@ -0,0 +1,204 @@
+"""
+ZIP arxivni oqim (stream) ko'rinishida yozish - butun arxiv xotirada yoki diskda yig'ilmaydi
+
+Har bir metod yuborilishi kerak bo'lgan baytlarni qaytaradi, shuning uchun writer'ni
+generator ichida ishlatish qulay. ZIP64 qo'llab-quvvatlanmaydi (4 GB chegarasi).
+"""
+import struct
+import time
+import zlib
+from typing import List, Optional
+
+_LOCAL_HEADER = struct.Struct("<4s5H3L2H")
+_DATA_DESCRIPTOR = struct.Struct("<4s3L")
+_CENTRAL_HEADER = struct.Struct("<4s6H3L5H2L")
+_END_RECORD = struct.Struct("<4s4H2LH")
+
+_FLAG_DATA_DESCRIPTOR = 0x08
+_FLAG_UTF8 = 0x800
+_ZIP32_LIMIT = 0xFFFFFFFF
+
+STORED = 0
+DEFLATED = 8
+
+
+def dos_datetime(timestamp: float) -> tuple:
+    """Unix vaqtini ZIP (MS-DOS) formatidagi (time, date) juftligiga aylantirish"""
+    t = time.localtime(timestamp)
+    year = max(t.tm_year, 1980)
+    dos_time = (t.tm_hour << 11) | (t.tm_min << 5) | (t.tm_sec // 2)
+    dos_date = ((year - 1980) << 9) | (t.tm_mon << 5) | t.tm_mday
+    return dos_time, dos_date
+
+
+class _Entry:
+    __slots__ = ("name", "method", "flags", "dos_time", "dos_date", "offset", "crc", "compressed_size", "size")
+
+    def __init__(self, name: bytes, method: int, flags: int, dos_time: int, dos_date: int, offset: int):
+        self.name = name
+        self.method = method
+        self.flags = flags
+        self.dos_time = dos_time
+        self.dos_date = dos_date
+        self.offset = offset
+        self.crc = 0
+        self.compressed_size = 0
+        self.size = 0
+
+
+class ZipStreamWriter:
+    """
+    Oqimli ZIP writer
+
+    Foydalanish:
+        yield writer.start_entry("a.txt")
+        yield writer.write(b"...")
+        yield writer.end_entry()
+        yield writer.finish()
+    """
+
+    def __init__(self, compresslevel: int = 6):
+        self.compresslevel = compresslevel
+        self.offset = 0
+        self._entries: List[_Entry] = []
+        self._current: Optional[_Entry] = None
+        self._compressor = None
+        self._known = False
+        self._running_crc = 0
+        self._running_size = 0
+        self._running_compressed = 0
+
+    def _emit(self, data: bytes) -> bytes:
+        self.offset += len(data)
+        if self.offset > _ZIP32_LIMIT:
+            raise ValueError("ZIP arxiv 4 GB chegarasidan oshdi")
+        return data
+
+    def start_entry(
+        self,
+        name: str,
+        compress: bool = True,
+        mtime: Optional[float] = None,
+        size: Optional[int] = None,
+        crc: Optional[int] = None,
+    ) -> bytes:
+        """
+        Yangi fayl yozuvini boshlash
+
+        Args:
+            name: Arxiv ichidagi fayl nomi
+            compress: True - deflate, False - siqmasdan (stored)
+            mtime: O'zgartirilgan vaqt (None - hozir)
+            size, crc: Siqilmagan fayl uchun oldindan ma'lum bo'lsa, local header'ga
+                yoziladi va data descriptor kerak bo'lmaydi (arxiv hajmini oldindan hisoblash mumkin)
+
+        Returns:
+            Local file header baytlari
+        """
+        if self._current is not None:
+            raise RuntimeError("Oldingi yozuv yakunlanmagan")
+        encoded = name.encode("utf-8")
+        method = DEFLATED if compress else STORED
+        self._known = not compress and size is not None and crc is not None
+        flags = _FLAG_UTF8 | (0 if self._known else _FLAG_DATA_DESCRIPTOR)
+        dos_time, dos_date = dos_datetime(time.time() if mtime is None else mtime)
+        entry = _Entry(encoded, method, flags, dos_time, dos_date, self.offset)
+        if self._known:
+            entry.crc, entry.compressed_size, entry.size = crc, size, size
+        self._current = entry
+        self._compressor = zlib.compressobj(self.compresslevel, zlib.DEFLATED, -15) if compress else None
+        self._running_crc = 0
+        self._running_size = 0
+        self._running_compressed = 0
+        header = _LOCAL_HEADER.pack(
+            b"PK\x03\x04", 20, flags, method, dos_time, dos_date,
+            entry.crc, entry.compressed_size, entry.size, len(encoded), 0,
+        )
+        return self._emit(header + encoded)
+
+    def write(self, data: bytes) -> bytes:
+        """Joriy yozuvga ma'lumot qo'shish (siqilgan baytlarni qaytaradi, bo'sh bo'lishi mumkin)"""
+        if not data:
+            return b""
+        self._running_crc = zlib.crc32(data, self._running_crc)
+        self._running_size += len(data)
+        if self._compressor is not None:
+            data = self._compressor.compress(data)
+        self._running_compressed += len(data)
+        return self._emit(data)
+
+    def end_entry(self) -> bytes:
+        """Joriy yozuvni yakunlash (qolgan siqilgan baytlar va data descriptor)"""
+        entry = self._current
+        tail = b""
+        if self._compressor is not None:
+            tail = self._compressor.flush()
+            self._running_compressed += len(tail)
+        if self._known:
+            if (self._running_crc, self._running_size) != (entry.crc, entry.size):
+                raise ValueError(f"{entry.name!r}: hajm yoki CRC oldindan berilganiga mos emas")
+        else:
+            entry.crc = self._running_crc
+            entry.size = self._running_size
+            entry.compressed_size = self._running_compressed
+            tail += _DATA_DESCRIPTOR.pack(b"PK\x07\x08", entry.crc, entry.compressed_size, entry.size)
+        self._entries.append(entry)
+        self._current = None
+        self._compressor = None
+        return self._emit(tail)
+
+    def add(self, name: str, data: bytes, compress: bool = True, mtime: Optional[float] = None) -> bytes:
+        """Kichik faylni bir martada qo'shish"""
+        return self.start_entry(name, compress, mtime) + self.write(data) + self.end_entry()
+
+    def add_known(
+        self,
+        name: str,
+        compress: bool,
+        mtime: float,
+        size: int,
+        crc: int,
+        compressed_size: int,
+    ) -> bytes:
+        """
+        Ma'lumoti oldindan ma'lum yozuvni ro'yxatga qo'shish (arxiv tuzilishini oldindan hisoblash uchun)
+
+        Faqat local header baytlarini qaytaradi; keyingi compressed_size bayt (fayl ma'lumoti)
+        chaqiruvchi tomonidan yuboriladi - offset shunga ko'ra suriladi. Data descriptor yozilmaydi.
+        """
+        if self._current is not None:
+            raise RuntimeError("Oldingi yozuv yakunlanmagan")
+        encoded = name.encode("utf-8")
+        method = DEFLATED if compress else STORED
+        dos_time, dos_date = dos_datetime(mtime)
+        entry = _Entry(encoded, method, _FLAG_UTF8, dos_time, dos_date, self.offset)
+        entry.crc, entry.compressed_size, entry.size = crc, compressed_size, size
+        header = _LOCAL_HEADER.pack(
+            b"PK\x03\x04", 20, _FLAG_UTF8, method, dos_time, dos_date,
+            crc, compressed_size, size, len(encoded), 0,
+        )
+        self._emit(header + encoded)
+        self.offset += compressed_size
+        if self.offset > _ZIP32_LIMIT:
+            raise ValueError("ZIP arxiv 4 GB chegarasidan oshdi")
+        self._entries.append(entry)
+        return header + encoded
+
+    def finish(self) -> bytes:
+        """Central directory va arxiv oxiri yozuvi"""
+        if self._current is not None:
+            raise RuntimeError("Oxirgi yozuv yakunlanmagan")
+        start = self.offset
+        parts = []
+        for entry in self._entries:
+            parts.append(_CENTRAL_HEADER.pack(
+                b"PK\x01\x02", 20, 20, entry.flags, entry.method, entry.dos_time, entry.dos_date,
+                entry.crc, entry.compressed_size, entry.size, len(entry.name), 0, 0, 0, 0,
+                0o644 << 16, entry.offset,
+            ))
+            parts.append(entry.name)
+        directory = b"".join(parts)
+        end = _END_RECORD.pack(
+            b"PK\x05\x06", 0, 0, len(self._entries), len(self._entries), len(directory), start, 0,
+        )
+        return self._emit(directory + end)
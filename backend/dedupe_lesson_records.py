@@ -0,0 +1,73 @@
+"""
+Takroriy dars yozuvlarini (davomat, baholar) tozalash va unique indexni yaratish
+
+Bulk upsert (ON CONFLICT) unique indexga tayanadi. Index qo'shilishidan oldin bir dars
+uchun (muassasa, talaba, sana, guruh, fan; baholarda + baho turi) bir nechta yozuv
+saqlangan bo'lishi mumkin - ilova ular tozalanmaguncha ishga tushmaydi. Skript har bir
+dars uchun eng oxirgi (max id) yozuvni qoldiradi, qolganlarini o'chiradi va indexni yaratadi.
+
+Foydalanish:
+    python dedupe_lesson_records.py attendance           # Faqat ko'rsatish (hech narsa o'zgarmaydi)
+    python dedupe_lesson_records.py attendance --apply   # Tozalash va index yaratish
+    python dedupe_lesson_records.py grades [--apply]
+"""
+import sys
+from sqlalchemy import func, inspect, select
+from app.database import engine
+from app.models.attendance import Attendance
+from app.models.grade import Grade
+from app.utils.attendance_summary import rebuild_attendance_summary
+from app.utils.migrations import deduplicate_rows
+
+# Jadval nomi -> (model, index nomi, tozalangandan keyin chaqiriladigan funksiya)
+TABLES = {
+    "attendance": (Attendance, "idx_attendance_lesson_unique", rebuild_attendance_summary),
+    "grades": (Grade, "idx_grade_lesson_unique", None),
+}
+
+
+def main(table_name: str, apply: bool):
+    model, index_name, after_dedupe = TABLES[table_name]
+    index = next(index for index in model.__table__.indexes if index.name == index_name)
+    columns = [model.__table__.c[column.name] for column in index.columns]
+
+    with engine.begin() as conn:
+        groups = conn.execute(
+            select(*columns, func.count().label("rows"), func.max(model.__table__.c.id).label("keep"))
+            .group_by(*columns)
+            .having(func.count() > 1)
+        ).all()
+        if not groups:
+            print(f"[OK] {table_name}: takroriy yozuvlar yo'q")
+        for group in groups[:50]:
+            key = ", ".join(f"{column.name}={value}" for column, value in zip(columns, group))
+            print(f"{key}: {group.rows} ta yozuv, id={group.keep} qoldiriladi")
+        if len(groups) > 50:
+            print(f"... va yana {len(groups) - 50} ta dars")
+
+        if not apply:
+            if groups:
+                print(f"\nO'zgartirish uchun: python dedupe_lesson_records.py {table_name} --apply")
+            return
+
+        removed = deduplicate_rows(conn, model, [column.name for column in columns])
+        if removed and after_dedupe is not None:
+            after_dedupe(conn)
+        print(f"[OK] {removed} ta takroriy yozuv o'chirildi")
+        if index_name in {item["name"] for item in inspect(conn).get_indexes(model.__tablename__)}:
+            print(f"[INFO] {index_name} allaqachon mavjud")
+        else:
+            index.create(bind=conn)
+            print(f"[OK] {index_name} yaratildi")
+
+
+if __name__ == "__main__":
+    args = [arg for arg in sys.argv[1:] if arg != "--apply"]
+    if len(args) != 1 or args[0] not in TABLES:
+        print(f"Foydalanish: python dedupe_lesson_records.py {{{'|'.join(TABLES)}}} [--apply]")
+        sys.exit(1)
+    try:
+        main(args[0], "--apply" in sys.argv[1:])
+    except Exception as e:
+        print(f"Xatolik: {e}")
+        sys.exit(1)
@@ -0,0 +1,118 @@
+"""
+Takroriy ochiq imtihon urinishlarini tozalash, urinish raqamlarini tartiblash va
+idx_attempt_open_unique, idx_attempt_number_unique indexlarini yaratish
+
+Index qo'shilishidan oldin bir vaqtda yuborilgan "boshlash" so'rovlari bitta talaba uchun
+bir nechta ochiq (topshirilmagan) urinish yaratgan bo'lishi mumkin. Skript har bir
+(imtihon, talaba) uchun eng oxirgi urinishni qoldiradi, qolganlarining javoblarini unga
+birlashtiradi (yangiroq javob ustun) va keyin takrorlarni o'chiradi.
+
+Takrorlar "topshirilgan" deb belgilanmaydi: ular talabaning urinishlar sonidan ayrilar
+va natijalar ro'yxatida bo'sh urinish sifatida chiqar edi.
+
+Boshlash va topshirish bir vaqtda kelganda ikki urinish bir xil raqam olgan bo'lishi
+mumkin - bunday talabalarning urinishlari yaratilish tartibida (id) 1, 2, 3... deb
+qayta raqamlanadi.
+
+Foydalanish:
+    python dedupe_open_exam_attempts.py           # Faqat ko'rsatish (hech narsa o'zgarmaydi)
+    python dedupe_open_exam_attempts.py --apply   # Tozalash va index yaratish
+"""
+import sys
+from collections import defaultdict
+from sqlalchemy import inspect
+from app.database import SessionLocal, engine
+from app.models.exam import ExamAttempt
+
+INDEX_NAMES = ["idx_attempt_open_unique", "idx_attempt_number_unique"]
+
+
+def find_duplicates(db):
+    """(exam_id, student_id) -> ochiq urinishlar (id bo'yicha), faqat bittadan ko'p bo'lganlari"""
+    groups = defaultdict(list)
+    attempts = db.query(ExamAttempt).filter(
+        ExamAttempt.is_submitted == False
+    ).order_by(ExamAttempt.id).all()
+    for attempt in attempts:
+        groups[(attempt.exam_id, attempt.student_id)].append(attempt)
+    return {key: items for key, items in groups.items() if len(items) > 1}
+
+
+def find_misnumbered(db, removed_ids):
+    """(exam_id, student_id) -> qoladigan urinishlar (id bo'yicha), raqami takrorlanganlari"""
+    groups = defaultdict(list)
+    for attempt in db.query(ExamAttempt).order_by(ExamAttempt.id).all():
+        if attempt.id in removed_ids:
+            continue
+        groups[(attempt.exam_id, attempt.student_id)].append(attempt)
+    return {
+        key: items for key, items in groups.items()
+        if len({attempt.attempt_number for attempt in items}) < len(items)
+    }
+
+
+def main(apply: bool):
+    db = SessionLocal()
+    try:
+        duplicates = find_duplicates(db)
+        removed_ids = set()
+        if not duplicates:
+            print("[OK] Takroriy ochiq urinishlar yo'q")
+        for (exam_id, student_id), attempts in duplicates.items():
+            keep, extra = attempts[-1], attempts[:-1]
+            removed_ids.update(attempt.id for attempt in extra)
+            print(
+                f"Imtihon {exam_id}, talaba {student_id}: urinish {keep.id} qoldiriladi, "
+                f"{[attempt.id for attempt in extra]} birlashtiriladi"
+            )
+            if not apply:
+                continue
+            merged = {}
+            for attempt in attempts:
+                merged.update(attempt.answers or {})
+            keep.answers = merged or None
+            for attempt in extra:
+                db.delete(attempt)
+
+        misnumbered = find_misnumbered(db, removed_ids)
+        if not misnumbered:
+            print("[OK] Takroriy urinish raqamlari yo'q")
+        for (exam_id, student_id), attempts in misnumbered.items():
+            print(
+                f"Imtihon {exam_id}, talaba {student_id}: raqamlar "
+                f"{[attempt.attempt_number for attempt in attempts]} -> 1..{len(attempts)}"
+            )
+            if not apply:
+                continue
+            # Unique index mavjud bo'lsa oraliq holatda to'qnashmaslik uchun avval manfiy raqamlar
+            for attempt in attempts:
+                attempt.attempt_number = -attempt.id
+            db.flush()
+            for number, attempt in enumerate(attempts, start=1):
+                attempt.attempt_number = number
+
+        if not apply:
+            db.rollback()
+            if duplicates or misnumbered:
+                print("\nO'zgartirish uchun: python dedupe_open_exam_attempts.py --apply")
+            return
+
+        db.commit()
+        existing = {item["name"] for item in inspect(engine).get_indexes("exam_attempts")}
+        for index_name in INDEX_NAMES:
+            if index_name in existing:
+                print(f"[INFO] {index_name} allaqachon mavjud")
+                continue
+            index = next(index for index in ExamAttempt.__table__.indexes if index.name == index_name)
+            index.create(bind=engine)
+            print(f"[OK] {index_name} yaratildi")
+    except Exception as e:
+        print(f"Xatolik: {e}")
+        db.rollback()
+        sys.exit(1)
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main("--apply" in sys.argv[1:])
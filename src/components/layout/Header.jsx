@@ -21,6 +21,10 @@ export function Header({ sidebarOpen, onMenuClick }) {
   // Profil rasmini olish (avatar_url yoki Gravatar)
   const getProfileImage = () => {
     if (user?.avatar_url) {
+      // Yuklangan rasm - kichraytirilgan variant
+      if (user.avatar_url.startsWith('/api/upload/avatar/')) {
+        return `${user.avatar_url}?size=128`;
+      }
       return user.avatar_url;
     }
     if (user?.email) {
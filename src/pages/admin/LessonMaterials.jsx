@@ -35,9 +35,6 @@ import { lessonMaterialsAPI, departmentsAPI, groupsAPI } from '../../services/ap
 import useAuthStore from '../../store/authStore';
 import { Pagination } from '../../components/ui/Pagination';
 
-// Token olish uchun helper funksiya
-const getToken = () => useAuthStore.getState().token;
-
 const ALLOWED_FILE_TYPES = ['.pdf', '.doc', '.docx', '.ppt', '.pptx'];
 const MAX_FILE_SIZE = 5 * 1024 * 1024; // 5 MB
 
@@ -396,11 +393,14 @@ export function LessonMaterials() {
     // PDF uchun brauzerda ochish
     if (fileType === 'pdf') {
       setViewingMaterial(material);
-      // Token'ni auth store'dan olish
-      const token = getToken();
-      const baseURL = import.meta.env.VITE_API_BASE_URL || 'http://localhost:8000/api';
-      const url = `${baseURL}/lesson-materials/${material.id}/view?token=${encodeURIComponent(token || '')}`;
-      setViewUrl(url);
+      try {
+        const url = await lessonMaterialsAPI.getViewUrl(material.id);
+        setViewUrl(url);
+      } catch (error) {
+        console.error('Ko\'rish havolasini olishda xatolik:', error);
+        alert('Faylni ochishda xatolik yuz berdi');
+        setViewingMaterial(null);
+      }
     } 
     // DOC/DOCX uchun Word'da ochish
     else if (['doc', 'docx'].includes(fileType)) {
@@ -888,7 +888,16 @@ export function LessonMaterials() {
                 <div className="flex items-start justify-between">
                   <div className="flex items-start gap-3 flex-1 min-w-0">
                     <div className="text-3xl shrink-0">
-                      {getFileIcon(material.file_type)}
+                      {material.thumbnail_url ? (
+                        <img
+                          src={lessonMaterialsAPI.getThumbnailUrl(material)}
+                          alt={material.title}
+                          loading="lazy"
+                          className="h-16 w-12 rounded border object-cover object-top"
+                        />
+                      ) : (
+                        getFileIcon(material.file_type)
+                      )}
                     </div>
                     <div className="flex-1 min-w-0">
                       <CardTitle className="text-lg line-clamp-2 mb-1">
@@ -68,6 +68,8 @@ export const studentsAPI = {
   update: (id, data) => apiClient.put(`/students/${id}`, data),
   delete: (id) => apiClient.delete(`/students/${id}`),
   getByGroup: (groupId) => apiClient.get(`/students/group/${groupId}`),
+  autocomplete: (q, limit = 10) => apiClient.get('/students/autocomplete', { params: { q, limit } }),
+  export: (params) => apiClient.get('/students/export', { params, responseType: 'blob' }),
 };
 
 // Groups
@@ -110,6 +112,8 @@ export const attendanceAPI = {
   getAll: (params) => apiClient.get('/attendance', { params }),
   getById: (id) => apiClient.get(`/attendance/${id}`),
   create: (data) => apiClient.post('/attendance', data),
+  createBulk: (data) => apiClient.post('/attendance/bulk', data),
+  export: (params) => apiClient.get('/attendance/export', { params, responseType: 'blob' }),
   update: (id, data) => apiClient.put(`/attendance/${id}`, data),
   delete: (id) => apiClient.delete(`/attendance/${id}`),
   getByDate: (date, params) => apiClient.get(`/attendance/date/${date}`, { params }),
@@ -122,11 +126,14 @@ export const gradesAPI = {
   getAll: (params) => apiClient.get('/grades', { params }),
   getById: (id) => apiClient.get(`/grades/${id}`),
   create: (data) => apiClient.post('/grades', data),
+  createBulk: (data) => apiClient.post('/grades/bulk', data),
+  export: (params) => apiClient.get('/grades/export', { params, responseType: 'blob' }),
   update: (id, data) => apiClient.put(`/grades/${id}`, data),
   delete: (id) => apiClient.delete(`/grades/${id}`),
   getByStudent: (studentId, params) => apiClient.get(`/grades/student/${studentId}`, { params }),
   getByGroupSubjectDate: (group, subject, date) => apiClient.get(`/grades/group/${group}/subject/${subject}/date/${date}`),
   getStatistics: (group, subject, params) => apiClient.get(`/grades/statistics/group/${group}/subject/${subject}`, { params }),
+  getStatisticsBreakdown: (params) => apiClient.get('/grades/statistics/breakdown', { params }),
 };
 
 // Library (Kutubxona)
@@ -169,10 +176,21 @@ export const lessonMaterialsAPI = {
   download: (id) => apiClient.get(`/lesson-materials/${id}/download`, {
     responseType: 'blob',
   }),
-  getViewUrl: (id) => {
-    const token = localStorage.getItem('token');
-    const baseURL = apiClient.defaults.baseURL;
-    return `${baseURL}/lesson-materials/${id}/view?token=${token}`;
+  // Filtrga mos barcha materiallar bitta ZIP arxivda
+  downloadBundle: (params) => apiClient.get('/lesson-materials/bundle', {
+    params,
+    responseType: 'blob',
+  }),
+  // Matn ichidan qidirish (fayl mazmuni bo'yicha)
+  search: (params) => apiClient.get('/lesson-materials/search', { params }),
+  getThumbnailUrl: (material) => {
+    if (!material?.thumbnail_url) return null;
+    return `${apiClient.defaults.baseURL}${material.thumbnail_url.replace(/^\/api/, '')}`;
+  },
+  getViewUrl: async (id) => {
+    // Imzolangan qisqa muddatli havola (JWT URL'ga qo'yilmaydi)
+    const response = await apiClient.get(`/lesson-materials/${id}/view-url`);
+    return `${apiClient.defaults.baseURL}${response.data.path}`;
   },
 };
 
@@ -183,9 +201,10 @@ export const uploadAPI = {
       'Content-Type': 'multipart/form-data',
     },
   }),
-  getAvatar: (filename) => {
+  getAvatar: (filename, size) => {
     const baseURL = apiClient.defaults.baseURL;
-    return `${baseURL}/upload/avatar/${filename}`;
+    // size: 48 / 128 / 512 - kichraytirilgan variant (berilmasa asl rasm)
+    return `${baseURL}/upload/avatar/${filename}${size ? `?size=${size}` : ''}`;
   },
 };
 